@@ -25,4 +25,11 @@ class EntityType(str, enum.Enum):
     HEALTH_REMINDER = "HEALTH_REMINDER"
     FINANCE = "FINANCE"
     CATEGORY = "CATEGORY"
-    EVENT = "EVENT"
\ No newline at end of file
+    EVENT = "EVENT"
+
+class ReminderFrequency(int, enum.Enum):
+    ONCE = 0
+    DAILY = 1
+    WEEKLY = 2
+    MONTHLY = 3
+    YEARLY = 4
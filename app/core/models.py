@@ -1,14 +1,22 @@
-from sqlalchemy import (Column, Integer, Numeric, String, Text, DateTime, Date,
+from sqlalchemy import (Column, Integer, Numeric, String, Text, DateTime, Date, Float,
                         Time, Boolean, ForeignKey, Index, CheckConstraint,
-                        UniqueConstraint, text, Enum)
-from sqlalchemy.dialects.postgresql import JSONB
+                        UniqueConstraint, text, Enum, Computed, DDL)
+from sqlalchemy.dialects.postgresql import JSONB, TSRANGE, TSVECTOR
+from sqlalchemy.event import listen
 from sqlalchemy.orm import DeclarativeBase, relationship, Mapped, mapped_column
 from sqlalchemy.sql import func
 from datetime import datetime
 
+NOTE_SEARCH_CONFIG = "simple" # text search configuration of the note search, no stemming so any language works
+NOTE_TOAST_TUPLE_TARGET = 512 # bytes, a note row above it gets its content compressed, then moved to the toast table
+
 class Base(DeclarativeBase):
     pass
 
+# extensions used by the indexes of several tables, created before any table
+listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS btree_gin"))
+listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
 class User(Base):
     __tablename__ = "users"
 
@@ -23,6 +31,7 @@ class User(Base):
     sync_state = Column(Integer, default=0)
     is_deleted = Column(Integer, default=0)
     server_id = Column(Integer, nullable=True)
+    token_generation = Column(Integer, nullable=False, default=0, server_default=text("0"))
 
     # indexes and other constraints
     __table_args__ = (
@@ -56,10 +65,24 @@ class Reminder(Base):
     sync_state = Column(Integer, default=0)
     is_deleted = Column(Integer, default=0)
     server_id = Column(Integer, nullable=True)
+    # seconds from the start of the period a repeating reminder fires in (day, week, month, year of 31 day months),
+    # NULL for one-off reminders, the scheduler finds the reminders firing in a window by it, see repeat_offset
+    repeat_offset = Column(Float, Computed(
+        "CAST(CASE frequency "
+        "WHEN 1 THEN 0 "
+        "WHEN 2 THEN (extract(isodow FROM reminder_time) - 1) * 86400 "
+        "WHEN 3 THEN (extract(day FROM reminder_time) - 1) * 86400 "
+        "WHEN 4 THEN ((extract(month FROM reminder_time) - 1) * 31 + extract(day FROM reminder_time) - 1) * 86400 "
+        "END + extract(epoch FROM reminder_time::time) AS double precision)",
+        persisted=True
+    ))
 
     # indexes and other constraints
     __table_args__ = (
         Index("idx_reminder_user", "user_id"),
+        Index("idx_reminder_due", "status", "reminder_time", "reminder_id", postgresql_where=text("is_deleted = 0")),
+        Index("idx_reminder_repeating", "status", "frequency", "repeat_offset",
+              postgresql_where=text("is_deleted = 0 AND frequency IN (1, 2, 3, 4)")),
         Index("idx_reminder_last_modified", "last_modified"),
         Index("idx_reminder_sync_state", "sync_state"),
         Index("idx_reminder_server_id", "server_id"),
@@ -104,9 +127,13 @@ class Note(Base):
         nullable=False
     )
 
+    # deferred, only loaded where the content is returned, a check or a listing never reads or decompresses it,
+    # a lazy load would need IO the async session cannot do implicitly, so it raises instead
     content: Mapped[str | None] = mapped_column(
         Text,
-        nullable=True
+        nullable=True,
+        deferred=True,
+        deferred_raiseload=True
     )
 
     created_at: Mapped[datetime] = mapped_column(
@@ -146,15 +173,37 @@ class Note(Base):
         default=0
     )
 
+    # maintained by Postgres on every write, title matches weigh more than content matches,
+    # deferred so loading notes never reads it
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{NOTE_SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{NOTE_SEARCH_CONFIG}', coalesce(content, '')), 'B')",
+            persisted=True
+        ),
+        deferred=True
+    )
+
     # indexes and other constraints
     __table_args__ = (
         Index("idx_note_user", "user_id"),
+        # the note listing reads it backwards: pinned first, then the most recently updated
+        Index("idx_note_listing", "user_id", "is_pinned", "updated_at", "note_id", postgresql_where=text("is_deleted = 0")),
+        # btree_gin lets the user_id equality and the text match use one index scan
+        Index("idx_note_search", "user_id", "search_vector", postgresql_using="gin",
+              postgresql_where=text("is_deleted = 0")),
+        # trigram indexes of the quick search, similarity and prefix matches of the title
+        Index("idx_note_title_trgm", "user_id", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"},
+              postgresql_where=text("is_deleted = 0")),
         Index("idx_note_category", "category_id"),
         Index("idx_note_reminder", "reminder_id"),
         Index("idx_note_last_modified", "last_modified"),
         Index("idx_note_sync_state", "sync_state"),
         Index("idx_note_server_id", "server_id"),
-        Index("idx_note_active", "note_id", postgresql_where=text("is_deleted = 0"))
+        Index("idx_note_active", "note_id", postgresql_where=text("is_deleted = 0")),
+        # large content is compressed and moved out of line earlier, rows stay narrow for checks and listings
+        {"postgresql_with": {"toast_tuple_target": NOTE_TOAST_TUPLE_TARGET}}
     )
 
     # relationships to other tables, constraints
@@ -162,6 +211,34 @@ class Note(Base):
     category = relationship("Category", back_populates="note")
     reminder = relationship("Reminder", back_populates="note")
 
+# lz4 decompresses several times faster than the default pglz, servers before 14 or built without lz4 keep pglz
+listen(Note.__table__, "after_create", DDL(
+    "DO $$ BEGIN "
+    "ALTER TABLE note ALTER COLUMN content SET COMPRESSION lz4; "
+    "EXCEPTION WHEN feature_not_supported OR syntax_error THEN NULL; "
+    "END $$"
+))
+
+class NoteRevision(Base):
+    __tablename__ = "note_revision"
+
+    # earlier versions of a note, the note row itself holds the latest one, a keyframe stores its content in full,
+    # any other revision the delta that turns the content of the next newer revision back into its own
+    revision_id = Column(Integer, primary_key=True, autoincrement=True)
+    note_id = Column(Integer, ForeignKey("note.note_id", ondelete="CASCADE"), nullable=False)
+    revision = Column(Integer, nullable=False) # 1 for the oldest version, counts up per note
+    title = Column(String(255), nullable=False)
+    content = Column(Text, nullable=True) # keyframes only
+    delta = Column(JSONB(none_as_null=True), nullable=True) # every other revision, see utils.delta_utils
+    content_length = Column(Integer, nullable=False, default=0) # characters, lists revisions without rebuilding them
+    created_at = Column(DateTime, nullable=True) # when this version was written, last_modified of the note back then
+
+    # indexes and other constraints
+    __table_args__ = (
+        UniqueConstraint("note_id", "revision", name="uq_note_revision"),
+        CheckConstraint("(content IS NULL) <> (delta IS NULL)", name="ck_note_revision_body"),
+    )
+
 class List(Base):
     __tablename__ = "list"
     
@@ -179,6 +256,8 @@ class List(Base):
     __table_args__ = (
         UniqueConstraint("user_id", "title", name="uq_list_title"),
         Index("idx_list_user", "user_id"),
+        Index("idx_list_title_trgm", "user_id", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"},
+              postgresql_where=text("is_deleted = 0")),
         Index("idx_list_last_modified", "last_modified"),
         Index("idx_list_sync_state", "sync_state"),
         Index("idx_list_server_id", "server_id"),
@@ -233,10 +312,10 @@ class HealthReminder(Base):
     __table_args__ = (
         CheckConstraint("type = ANY (ARRAY[1, 2, 3])", name="ck_type"),
         Index("idx_health_reminder_user", "user_id"),
-        Index("idx_reminder_last_modified", "last_modified"),
-        Index("idx_reminder_sync_state", "sync_state"),
-        Index("idx_reminder_server_id", "server_id"),
-        Index("idx_reminder_active", "reminder_id", postgresql_where=text("is_deleted = 0"))
+        Index("idx_health_reminder_last_modified", "last_modified"),
+        Index("idx_health_reminder_sync_state", "sync_state"),
+        Index("idx_health_reminder_server_id", "server_id"),
+        Index("idx_health_reminder_active", "reminder_id", postgresql_where=text("is_deleted = 0"))
     )
 
     # relationships to other tables, constraints
@@ -249,7 +328,7 @@ class Finance(Base):
     user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
     category_id = Column(Integer, ForeignKey("category.category_id", ondelete="SET NULL"))
     reminder_id = Column(Integer, ForeignKey("reminder.reminder_id", ondelete="SET NULL"))
-    type = Column(Boolean, nullable=False)
+    type = Column(Boolean, nullable=False) # True for an expense, False for income
     expense_amount = Column(Numeric(10, 2), nullable=False)
     expense_date = Column(DateTime)
     description = Column(Text)
@@ -277,6 +356,18 @@ class Finance(Base):
     reminder = relationship("Reminder", back_populates="finance")
     category = relationship("Category", back_populates="finance")
 
+class FinanceMonthly(Base):
+    __tablename__ = "finance_monthly"
+
+    # running totals of the active finance rows per user, month, category and type, every finance write applies
+    # its delta in the same transaction, category_id 0 collects the rows without a category
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True) # first day of the month of expense_date
+    category_id = Column(Integer, primary_key=True, default=0)
+    type = Column(Boolean, primary_key=True) # True for an expense, False for income
+    total = Column(Numeric(14, 2), nullable=False, default=0)
+    entry_count = Column(Integer, nullable=False, default=0)
+
 class Category(Base):
     __tablename__ = "category"
 
@@ -296,6 +387,8 @@ class Category(Base):
     # indexes and other constraints
     __table_args__ = (
         Index("idx_category_user", "user_id"),
+        Index("idx_category_name_trgm", "user_id", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+              postgresql_where=text("is_deleted = 0")),
         Index("idx_category_last_modified", "last_modified"),
         Index("idx_category_sync_state", "sync_state"),
         Index("idx_category_server_id", "server_id"),
@@ -322,6 +415,20 @@ class Event(Base):
     end_time = Column(Time)
     priority = Column(Integer, default=0)
     location = Column(String(255))
+    recurrence_rule = Column(String(255)) # RRULE subset, NULL for one-off events
+    recurrence_end = Column(Date) # last possible occurrence, NULL when the rule never ends
+    recurrence_exceptions = Column(JSONB) # ISO dates of skipped or overridden occurrences
+    recurrence_parent_id = Column(Integer, ForeignKey("event.event_id", ondelete="CASCADE"))
+    recurrence_date = Column(Date) # original occurrence date an override replaces
+    # all day events cover the whole day, events ending before they start end on the next day
+    time_range = Column(TSRANGE, Computed(
+        "CASE "
+        "WHEN start_time IS NULL THEN tsrange(date::timestamp, (date + 1)::timestamp, '[)') "
+        "WHEN end_time IS NULL OR end_time = start_time THEN tsrange(date + start_time, date + start_time, '[]') "
+        "WHEN end_time < start_time THEN tsrange(date + start_time, (date + 1) + end_time, '[)') "
+        "ELSE tsrange(date + start_time, date + end_time, '[)') END",
+        persisted=True
+    ))
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     last_modified = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -332,10 +439,18 @@ class Event(Base):
     # indexes and other constraints
     __table_args__ = (
         Index("idx_event_user", "user_id"),
+        Index("idx_event_title_trgm", "user_id", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"},
+              postgresql_where=text("is_deleted = 0")),
+        Index("idx_event_location_trgm", "user_id", "location", postgresql_using="gin", postgresql_ops={"location": "gin_trgm_ops"},
+              postgresql_where=text("is_deleted = 0")),
         Index("idx_event_category", "category_id"),
         Index("idx_event_reminder", "reminder_id"),
         Index("idx_event_date", "date"),
         Index("idx_event_user_date", "user_id", "date"),
+        Index("idx_event_recurring", "user_id", "date", postgresql_where=text("recurrence_rule IS NOT NULL")),
+        Index("idx_event_recurrence_parent", "recurrence_parent_id"),
+        Index("idx_event_time_range", "user_id", "time_range", postgresql_using="gist",
+              postgresql_where=text("is_deleted = 0")),
         Index("idx_event_last_modified", "last_modified"),
         Index("idx_event_sync_state", "sync_state"),
         Index("idx_event_server_id", "server_id"),
@@ -347,6 +462,9 @@ class Event(Base):
     reminder = relationship("Reminder", back_populates="event")
     category = relationship("Category", back_populates="event")
 
+# gist indexes that mix a plain integer column with a range need btree_gist
+listen(Event.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+
 class SyncLog(Base):
     __tablename__ = "sync_log"
 
@@ -1,20 +1,90 @@
 from fastapi import HTTPException
 from sqlalchemy.sql import expression
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func, case, true
 from sqlalchemy.ext.asyncio import AsyncSession
-from core.models import Category
+from core.models import Category, Note, Event, Finance
 from datetime import datetime
+from crud.finance_crud import merge_rollup_category
 from schemas.category_schema import CategoryCreate, CategoryResponse, CategorySync
+from utils.cache_utils import invalidate_calendar, invalidate_category_stats, category_cache, write_category
 
 async def add_category(db: AsyncSession, category: CategoryCreate):
     new_category = Category(user_id=category.user_id, name=category.name, description=category.description, color=category.color, icon=category.icon)
     db.add(new_category)
     await db.commit()
+    invalidate_category_stats(new_category.user_id)
+    write_category(new_category.user_id, new_category.category_id, CategoryResponse.model_validate(new_category))
+
+async def get_category_map(db: AsyncSession, user_id: int) -> dict[int, CategoryResponse]:
+    categories = category_cache.get(user_id)
+
+    if categories is None:
+        # a category write while the map loads bumps the generation, the stale map is then not cached
+        generation = category_cache.generation(user_id)
+        stmt = select(Category).where(expression.column("user_id") == user_id).order_by(Category.category_id)
+        result = await db.execute(stmt)
+        categories = {category.category_id: CategoryResponse.model_validate(category) for category in result.scalars().all()}
+        category_cache.set(user_id, categories, generation=generation)
+
+    return categories
 
 async def get_categories(db: AsyncSession, user_id: int):
-    stmt = select(Category).where(expression.column("user_id") == user_id)
+    categories = await get_category_map(db, user_id)
+    return list(categories.values())
+
+async def is_user_category(db: AsyncSession, user_id: int, category_id: int | None) -> bool:
+    # 0 and None mean no category, anything else has to be one of the user's categories
+    if not category_id:
+        return True
+
+    categories = await get_category_map(db, user_id)
+
+    if category_id in categories:
+        return True
+
+    # the map can be older than a category created on another worker, a miss is checked against the table
+    stmt = select(Category.category_id).where(Category.category_id == category_id, Category.user_id == user_id)
     result = await db.execute(stmt)
-    return result.scalars().all()
+    return result.scalar_one_or_none() is not None
+
+async def get_category_stats(db: AsyncSession, user_id: int):
+    # one statement, every count is an index lookup on the category_id indexes of note, event and finance
+    note_count = (
+        select(func.count())
+        .where(Note.category_id == Category.category_id, Note.is_deleted == 0)
+        .scalar_subquery()
+    )
+    event_count = (
+        select(func.count())
+        .where(Event.category_id == Category.category_id, Event.is_deleted == 0)
+        .scalar_subquery()
+    )
+    finance = (
+        select(
+            func.count().label("finance_count"),
+            func.coalesce(func.sum(case((Finance.type.is_(True), Finance.expense_amount))), 0).label("expense_total"),
+            func.coalesce(func.sum(case((Finance.type.is_(False), Finance.expense_amount))), 0).label("income_total"),
+        )
+        .where(Finance.category_id == Category.category_id, Finance.is_deleted == 0)
+        .lateral()
+    )
+
+    stmt = (
+        select(
+            Category.category_id,
+            note_count.label("note_count"),
+            event_count.label("event_count"),
+            finance.c.finance_count,
+            finance.c.expense_total,
+            finance.c.income_total,
+        )
+        .join(finance, true())
+        .where(Category.user_id == user_id)
+        .order_by(Category.category_id)
+    )
+
+    result = await db.execute(stmt)
+    return result.all()
 
 async def remake_category(db: AsyncSession, category_data: CategoryResponse):
     stmt = select(Category).where(expression.column("category_id") == category_data.category_id)
@@ -30,7 +100,10 @@ async def remake_category(db: AsyncSession, category_data: CategoryResponse):
     category.icon = category_data.icon
 
     await db.commit()
+    # the calendar buckets events by category color
+    invalidate_calendar(category.user_id)
     await db.refresh(category)
+    write_category(category.user_id, category.category_id, CategoryResponse.model_validate(category))
 
 async def remove_category(db: AsyncSession, category_id: int):
     stmt = select(Category).where(expression.column("category_id") == category_id)
@@ -41,7 +114,11 @@ async def remove_category(db: AsyncSession, category_id: int):
         raise HTTPException(status_code=404, detail={"code": 3, "message": "Category not found!"})
 
     await db.delete(category)
+    await merge_rollup_category(db, category.user_id, category.category_id)
     await db.commit()
+    invalidate_calendar(category.user_id)
+    invalidate_category_stats(category.user_id)
+    write_category(category.user_id, category.category_id, None)
     return True
 
 async def make_category(db: AsyncSession, category: CategorySync):
@@ -59,6 +136,8 @@ async def make_category(db: AsyncSession, category: CategorySync):
     new_category.server_id = new_category.category_id
     await db.commit()
     await db.refresh(new_category)
+    invalidate_category_stats(new_category.user_id)
+    write_category(new_category.user_id, new_category.category_id, CategoryResponse.model_validate(new_category))
     new_category_data = CategorySync(
         category_id=category.category_id,
         server_id=new_category.server_id,
@@ -117,8 +196,14 @@ async def set_category(
             icon=icon,
             sync_state=sync_state
         )
+        .returning(Category)
         .execution_options(synchronize_session="fetch")
     )
 
-    await db.execute(stmt)
-    await db.commit()
\ No newline at end of file
+    result = await db.execute(stmt)
+    categories = result.scalars().all()
+    await db.commit()
+
+    for category in categories:
+        invalidate_calendar(category.user_id)
+        write_category(category.user_id, category.category_id, CategoryResponse.model_validate(category))
\ No newline at end of file
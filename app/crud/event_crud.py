@@ -1,11 +1,15 @@
 from fastapi import HTTPException
 from sqlalchemy.sql import expression
-from sqlalchemy import select, update
+from sqlalchemy import select, update, insert, func, tuple_, literal, distinct
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
-from core.models import Event
+from core.models import Event, Category, Reminder
+from utils.cache_utils import invalidate_calendar, invalidate_category_stats
+from utils.model_converters import to_recurrence_columns, to_recurrence_sync
 from schemas.event_schema import EventCreate, EventSync
-from datetime import datetime, time
+from datetime import datetime, date, time
 
+PARENT_SYNC_STATE = 2 # same state an updated row gets, the other devices download the new exception on their next sync
 
 async def add_event(db: AsyncSession, event: EventCreate):
     event_date = datetime.fromtimestamp(event.date / 1000).date()
@@ -22,10 +26,13 @@ async def add_event(db: AsyncSession, event: EventCreate):
             start_time=start_time,
             end_time=end_time,
             priority=event.priority,
-            location=event.location
+            location=event.location,
+            **to_recurrence_columns(event.recurrence_rule, event_date)
             )
     db.add(new_event)
     await db.commit()
+    invalidate_calendar(event.user_id)
+    invalidate_category_stats(event.user_id)
 
 async def get_event(db: AsyncSession, event_id: int):
     stmt = select(Event).where(expression.column("event_id") == event_id)
@@ -37,6 +44,62 @@ async def get_events(db: AsyncSession, user_id: int):
     result = await db.execute(stmt)
     return result.scalars().all()
 
+async def get_events_in_range(
+        db: AsyncSession,
+        user_id: int,
+        date_from: date,
+        date_to: date,
+        category_id: int | None,
+        after: tuple[date, time, int] | None,
+        limit: int
+):
+    # user_id equality plus the date range is served by idx_event_user_date, only the visible window is sorted
+    start_time = func.coalesce(Event.start_time, time.min)
+    stmt = (
+        select(Event)
+        .where(
+            Event.user_id == user_id,
+            Event.date >= date_from,
+            Event.date <= date_to,
+            Event.is_deleted == 0,
+            Event.recurrence_rule.is_(None),
+        )
+        .order_by(Event.date, start_time, Event.event_id)
+        .limit(limit)
+    )
+
+    if category_id is not None:
+        stmt = stmt.where(Event.category_id == category_id)
+
+    if after is not None:
+        stmt = stmt.where(tuple_(Event.date, start_time, Event.event_id) > tuple_(*after))
+
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+async def get_calendar_rows(db: AsyncSession, user_id: int, date_from: date, date_to: date):
+    # one row per (day, category color), the caller folds the colors of a day together
+    stmt = (
+        select(
+            Event.date,
+            Category.color,
+            func.count(Event.event_id).label("event_count"),
+            func.max(Event.priority).label("max_priority"),
+        )
+        .outerjoin(Category, Category.category_id == Event.category_id)
+        .where(
+            Event.user_id == user_id,
+            Event.date >= date_from,
+            Event.date <= date_to,
+            Event.is_deleted == 0,
+            Event.recurrence_rule.is_(None), # recurring series are expanded by the caller
+        )
+        .group_by(Event.date, Category.color)
+    )
+
+    result = await db.execute(stmt)
+    return result.all()
+
 async def make_event(db: AsyncSession, event: EventSync):
     created_at = datetime.fromtimestamp(event.created_at / 1000)
     date_value = datetime.fromtimestamp(event.date / 1000).date()
@@ -53,12 +116,26 @@ async def make_event(db: AsyncSession, event: EventSync):
         end_time=end_time,
         priority=event.priority,
         location=event.location,
-        created_at=created_at
+        created_at=created_at,
+        **to_recurrence_columns(
+            event.recurrence_rule,
+            date_value,
+            event.recurrence_exceptions,
+            event.recurrence_parent_id,
+            event.recurrence_date
+        )
     )
     db.add(new_event)
     await db.flush()
     new_event.server_id = new_event.event_id
+
+    # an override replaces one occurrence, so that occurrence is skipped when the parent gets expanded
+    if new_event.recurrence_parent_id is not None and new_event.recurrence_date is not None:
+        await add_recurrence_exception(db, new_event.recurrence_parent_id, new_event.user_id, new_event.recurrence_date)
+
     await db.commit()
+    invalidate_calendar(new_event.user_id)
+    invalidate_category_stats(new_event.user_id)
     await db.refresh(new_event)
     new_event_data = EventSync(
         event_id=event.event_id,
@@ -73,6 +150,7 @@ async def make_event(db: AsyncSession, event: EventSync):
         end_time=int(datetime.combine(new_event.date, new_event.end_time).timestamp() * 1000),
         priority=new_event.priority,
         location=new_event.location,
+        **to_recurrence_sync(new_event),
         created_at=int(new_event.created_at.timestamp() * 1000),
         updated_at=int(new_event.updated_at.timestamp() * 1000),
         last_modified=int(new_event.last_modified.timestamp() * 1000),
@@ -81,6 +159,135 @@ async def make_event(db: AsyncSession, event: EventSync):
     )
     return new_event_data
 
+def merged_recurrence_exceptions(values: list[str]):
+    # the stored dates plus the new ones, each once, a stale client cannot drop an exception another device added
+    combined = func.coalesce(Event.recurrence_exceptions, func.jsonb_build_array()).op("||")(literal(values, JSONB))
+    elements = func.jsonb_array_elements_text(combined).table_valued("value")
+
+    return select(func.jsonb_agg(aggregate_order_by(distinct(elements.c.value), elements.c.value))).scalar_subquery()
+
+async def is_recurrence_parent(db: AsyncSession, user_id: int, event_id: int) -> bool:
+    # an override can only replace an occurrence of a recurring event of the same user
+    stmt = select(Event.event_id).where(
+        Event.event_id == event_id,
+        Event.user_id == user_id,
+        Event.recurrence_rule.is_not(None),
+    )
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none() is not None
+
+async def add_recurrence_exception(db: AsyncSession, event_id: int, user_id: int, exception_date: date):
+    # appended and marked changed in one statement, the other devices download the parent with the new exception
+    stmt = (
+        update(Event)
+        .where(Event.event_id == event_id, Event.user_id == user_id, Event.recurrence_rule.is_not(None))
+        .values(
+            recurrence_exceptions=merged_recurrence_exceptions([exception_date.isoformat()]),
+            sync_state=PARENT_SYNC_STATE,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    await db.execute(stmt)
+
+async def get_recurring_events(
+        db: AsyncSession,
+        user_id: int,
+        date_from: date,
+        date_to: date,
+        category_id: int | None = None
+):
+    # series that started before the window and have not ended before it, served by idx_event_recurring
+    stmt = (
+        select(Event, Category.color)
+        .outerjoin(Category, Category.category_id == Event.category_id)
+        .where(
+            Event.user_id == user_id,
+            Event.recurrence_rule.is_not(None),
+            Event.date <= date_to,
+            (Event.recurrence_end.is_(None)) | (Event.recurrence_end >= date_from),
+            Event.is_deleted == 0,
+        )
+    )
+
+    if category_id is not None:
+        stmt = stmt.where(Event.category_id == category_id)
+
+    result = await db.execute(stmt)
+    return result.all()
+
+async def get_overlapping_events(
+        db: AsyncSession,
+        user_id: int,
+        range_start: datetime,
+        range_end: datetime,
+        exclude_event_id: int | None = None
+):
+    # && on the generated time_range column is answered by the idx_event_time_range gist index
+    stmt = (
+        select(Event)
+        .where(
+            Event.user_id == user_id,
+            Event.is_deleted == 0,
+            Event.recurrence_rule.is_(None),
+            Event.time_range.op("&&")(func.tsrange(range_start, range_end, "[)")),
+        )
+        .order_by(func.lower(Event.time_range), Event.event_id)
+    )
+
+    if exclude_event_id is not None:
+        stmt = stmt.where(Event.event_id != exclude_event_id)
+
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+async def stream_export_events(db: AsyncSession, user_id: int, batch_size: int):
+    # server side cursor, only one partition of rows is held in memory at a time
+    stmt = (
+        select(Event, Reminder.reminder_time, Reminder.message)
+        .outerjoin(Reminder, (Reminder.reminder_id == Event.reminder_id) & (Reminder.is_deleted == 0))
+        .where(Event.user_id == user_id, Event.is_deleted == 0)
+        .order_by(Event.event_id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    result = await db.stream(stmt)
+
+    async for partition in result.partitions(batch_size):
+        yield partition
+
+async def add_events_bulk(db: AsyncSession, user_id: int, rows: list[dict]):
+    # one multi row insert per batch instead of a flush per event
+    await db.execute(insert(Event), rows)
+    await db.execute(
+        update(Event)
+        .where(Event.user_id == user_id, Event.server_id.is_(None))
+        .values(server_id=Event.event_id)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    invalidate_calendar(user_id)
+    invalidate_category_stats(user_id)
+
+async def remove_recurrence_exception(db: AsyncSession, event_id: int, user_id: int, exception_date: date):
+    # a deleted override gives its occurrence back to the series, the other devices download the parent without it
+    elements = func.jsonb_array_elements_text(
+        func.coalesce(Event.recurrence_exceptions, func.jsonb_build_array())
+    ).table_valued("value")
+    remaining = (
+        select(func.coalesce(func.jsonb_agg(aggregate_order_by(elements.c.value, elements.c.value)), func.jsonb_build_array()))
+        .where(elements.c.value != exception_date.isoformat())
+        .scalar_subquery()
+    )
+    stmt = (
+        update(Event)
+        .where(Event.event_id == event_id, Event.user_id == user_id, Event.recurrence_rule.is_not(None))
+        .values(recurrence_exceptions=remaining, sync_state=PARENT_SYNC_STATE)
+        .execution_options(synchronize_session=False)
+    )
+
+    await db.execute(stmt)
+
 async def remove_event(db: AsyncSession, event_id: int):
     stmt = select(Event).where(expression.column("event_id") == event_id)
     result = await db.execute(stmt)
@@ -89,8 +296,13 @@ async def remove_event(db: AsyncSession, event_id: int):
     if not event:
         raise HTTPException(status_code=404, detail={"code": 3, "message": "Event not found!"})
 
+    if event.recurrence_parent_id is not None and event.recurrence_date is not None:
+        await remove_recurrence_exception(db, event.recurrence_parent_id, event.user_id, event.recurrence_date)
+
     await db.delete(event)
     await db.commit()
+    invalidate_calendar(event.user_id)
+    invalidate_category_stats(event.user_id)
     return True
 
 async def get_pending_events(db: AsyncSession, user_id: int):
@@ -123,11 +335,24 @@ async def set_event(
         end_time: int,
         priority: int,
         location: str,
-        sync_state: int
+        sync_state: int,
+        recurrence_rule: str = "",
+        recurrence_exceptions: list[int] | None = None,
+        recurrence_parent_id: int = 0,
+        recurrence_date: int = 0
 ):
     date_converted = datetime.fromtimestamp(date_event / 1000).date()
     start_time_converted = datetime.fromtimestamp(start_time / 1000).time()
     end_time_converted = datetime.fromtimestamp(end_time / 1000).time()
+    recurrence = to_recurrence_columns(
+        recurrence_rule,
+        date_converted,
+        recurrence_exceptions,
+        recurrence_parent_id,
+        recurrence_date
+    )
+    # merged instead of replaced, see merged_recurrence_exceptions
+    recurrence["recurrence_exceptions"] = merged_recurrence_exceptions(recurrence["recurrence_exceptions"] or [])
     stmt = (
         update(Event)
         .where(expression.column("event_id") == event_id)
@@ -141,10 +366,22 @@ async def set_event(
             end_time=end_time_converted,
             priority=priority,
             location=location,
-            sync_state=sync_state
+            sync_state=sync_state,
+            **recurrence
         )
+        .returning(Event.user_id)
         .execution_options(synchronize_session="fetch")
     )
 
-    await db.execute(stmt)
+    result = await db.execute(stmt)
+    user_ids = result.scalars().all()
+
+    if recurrence["recurrence_parent_id"] is not None and recurrence["recurrence_date"] is not None:
+        for user_id in user_ids:
+            await add_recurrence_exception(db, recurrence["recurrence_parent_id"], user_id, recurrence["recurrence_date"])
+
     await db.commit()
+
+    for user_id in user_ids:
+        invalidate_calendar(user_id)
+        invalidate_category_stats(user_id)
@@ -0,0 +1,498 @@
+import asyncpg
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select, update, delete, func, case, cast, Date, bindparam, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.enums import SyncResult
+from core.models import Finance, FinanceMonthly, User
+from schemas.finance_schema import FinanceSync
+from utils.cache_utils import invalidate_category_stats
+from utils.date_time_converters import ms_to_datetime
+from utils.db_utils import DBOperationContext
+
+RollupKey = tuple[int, date, int, bool] # (user_id, month, category_id, type), the primary key of finance_monthly
+RollupDeltas = dict[RollupKey, tuple[Decimal, int]] # key -> (total delta, entry_count delta)
+
+def finance_rollup_key(finance: Finance) -> RollupKey | None:
+    # soft deleted rows and rows without a date are not part of any month
+    if finance.is_deleted or finance.expense_date is None:
+        return None
+
+    return finance.user_id, finance.expense_date.date().replace(day=1), finance.category_id or 0, finance.type
+
+def finance_balance_delta(finance: Finance) -> Decimal:
+    # income adds to the balance and an expense takes from it, soft deleted rows count for nothing
+    if finance.is_deleted:
+        return Decimal(0)
+
+    amount = Decimal(finance.expense_amount)
+    return -amount if finance.type else amount
+
+@dataclass
+class FinanceDeltas:
+    # everything a finance write changes besides its own row, applied in the transaction of the write
+    rollups: RollupDeltas = field(default_factory=dict)
+    balances: dict[int, Decimal] = field(default_factory=dict) # user_id -> balance delta
+
+    def add(self, finance: Finance, sign: int):
+        balance_delta = finance_balance_delta(finance)
+
+        if balance_delta:
+            self.balances[finance.user_id] = self.balances.get(finance.user_id, Decimal(0)) + sign * balance_delta
+
+        key = finance_rollup_key(finance)
+
+        if key is None:
+            return
+
+        total, count = self.rollups.get(key, (Decimal(0), 0))
+        self.rollups[key] = (total + sign * Decimal(finance.expense_amount), count + sign)
+
+async def apply_rollup_deltas(db: AsyncSession, deltas: RollupDeltas):
+    # one upsert for every key, runs inside the caller's transaction so the totals commit with the finance rows,
+    # keys are sorted so concurrent writers lock the rollup rows in the same order
+    rows = [
+        {"user_id": key[0], "month": key[1], "category_id": key[2], "type": key[3], "total": total, "entry_count": count}
+        for key, (total, count) in sorted(deltas.items())
+        if total or count
+    ]
+
+    if not rows:
+        return
+
+    stmt = insert(FinanceMonthly).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[FinanceMonthly.user_id, FinanceMonthly.month, FinanceMonthly.category_id, FinanceMonthly.type],
+        set_={
+            "total": FinanceMonthly.total + stmt.excluded.total,
+            "entry_count": FinanceMonthly.entry_count + stmt.excluded.entry_count,
+        },
+    )
+
+    await db.execute(stmt)
+
+def unchanged_user_timestamps() -> dict:
+    # the balance follows the finance rows, it is not an edit of the user and must not win over one in the user sync
+    users = User.__table__
+    return {"updated_at": users.c.updated_at, "last_modified": users.c.last_modified}
+
+async def apply_balance_deltas(db: AsyncSession, balances: dict[int, Decimal]):
+    # balance = balance + delta is evaluated under the row lock, concurrent writes add up instead of overwriting,
+    # the core table keeps one executemany instead of the ORM bulk update by primary key,
+    # the -1 side of an update or delete comes from the row lock_finance locked, an unlocked read of the old values
+    # lets two writers take the same amount off the balance
+    params = [{"delta_user_id": user_id, "delta": delta} for user_id, delta in sorted(balances.items()) if delta]
+
+    if not params:
+        return
+
+    users = User.__table__
+    stmt = (
+        update(users)
+        .where(users.c.user_id == bindparam("delta_user_id"))
+        .values(balance=func.coalesce(users.c.balance, 0) + bindparam("delta"), **unchanged_user_timestamps())
+    )
+
+    await db.execute(stmt, params)
+
+async def apply_finance_deltas(db: AsyncSession, deltas: FinanceDeltas):
+    await apply_rollup_deltas(db, deltas.rollups)
+    await apply_balance_deltas(db, deltas.balances)
+
+async def merge_rollup_category(db: AsyncSession, user_id: int, category_id: int):
+    # a deleted category leaves its finance rows without a category, their totals move to category_id 0,
+    # the caller commits
+    stmt = (
+        delete(FinanceMonthly)
+        .where(FinanceMonthly.user_id == user_id, FinanceMonthly.category_id == category_id)
+        .returning(FinanceMonthly.month, FinanceMonthly.type, FinanceMonthly.total, FinanceMonthly.entry_count)
+    )
+
+    result = await db.execute(stmt)
+
+    await apply_rollup_deltas(db, {
+        (user_id, row.month, 0, row.type): (row.total, row.entry_count) for row in result.all()
+    })
+
+async def create_finance(db: AsyncSession, finance: Finance) -> tuple[Finance | None, DBOperationContext]:
+    try:
+        db.add(finance)
+        await db.flush()
+        finance.server_id = finance.finance_id
+        finance.sync_state = 0
+
+        deltas = FinanceDeltas()
+        deltas.add(finance, 1)
+        await apply_finance_deltas(db, deltas)
+
+        await db.commit()
+        await db.refresh(finance)
+        invalidate_category_stats(finance.user_id)
+
+        return finance, DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return None, DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+FinanceKey = tuple[datetime, Decimal, str] # (expense_date, expense_amount, description), what makes an import row a duplicate
+COPY_COLUMNS = ("user_id", "category_id", "reminder_id", "type", "expense_amount", "expense_date", "description",
+                "last_modified", "sync_state", "is_deleted")
+
+async def get_existing_finance_keys(
+        db: AsyncSession,
+        user_id: int,
+        keys: list[FinanceKey]
+) -> tuple[set[FinanceKey], DBOperationContext]:
+    # the user_id and expense_date lookup is served by idx_finance_user_date
+    try:
+        stmt = (
+            select(Finance.expense_date, Finance.expense_amount, func.coalesce(Finance.description, ""))
+            .where(
+                Finance.user_id == user_id,
+                Finance.is_deleted == 0,
+                Finance.expense_date.in_({key[0] for key in keys}),
+                tuple_(Finance.expense_date, Finance.expense_amount, func.coalesce(Finance.description, "")).in_(keys),
+            )
+        )
+
+        result = await db.execute(stmt)
+
+        return {tuple(row) for row in result.all()}, DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return set(), DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def add_finances_bulk(db: AsyncSession, user_id: int, finances: list[Finance]) -> DBOperationContext:
+    # COPY instead of one insert per row, the rollups and the balance get one delta for the whole batch,
+    # all of it commits together
+    try:
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+
+        await raw_connection.driver_connection.copy_records_to_table(
+            Finance.__tablename__,
+            records=[tuple(getattr(finance, column) for column in COPY_COLUMNS) for finance in finances],
+            columns=COPY_COLUMNS,
+        )
+        await db.execute(
+            update(Finance)
+            .where(Finance.user_id == user_id, Finance.server_id.is_(None))
+            .values(server_id=Finance.finance_id)
+            .execution_options(synchronize_session=False)
+        )
+
+        deltas = FinanceDeltas()
+
+        for finance in finances:
+            deltas.add(finance, 1)
+
+        await apply_finance_deltas(db, deltas)
+
+        await db.commit()
+        invalidate_category_stats(user_id)
+
+        return DBOperationContext(success=True)
+
+    except (SQLAlchemyError, asyncpg.PostgresError) as e:
+        await db.rollback()
+
+        return DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def get_finance(db: AsyncSession, finance_id: int) -> tuple[Finance | None, DBOperationContext]:
+    try:
+        stmt = select(Finance).where(Finance.finance_id == finance_id)
+
+        result = await db.execute(stmt)
+        finance = result.scalars().first()
+
+        return finance, DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return None, DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def lock_finance(db: AsyncSession, finance_id: int) -> Finance | None:
+    # locks the row until the write commits and reads it again, the copy the ownership check left in the identity map
+    # may be stale, a concurrent write of the same row waits here and then sees the values the first one committed
+    stmt = (
+        select(Finance)
+        .where(Finance.finance_id == finance_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+async def get_finances(db: AsyncSession, user_id: int) -> tuple[list[Finance], DBOperationContext]:
+    try:
+        stmt = (
+            select(Finance)
+            .where(Finance.user_id == user_id, Finance.is_deleted == 0)
+            .order_by(Finance.expense_date.desc(), Finance.finance_id.desc())
+        )
+
+        result = await db.execute(stmt)
+        finances = list(result.scalars().all())
+
+        return finances, DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return [], DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def get_pending_finances(db: AsyncSession, user_id: int) -> tuple[list[Finance], DBOperationContext]:
+    try:
+        stmt = select(Finance).where(
+            Finance.user_id == user_id,
+            Finance.sync_state != 0,
+        )
+
+        result = await db.execute(stmt)
+        finances = list(result.scalars().all())
+
+        return finances, DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return [], DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def update_finance(
+        db: AsyncSession,
+        finance_id: int,
+        finance_data: FinanceSync
+) -> tuple[Finance | None, DBOperationContext]:
+    try:
+        finance = await lock_finance(db, finance_id)
+
+        if finance is None:
+            return None, DBOperationContext(
+                success=False,
+                exception_type=SyncResult.NOT_FOUND,
+                exception_message="Finance DB record not found"
+            )
+
+        # the old values of the locked row leave their month and the balance and the new ones enter them,
+        # a soft delete only leaves
+        deltas = FinanceDeltas()
+        deltas.add(finance, -1)
+
+        finance.category_id = None if finance_data.category_id == 0 else finance_data.category_id
+        finance.reminder_id = None if finance_data.reminder_id == 0 else finance_data.reminder_id
+        finance.type = finance_data.type
+        finance.expense_amount = finance_data.expense_amount
+        finance.expense_date = ms_to_datetime(finance_data.expense_date)
+        finance.description = finance_data.description
+        finance.is_deleted = finance_data.is_deleted
+        finance.sync_state = 0
+
+        deltas.add(finance, 1)
+        await apply_finance_deltas(db, deltas)
+
+        await db.commit()
+        await db.refresh(finance)
+        invalidate_category_stats(finance.user_id)
+
+        return finance, DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return None, DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def delete_finance(db: AsyncSession, finance_id: int) -> DBOperationContext:
+    try:
+        finance = await lock_finance(db, finance_id)
+
+        if finance is None:
+            return DBOperationContext(
+                success=False,
+                exception_type=SyncResult.NOT_FOUND,
+                exception_message="Finance DB record not found"
+            )
+
+        deltas = FinanceDeltas()
+        deltas.add(finance, -1)
+        await apply_finance_deltas(db, deltas)
+
+        await db.delete(finance)
+        await db.commit()
+        invalidate_category_stats(finance.user_id)
+
+        return DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def set_finance_sync_state(db: AsyncSession, finance_id: int, sync_state: int) -> DBOperationContext:
+    try:
+        stmt = (
+            update(Finance)
+            .where(Finance.finance_id == finance_id)
+            .values(sync_state=sync_state)
+            .execution_options(synchronize_session="fetch")
+        )
+
+        await db.execute(stmt)
+        await db.commit()
+
+        return DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+def derived_balance():
+    # the balance recomputed from the active finance rows of users.user_id, an index lookup on idx_finance_user
+    users = User.__table__
+
+    return (
+        select(func.coalesce(func.sum(case((Finance.type.is_(True), -Finance.expense_amount), else_=Finance.expense_amount)), 0))
+        .where(Finance.user_id == users.c.user_id, Finance.is_deleted == 0)
+        .scalar_subquery()
+    )
+
+async def get_balance_batch(db: AsyncSession, after_user_id: int, limit: int) -> tuple[list, DBOperationContext]:
+    # stored and derived balance of the next users in user_id order, one statement sees one snapshot,
+    # so a finance write and its balance delta are either both visible or both not
+    try:
+        users = User.__table__
+        stmt = (
+            select(users.c.user_id, func.coalesce(users.c.balance, 0).label("balance"), derived_balance().label("derived"))
+            .where(users.c.user_id > after_user_id)
+            .order_by(users.c.user_id)
+            .limit(limit)
+        )
+
+        result = await db.execute(stmt)
+
+        return list(result.all()), DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return [], DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def repair_balances(db: AsyncSession, user_ids: list[int]) -> DBOperationContext:
+    # the user rows are locked first, a finance write in flight either committed before the recount or
+    # waits and adds its delta on top of the repaired balance
+    try:
+        users = User.__table__
+
+        await db.execute(
+            select(users.c.user_id).where(users.c.user_id.in_(user_ids)).order_by(users.c.user_id).with_for_update()
+        )
+        await db.execute(
+            update(users)
+            .where(users.c.user_id.in_(user_ids))
+            .values(balance=derived_balance(), **unchanged_user_timestamps())
+        )
+        await db.commit()
+
+        return DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def get_finance_report(
+        db: AsyncSession,
+        user_id: int,
+        yearly: bool,
+        start: date | None = None,
+        end: date | None = None
+) -> tuple[list, DBOperationContext]:
+    # reads finance_monthly only, one row per month, category and type instead of one per transaction
+    try:
+        period = cast(func.date_trunc("year", FinanceMonthly.month), Date) if yearly else FinanceMonthly.month
+
+        stmt = (
+            select(
+                period.label("period"),
+                FinanceMonthly.category_id,
+                func.sum(case((FinanceMonthly.type.is_(True), FinanceMonthly.total), else_=0)).label("expense_total"),
+                func.sum(case((FinanceMonthly.type.is_(False), FinanceMonthly.total), else_=0)).label("income_total"),
+                func.sum(FinanceMonthly.entry_count).label("entry_count"),
+            )
+            .where(FinanceMonthly.user_id == user_id)
+            .group_by(period, FinanceMonthly.category_id)
+            .having(func.sum(FinanceMonthly.entry_count) > 0)
+            .order_by(period, FinanceMonthly.category_id)
+        )
+
+        if start is not None:
+            stmt = stmt.where(FinanceMonthly.month >= start)
+
+        if end is not None:
+            stmt = stmt.where(FinanceMonthly.month < end)
+
+        result = await db.execute(stmt)
+
+        return list(result.all()), DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return [], DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
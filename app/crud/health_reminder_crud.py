@@ -0,0 +1,8 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.models import HealthReminder
+
+async def get_active_health_reminders(db: AsyncSession, user_id: int):
+    stmt = select(HealthReminder).where(HealthReminder.user_id == user_id, HealthReminder.is_deleted == 0)
+    result = await db.execute(stmt)
+    return result.scalars().all()
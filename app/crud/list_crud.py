@@ -0,0 +1,251 @@
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from core.models import List, ListItem
+from schemas.list_schema import ListSync, ListItemSync
+from utils.date_time_converters import ms_to_datetime
+from utils.db_utils import DBOperationContext
+
+async def get_list(db: AsyncSession, list_id: int) -> tuple[List | None, DBOperationContext]:
+    try:
+        stmt = select(List).where(List.list_id == list_id)
+
+        result = await db.execute(stmt)
+        list_row = result.scalars().first()
+
+        return list_row, DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return None, DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def get_list_item_names(db: AsyncSession, list_id: int) -> tuple[dict[int, str], DBOperationContext]:
+    # item_id -> name of every item of the list, the item changes of a sync are checked against it in memory
+    try:
+        stmt = select(ListItem.item_id, ListItem.name).where(ListItem.list_id == list_id)
+
+        result = await db.execute(stmt)
+
+        return {row.item_id: row.name for row in result.all()}, DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return {}, DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def upsert_list(db: AsyncSession, list_sync: ListSync) -> List:
+    # a title the user already has merges into that list instead of failing on uq_list_title, a deleted one comes back
+    stmt = insert(List).values(
+        user_id=list_sync.user_id,
+        title=list_sync.title,
+        created_at=ms_to_datetime(list_sync.created_at),
+        updated_at=ms_to_datetime(list_sync.updated_at),
+        last_modified=ms_to_datetime(list_sync.last_modified),
+        sync_state=0,
+        is_deleted=0,
+    )
+    stmt = (
+        stmt.on_conflict_do_update(
+            constraint="uq_list_title",
+            set_={"is_deleted": 0, "sync_state": 0, "last_modified": stmt.excluded.last_modified},
+        )
+        .returning(List)
+        .execution_options(populate_existing=True)
+    )
+
+    result = await db.execute(stmt)
+    list_row = result.scalars().one()
+
+    if list_row.server_id is None:
+        list_row.server_id = list_row.list_id
+
+    return list_row
+
+async def upsert_list_items(db: AsyncSession, list_id: int, items: list[ListItemSync]) -> list[ListItem]:
+    # one INSERT ... ON CONFLICT (list_id, name) DO UPDATE for every changed item of the list
+    if not items:
+        return []
+
+    stmt = insert(ListItem).values([
+        {
+            "list_id": list_id,
+            "name": item.name,
+            "quantity": item.quantity,
+            "status": item.status,
+            "last_modified": ms_to_datetime(item.last_modified),
+            "sync_state": 0,
+            "is_deleted": 0,
+        }
+        for item in items
+    ])
+    stmt = (
+        stmt.on_conflict_do_update(
+            constraint="uq_item_name",
+            set_={
+                "quantity": stmt.excluded.quantity,
+                "status": stmt.excluded.status,
+                "last_modified": stmt.excluded.last_modified,
+                "sync_state": 0,
+                "is_deleted": 0,
+            },
+        )
+        .returning(ListItem)
+        .execution_options(populate_existing=True)
+    )
+
+    result = await db.execute(stmt)
+    list_items = list(result.scalars().all())
+
+    await db.execute(
+        update(ListItem)
+        .where(ListItem.list_id == list_id, ListItem.server_id.is_(None))
+        .values(server_id=ListItem.item_id)
+        .execution_options(synchronize_session=False)
+    )
+
+    # mirrors the UPDATE above without marking the items dirty, a flush would write them again one by one
+    for list_item in list_items:
+        set_committed_value(list_item, "server_id", list_item.server_id or list_item.item_id)
+
+    return list_items
+
+async def soft_delete_list_items(db: AsyncSession, list_id: int, item_ids: list[int] | None = None) -> list[int]:
+    # one UPDATE for all deleted items, None deletes every item of the list
+    stmt = update(ListItem).where(ListItem.list_id == list_id, ListItem.is_deleted == 0)
+
+    if item_ids is not None:
+        if not item_ids:
+            return []
+
+        stmt = stmt.where(ListItem.item_id.in_(item_ids))
+
+    result = await db.execute(
+        stmt.values(is_deleted=1, sync_state=0)
+        .returning(ListItem.item_id)
+        .execution_options(synchronize_session=False)
+    )
+
+    return list(result.scalars().all())
+
+async def save_list(
+        db: AsyncSession,
+        list_sync: ListSync,
+        existing_list: List | None,
+        upserted_items: list[ListItemSync],
+        deleted_item_ids: list[int]
+) -> tuple[tuple[List, list[ListItem]] | None, DBOperationContext]:
+    # the list and all of its item changes commit together
+    try:
+        if existing_list is None:
+            list_row = await upsert_list(db, list_sync)
+        else:
+            list_row = existing_list
+            list_row.title = list_sync.title
+            list_row.is_deleted = list_sync.is_deleted
+            list_row.sync_state = 0
+            await db.flush()
+
+        if list_row.is_deleted:
+            await soft_delete_list_items(db, list_row.list_id)
+            list_items = []
+        else:
+            await soft_delete_list_items(db, list_row.list_id, deleted_item_ids)
+            list_items = await upsert_list_items(db, list_row.list_id, upserted_items)
+
+        await db.commit()
+        await db.refresh(list_row)
+
+        return (list_row, list_items), DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return None, DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def get_pending_lists(
+        db: AsyncSession,
+        user_id: int
+) -> tuple[list[tuple[List, list[ListItem]]], DBOperationContext]:
+    # a list is pending when it or one of its items changed, only the changed items come with it
+    try:
+        item_stmt = (
+            select(ListItem)
+            .join(List, List.list_id == ListItem.list_id)
+            .where(List.user_id == user_id, ListItem.sync_state != 0)
+        )
+        item_result = await db.execute(item_stmt)
+
+        pending_items: dict[int, list[ListItem]] = {}
+
+        for list_item in item_result.scalars().all():
+            pending_items.setdefault(list_item.list_id, []).append(list_item)
+
+        list_stmt = select(List).where(
+            List.user_id == user_id,
+            (List.sync_state != 0) | List.list_id.in_(list(pending_items)),
+        )
+        list_result = await db.execute(list_stmt)
+
+        lists = [(list_row, pending_items.get(list_row.list_id, [])) for list_row in list_result.scalars().all()]
+
+        return lists, DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return [], DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def set_lists_sync_state(
+        db: AsyncSession,
+        list_ids: list[int],
+        item_ids: list[int],
+        sync_state: int
+) -> DBOperationContext:
+    try:
+        if list_ids:
+            await db.execute(
+                update(List)
+                .where(List.list_id.in_(list_ids))
+                .values(sync_state=sync_state)
+                .execution_options(synchronize_session="fetch")
+            )
+
+        if item_ids:
+            await db.execute(
+                update(ListItem)
+                .where(ListItem.item_id.in_(item_ids))
+                .values(sync_state=sync_state)
+                .execution_options(synchronize_session="fetch")
+            )
+
+        await db.commit()
+
+        return DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
@@ -1,11 +1,44 @@
+from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func, tuple_, cast, REAL, literal_column
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import undefer
+from sqlalchemy.orm.attributes import set_committed_value
 from core.enums import SyncResult
-from core.models import Note
+from core.models import Note, NOTE_SEARCH_CONFIG
+from crud.note_revision_crud import set_note_text
 from schemas.note_schema import NoteSync
+from utils.cache_utils import invalidate_category_stats
 from utils.db_utils import DBOperationContext
 
+async def refresh_note(db: AsyncSession, note: Note):
+    # a refresh leaves the deferred content unloaded, the value already in memory is kept instead of read back
+    content_loaded = "content" not in inspect(note).unloaded
+    content = note.content if content_loaded else None
+
+    await db.refresh(note)
+
+    if content_loaded:
+        set_committed_value(note, "content", content)
+
+async def load_note_content(db: AsyncSession, note: Note) -> DBOperationContext:
+    # reads the content of a note that was loaded without it, once a check passed and it is actually needed
+    try:
+        if "content" in inspect(note).unloaded:
+            await db.refresh(note, ["content"])
+
+        return DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
 async def create_note(db: AsyncSession, note: Note) -> tuple[Note | None, DBOperationContext]:
     try:
         db.add(note)
@@ -13,7 +46,8 @@ async def create_note(db: AsyncSession, note: Note) -> tuple[Note | None, DBOper
         note.server_id = note.note_id
         note.sync_state = 0
         await db.commit()
-        await db.refresh(note)
+        await refresh_note(db, note)
+        invalidate_category_stats(note.user_id)
 
         return note, DBOperationContext(success=True)
 
@@ -26,10 +60,13 @@ async def create_note(db: AsyncSession, note: Note) -> tuple[Note | None, DBOper
             exception_message=str(e)
         )
 
-async def get_note(db: AsyncSession, note_id: int) -> tuple[Note | None, DBOperationContext]:
+async def get_note(db: AsyncSession, note_id: int, with_content: bool = False) -> tuple[Note | None, DBOperationContext]:
     try:
         stmt = select(Note).where(Note.note_id == note_id)
 
+        if with_content:
+            stmt = stmt.options(undefer(Note.content))
+
         result = await db.execute(stmt)
         note = result.scalars().first()
 
@@ -46,7 +83,7 @@ async def get_note(db: AsyncSession, note_id: int) -> tuple[Note | None, DBOpera
 
 async def get_notes(db: AsyncSession, user_id: int) -> tuple[list[Note], DBOperationContext]:
     try:
-        stmt = select(Note).where(Note.user_id == user_id)
+        stmt = select(Note).where(Note.user_id == user_id).options(undefer(Note.content))
 
         result = await db.execute(stmt)
         notes = list(result.scalars().all())
@@ -64,10 +101,11 @@ async def get_notes(db: AsyncSession, user_id: int) -> tuple[list[Note], DBOpera
 
 async def get_pending_notes(db: AsyncSession, user_id: int) -> tuple[list[Note], DBOperationContext]:
     try:
+        # pending notes are sent to the client, the only select of whole notes that needs their content
         stmt = select(Note).where(
             Note.user_id == user_id,
             Note.sync_state != 0,
-        )
+        ).options(undefer(Note.content))
 
         result = await db.execute(stmt)
         notes = list(result.scalars().all())
@@ -85,7 +123,7 @@ async def get_pending_notes(db: AsyncSession, user_id: int) -> tuple[list[Note],
 
 async def update_note(db: AsyncSession, note_id: int, note_data: NoteSync) -> tuple[Note | None, DBOperationContext]:
     try:
-        note, context = await get_note(db, note_id)
+        note, context = await get_note(db, note_id, with_content=True)
 
         if note is None:
             return None, DBOperationContext(
@@ -94,8 +132,7 @@ async def update_note(db: AsyncSession, note_id: int, note_data: NoteSync) -> tu
                 exception_message="Note DB record not found"
             )
 
-        note.title = note_data.title
-        note.content = note_data.content
+        await set_note_text(db, note, note_data.title, note_data.content)
         note.category_id = None if note_data.category_id == 0 else note_data.category_id
         note.reminder_id = None if note_data.reminder_id == 0 else note_data.reminder_id
         note.is_deleted = note_data.is_deleted
@@ -103,7 +140,34 @@ async def update_note(db: AsyncSession, note_id: int, note_data: NoteSync) -> tu
         note.sync_state = 0
 
         await db.commit()
-        await db.refresh(note)
+        await refresh_note(db, note)
+        invalidate_category_stats(note.user_id)
+
+        return note, DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return None, DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def restore_note(
+        db: AsyncSession,
+        note: Note,
+        title: str,
+        content: str | None,
+        sync_state: int
+) -> tuple[Note | None, DBOperationContext]:
+    # the restored text is a new version, the one it replaces stays restorable as the newest revision
+    try:
+        await set_note_text(db, note, title, content)
+        note.sync_state = sync_state
+
+        await db.commit()
+        await refresh_note(db, note)
 
         return note, DBOperationContext(success=True)
 
@@ -129,6 +193,7 @@ async def delete_note(db: AsyncSession, note_id: int) -> DBOperationContext:
 
         await db.delete(note)
         await db.commit()
+        invalidate_category_stats(note.user_id)
 
         return DBOperationContext(success=True)
 
@@ -163,3 +228,108 @@ async def set_note_sync_state(db: AsyncSession, note_id: int, sync_state: int) -
             exception_type=type(e).__name__,
             exception_message=str(e)
         )
+
+NOTE_PREVIEW_LENGTH = 200
+
+async def get_note_page(
+        db: AsyncSession,
+        user_id: int,
+        category_id: int | None,
+        after: tuple[int, datetime, int] | None,
+        limit: int
+) -> tuple[list, DBOperationContext]:
+    # a backward scan of idx_note_listing, content is never selected, only its first characters
+    try:
+        order = (Note.is_pinned, Note.updated_at, Note.note_id)
+
+        stmt = (
+            select(
+                Note.note_id,
+                Note.category_id,
+                Note.reminder_id,
+                Note.title,
+                func.left(func.coalesce(Note.content, ""), NOTE_PREVIEW_LENGTH).label("preview"),
+                Note.is_pinned,
+                Note.created_at,
+                Note.updated_at,
+            )
+            # an inline 0, a bound parameter would not match the partial index under a generic plan
+            .where(Note.user_id == user_id, Note.is_deleted == literal_column("0"))
+            .order_by(*(column.desc() for column in order))
+            .limit(limit)
+        )
+
+        if category_id is not None:
+            stmt = stmt.where(Note.category_id == category_id)
+
+        if after is not None:
+            stmt = stmt.where(tuple_(*order) < tuple_(*after))
+
+        result = await db.execute(stmt)
+
+        return list(result.all()), DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return [], DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+SEARCH_HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxWords=30, MinWords=10, MaxFragments=2, FragmentDelimiter= … "
+
+async def search_notes(
+        db: AsyncSession,
+        user_id: int,
+        query: str,
+        after: tuple[float, int] | None,
+        limit: int
+) -> tuple[list, DBOperationContext]:
+    # matches come from idx_note_search, only the page is ranked past the cursor and gets headlines,
+    # ts_headline parses the whole text again, so it runs on limit rows and not on every match
+    try:
+        config = literal_column(f"'{NOTE_SEARCH_CONFIG}'::regconfig")
+        ts_query = func.websearch_to_tsquery(config, query)
+        rank = func.ts_rank(Note.search_vector, ts_query)
+
+        page = (
+            select(Note.note_id, rank.label("rank"))
+            # an inline 0, a bound parameter would not match the partial index under a generic plan
+            .where(Note.user_id == user_id, Note.is_deleted == literal_column("0"), Note.search_vector.bool_op("@@")(ts_query))
+            .order_by(rank.desc(), Note.note_id.desc())
+            .limit(limit)
+        )
+
+        if after is not None:
+            page = page.where(tuple_(rank, Note.note_id) < tuple_(cast(after[0], REAL), after[1]))
+
+        page = page.subquery()
+
+        stmt = (
+            select(
+                Note.note_id,
+                Note.category_id,
+                func.ts_headline(config, Note.title, ts_query, "HighlightAll=true").label("title"),
+                func.ts_headline(config, func.coalesce(Note.content, ""), ts_query, SEARCH_HEADLINE_OPTIONS).label("snippet"),
+                page.c.rank,
+                Note.is_pinned,
+                Note.updated_at,
+            )
+            .join(page, page.c.note_id == Note.note_id)
+            .order_by(page.c.rank.desc(), Note.note_id.desc())
+        )
+
+        result = await db.execute(stmt)
+
+        return list(result.all()), DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return [], DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
@@ -0,0 +1,109 @@
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.models import Note, NoteRevision
+from utils.db_utils import DBOperationContext
+from utils.delta_utils import make_delta
+
+# every n-th revision keeps its content in full, rebuilding any revision applies at most n - 1 deltas
+NOTE_REVISION_KEYFRAME_INTERVAL = 16
+
+async def set_note_text(db: AsyncSession, note: Note, title: str, content: str | None):
+    # overwrites title and content, the version they replace becomes the newest revision of the note,
+    # needs the content loaded and runs in the transaction of the caller
+    if note.title == title and (note.content or "") == (content or ""):
+        return
+
+    result = await db.execute(
+        select(func.coalesce(func.max(NoteRevision.revision), 0)).where(NoteRevision.note_id == note.note_id)
+    )
+    revision = result.scalar_one() + 1
+    old_content = note.content or ""
+
+    # the delta turns the new content back into the old one, the oldest revisions are the cheapest to keep
+    is_keyframe = revision % NOTE_REVISION_KEYFRAME_INTERVAL == 0
+
+    await db.execute(insert(NoteRevision).values(
+        note_id=note.note_id,
+        revision=revision,
+        title=note.title,
+        content=old_content if is_keyframe else None,
+        delta=None if is_keyframe else make_delta(content or "", old_content),
+        content_length=len(old_content),
+        created_at=note.last_modified,
+    ))
+
+    note.title = title
+    note.content = content
+
+async def get_note_revisions(
+        db: AsyncSession,
+        note_id: int,
+        before: int | None,
+        limit: int
+) -> tuple[list, DBOperationContext]:
+    # newest first, the deltas are never read for a listing
+    try:
+        stmt = (
+            select(
+                NoteRevision.revision,
+                NoteRevision.title,
+                NoteRevision.content_length,
+                NoteRevision.content.is_not(None).label("is_keyframe"),
+                NoteRevision.created_at,
+            )
+            .where(NoteRevision.note_id == note_id)
+            .order_by(NoteRevision.revision.desc())
+            .limit(limit)
+        )
+
+        if before is not None:
+            stmt = stmt.where(NoteRevision.revision < before)
+
+        result = await db.execute(stmt)
+
+        return list(result.all()), DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return [], DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def get_note_revision_chain(
+        db: AsyncSession,
+        note_id: int,
+        revision: int
+) -> tuple[list[NoteRevision], DBOperationContext]:
+    # the revision and the newer ones up to the next keyframe, oldest first, the next keyframe is never further away
+    # than the interval, without one the chain ends at the newest revision and continues with the note itself
+    try:
+        stmt = (
+            select(NoteRevision)
+            .where(NoteRevision.note_id == note_id, NoteRevision.revision >= revision)
+            .order_by(NoteRevision.revision)
+            .limit(NOTE_REVISION_KEYFRAME_INTERVAL)
+        )
+
+        result = await db.execute(stmt)
+        chain = []
+
+        for row in result.scalars().all():
+            chain.append(row)
+
+            if row.content is not None:
+                break
+
+        return chain, DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return [], DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
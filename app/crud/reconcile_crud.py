@@ -0,0 +1,86 @@
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select, update, func, Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+from utils.db_utils import DBOperationContext
+
+async def get_reconcile_fingerprint(
+        db: AsyncSession,
+        id_column: InstrumentedAttribute,
+        user_id_column: InstrumentedAttribute,
+        last_modified_column: InstrumentedAttribute,
+        user_id: int,
+) -> tuple[tuple | None, DBOperationContext]:
+    try:
+        stmt = select(
+            func.count(id_column),
+            func.coalesce(func.sum(id_column), 0),
+            func.max(last_modified_column),
+        ).where(user_id_column == user_id)
+
+        result = await db.execute(stmt)
+        fingerprint = tuple(result.one())
+
+        return fingerprint, DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return None, DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def get_reconcile_rows(
+        db: AsyncSession,
+        columns: tuple,
+        user_id_column: InstrumentedAttribute,
+        user_id: int,
+) -> tuple[list[Row], DBOperationContext]:
+    try:
+        stmt = select(*columns).where(user_id_column == user_id)
+
+        result = await db.execute(stmt)
+        rows = list(result.all())
+
+        return rows, DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return [], DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
+
+async def set_reconcile_sync_state(
+        db: AsyncSession,
+        id_column: InstrumentedAttribute,
+        user_id_column: InstrumentedAttribute,
+        user_id: int,
+        ids: list[int],
+        sync_state: int,
+) -> DBOperationContext:
+    try:
+        stmt = (
+            update(id_column.class_)
+            .where(user_id_column == user_id, id_column.in_(ids))
+            .values(sync_state=sync_state)
+            .execution_options(synchronize_session=False)
+        )
+
+        await db.execute(stmt)
+        await db.commit()
+
+        return DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
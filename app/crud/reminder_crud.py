@@ -1,9 +1,10 @@
 from fastapi import HTTPException
 from sqlalchemy.sql import expression
-from sqlalchemy import select, update
+from sqlalchemy import select, update, insert, func, tuple_, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from core.models import Reminder
+from core.models import Reminder, Event
 from schemas.reminder_schema import ReminderCreate, ReminderSync
+from utils.schedule_utils import REPEATING_FREQUENCIES, repeat_offset_ranges
 from datetime import datetime
 
 async def add_reminder(db: AsyncSession, reminder: ReminderCreate):
@@ -57,6 +58,110 @@ async def make_reminder(db: AsyncSession, reminder: ReminderSync):
     )
     return new_reminder_data
 
+async def stream_export_reminders(db: AsyncSession, user_id: int, batch_size: int):
+    # reminders attached to an event are exported as the alarm of that event instead
+    linked = select(Event.reminder_id).where(Event.reminder_id.is_not(None))
+    stmt = (
+        select(Reminder)
+        .where(Reminder.user_id == user_id, Reminder.is_deleted == 0, Reminder.reminder_id.not_in(linked))
+        .order_by(Reminder.reminder_id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    result = await db.stream_scalars(stmt)
+
+    async for partition in result.partitions(batch_size):
+        yield partition
+
+async def add_reminders_bulk(db: AsyncSession, user_id: int, rows: list[dict]):
+    await db.execute(insert(Reminder), rows)
+    await db.execute(
+        update(Reminder)
+        .where(Reminder.user_id == user_id, Reminder.server_id.is_(None))
+        .values(server_id=Reminder.reminder_id)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+async def get_due_reminders(
+        db: AsyncSession,
+        status: int,
+        after: tuple[datetime, int],
+        until: datetime,
+        limit: int
+):
+    # keyset scan of idx_reminder_due, resumes right after the last (reminder_time, reminder_id) loaded
+    stmt = (
+        select(Reminder.reminder_id, Reminder.user_id, Reminder.reminder_time, Reminder.message)
+        .where(
+            Reminder.status == status,
+            Reminder.is_deleted == 0,
+            func.coalesce(Reminder.frequency, 0).not_in(REPEATING_FREQUENCIES),
+            tuple_(Reminder.reminder_time, Reminder.reminder_id) > tuple_(*after),
+            Reminder.reminder_time <= until,
+        )
+        .order_by(Reminder.reminder_time, Reminder.reminder_id)
+        .limit(limit)
+    )
+
+    result = await db.execute(stmt)
+    return result.all()
+
+async def get_repeating_reminders(
+        db: AsyncSession,
+        status: int,
+        window_start: datetime,
+        window_end: datetime,
+        after_id: int,
+        limit: int
+):
+    # the repeating reminders that can fire in the window, idx_reminder_repeating answers the repeat_offset ranges,
+    # pages continue after the last reminder_id so the scheduler never holds all of them
+    conditions = []
+
+    for frequency in REPEATING_FREQUENCIES:
+        ranges = repeat_offset_ranges(frequency, window_start, window_end)
+        condition = Reminder.frequency == frequency
+
+        if ranges is not None:
+            condition = and_(condition, or_(*(Reminder.repeat_offset.between(low, high) for low, high in ranges)))
+
+        conditions.append(condition)
+
+    stmt = (
+        select(Reminder.reminder_id, Reminder.user_id, Reminder.reminder_time, Reminder.message, Reminder.frequency)
+        .where(
+            Reminder.status == status,
+            Reminder.is_deleted == 0,
+            Reminder.frequency.in_(REPEATING_FREQUENCIES),
+            or_(*conditions),
+            Reminder.reminder_time <= window_end,
+            Reminder.reminder_id > after_id,
+        )
+        .order_by(Reminder.reminder_id)
+        .limit(limit)
+    )
+
+    result = await db.execute(stmt)
+    return result.all()
+
+async def get_day_reminders(db: AsyncSession, user_id: int, status: int, day_start: datetime, day_end: datetime):
+    # one-off reminders of the day and every repeating reminder that started before the day ends
+    repeating = Reminder.frequency.in_(REPEATING_FREQUENCIES)
+    stmt = (
+        select(Reminder)
+        .where(
+            Reminder.user_id == user_id,
+            Reminder.status == status,
+            Reminder.is_deleted == 0,
+            Reminder.reminder_time < day_end,
+            repeating | (Reminder.reminder_time >= day_start),
+        )
+    )
+
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
 async def remove_reminder(db: AsyncSession, reminder_id: int):
     stmt = select(Reminder).where(expression.column("reminder_id") == reminder_id)
     result = await db.execute(stmt)
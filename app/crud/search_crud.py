@@ -0,0 +1,81 @@
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select, func, case, cast, literal, literal_column, null, or_, union_all, Row, Select, String, Text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+from utils.db_utils import DBOperationContext
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def quick_search_select(
+        entity_type: str,
+        id_column: InstrumentedAttribute,
+        user_id_column: InstrumentedAttribute,
+        text_columns: tuple[InstrumentedAttribute, ...],
+        user_id: int,
+        query: str,
+        limit: int,
+) -> Select:
+    # (entity type, id, first text column, second text column or NULL, score) of the best matches of one table,
+    # both the word similarity operator <% and the prefix ILIKE are served by the (user_id, column gin_trgm_ops) indexes
+    prefix = escape_like(query) + "%"
+    search_text = literal(query)
+
+    # a prefix match is what search as you type expects first, it scores above any fuzzy match
+    scores = [case((column.ilike(prefix), 1.0), else_=func.word_similarity(search_text, column)) for column in text_columns]
+    score = func.greatest(*scores) if len(scores) > 1 else scores[0]
+
+    return (
+        select(
+            literal(entity_type, String).label("entity_type"),
+            id_column.label("entity_id"),
+            cast(text_columns[0], Text).label("title"),
+            cast(text_columns[1] if len(text_columns) > 1 else null(), Text).label("detail"),
+            score.label("score"),
+        )
+        .where(
+            user_id_column == user_id,
+            # an inline 0, a bound parameter would not match the partial indexes under a generic plan
+            id_column.class_.is_deleted == literal_column("0"),
+            or_(*(
+                or_(search_text.op("<%")(column), column.ilike(prefix))
+                for column in text_columns
+            )),
+        )
+        .order_by(score.desc(), id_column.desc())
+        .limit(limit)
+    )
+
+async def quick_search_entities(
+        db: AsyncSession,
+        sources: dict[str, tuple[InstrumentedAttribute, InstrumentedAttribute, tuple]],
+        user_id: int,
+        query: str,
+        limit: int,
+) -> tuple[list[Row], DBOperationContext]:
+    # every table keeps its own top limit through its own index, UNION ALL sends them as one statement,
+    # one round trip on one connection, and the overall top limit is picked by Postgres
+    try:
+        matches = union_all(*(
+            quick_search_select(entity_type, id_column, user_id_column, text_columns, user_id, query, limit)
+            for entity_type, (id_column, user_id_column, text_columns) in sources.items()
+        )).subquery()
+
+        stmt = (
+            select(matches)
+            .order_by(matches.c.score.desc(), matches.c.entity_type, matches.c.entity_id.desc())
+            .limit(limit)
+        )
+
+        result = await db.execute(stmt)
+
+        return list(result.all()), DBOperationContext(success=True)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+
+        return [], DBOperationContext(
+            success=False,
+            exception_type=type(e).__name__,
+            exception_message=str(e)
+        )
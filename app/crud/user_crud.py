@@ -1,9 +1,13 @@
 from sqlalchemy.sql import expression
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func, literal
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from core.enums import SyncResult
 from core.models import User
 from schemas.auth_schema import UserRegister, UserResetPassword
-from utils.password_utils import hash_password
+from utils.password_utils import hash_password_async
+from utils.cache_utils import invalidate_user, set_token_generation
+from utils.db_utils import DBOperationContext
 
 async def get_user_by_id(db: AsyncSession, user_id: int):
     stmt = select(User).where(expression.column("user_id") == user_id)
@@ -20,27 +24,74 @@ async def get_user_by_username(db: AsyncSession, username: str):
     result = await db.execute(stmt)
     return result.scalars().first()
 
-async def reset_user_password(db: AsyncSession, user: UserResetPassword):
-    hashed_password = hash_password(user.password)
+async def get_user_token_generation(db: AsyncSession, user_id: int) -> int | None:
+    stmt = select(User.token_generation).where(User.user_id == user_id)
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+async def reset_user_password(db: AsyncSession, user: UserResetPassword) -> int | None:
+    hashed_password = await hash_password_async(user.password)
 
     stmt = (update(User)
             .where(expression.column("email") == user.email)
-            .values(password_hash=hashed_password, sync_state=4)
+            .values(password_hash=hashed_password, sync_state=4, token_generation=User.token_generation + 1)
+            .returning(User.user_id, User.token_generation)
             .execution_options(synchronize_session="fetch")
     )
 
-    await db.execute(stmt)
+    result = await db.execute(stmt)
+    updated_users = result.all()
     await db.commit()
 
-async def create_user(db: AsyncSession, user: UserRegister):
-    hashed_password = hash_password(user.password)
-    new_user = User(email=user.email, username=user.username, password_hash=hashed_password, sync_state=4)
-    db.add(new_user)
-    await db.flush()
-    new_user.server_id = new_user.user_id
+    # bumping the generation revokes every token issued before the reset
+    for user_id, token_generation in updated_users:
+        invalidate_user(user_id)
+        set_token_generation(user_id, token_generation)
+
+    return updated_users[0].token_generation if updated_users else None
+
+async def create_user(db: AsyncSession, user: UserRegister) -> tuple[User | None, DBOperationContext]:
+    hashed_password = await hash_password_async(user.password)
+
+    # server_id has to equal user_id, both come from the same nextval so the row is complete in one statement
+    next_user_id = select(
+        func.nextval(func.pg_get_serial_sequence(User.__tablename__, "user_id")).label("user_id")
+    ).cte("next_user_id")
+
+    stmt = (
+        insert(User)
+        .from_select(
+            ["user_id", "server_id", "email", "username", "password_hash", "sync_state"],
+            select(
+                next_user_id.c.user_id,
+                next_user_id.c.user_id,
+                literal(user.email),
+                literal(user.username),
+                literal(hashed_password),
+                literal(4),
+            ),
+        )
+        .on_conflict_do_nothing()
+        .returning(User)
+    )
+
+    result = await db.execute(stmt)
+    new_user = result.scalars().first()
     await db.commit()
-    await db.refresh(new_user)
-    return new_user
+
+    if new_user is not None:
+        return new_user, DBOperationContext(success=True)
+
+    # only a failed signup pays for the second round trip to find out which unique column collided
+    conflict_stmt = select(User.email).where((User.email == user.email) | (User.username == user.username))
+    conflict_result = await db.execute(conflict_stmt)
+    conflict_column = "email" if user.email in conflict_result.scalars().all() else "username"
+
+    return None, DBOperationContext(
+        success=False,
+        exception_type=SyncResult.CONFLICT,
+        exception_message=conflict_column
+    )
 
 async def get_pending_user(db: AsyncSession, user_id: int):
     stmt = select(User).where(
@@ -59,3 +110,4 @@ async def set_auth_sync_state(db: AsyncSession, user_id: int, sync_state: int):
 
     await db.execute(stmt)
     await db.commit()
+    invalidate_user(user_id)
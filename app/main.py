@@ -1,13 +1,18 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from core.database import engine
-from routers import raspi, auth, categories, reminders, events, notes
+from utils.password_utils import shutdown_password_pool
+from services.scheduler_services import reminder_scheduler
+from routers import raspi, auth, categories, reminders, events, notes, reconcile, ics, finances, lists, search
 
 @asynccontextmanager
 async def lifespan(api: FastAPI):
     # app starts here
+    reminder_scheduler.start()
     yield
+    await reminder_scheduler.stop()
     await engine.dispose()
+    shutdown_password_pool()
     # app shuts down here
 
 app = FastAPI(lifespan=lifespan)
@@ -19,3 +24,8 @@ app.include_router(categories.router, prefix="/categories", tags=["Categories"])
 app.include_router(reminders.router, prefix="/reminders", tags=["Reminders"])
 app.include_router(events.router, prefix="/events", tags=["Events"])
 app.include_router(notes.router, prefix="/notes", tags=["Notes"])
+app.include_router(finances.router, prefix="/finances", tags=["Finances"])
+app.include_router(lists.router, prefix="/lists", tags=["Lists"])
+app.include_router(search.router, prefix="/search", tags=["Search"])
+app.include_router(reconcile.router, prefix="/reconcile", tags=["Reconciliation"])
+app.include_router(ics.router, prefix="/ics", tags=["iCalendar"])
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Security
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.database import get_db
-from schemas.auth_schema import UserRegister, UserLogin, UserResponse, UserResetPassword, Token, AuthResponse, AuthSync
+from schemas.auth_schema import UserRegister, UserLogin, UserResponse, UserResetPassword, Token, TokenRefresh, AuthResponse, AuthSync
 from schemas.sync_schema import SyncRequest, SyncResponse
 from core.models import User
-from crud.user_crud import get_user_by_email, get_user_by_id, get_user_by_username, create_user, reset_user_password, get_pending_user, set_auth_sync_state
-from utils.auth_utils import create_access_token, get_current_user
-from utils.password_utils import verify_password, is_valid_password, do_passwords_match
+from crud.user_crud import get_user_by_email, get_user_by_id, create_user, reset_user_password, get_pending_user, set_auth_sync_state
+from utils.auth_utils import create_access_token, create_refresh_token, decode_token, get_current_user, \
+    validate_refresh_token, oauth2_scheme
+from utils.password_utils import verify_password_async, is_valid_password, do_passwords_match
 import re
 
 router = APIRouter()
@@ -43,28 +44,42 @@ def validate_passwords(password: str, password_again: str):
     if not do_passwords_match(password, password_again):
         raise HTTPException(status_code=400, detail={"code": 7, "message": "Passwords do not match!"})
 
-def get_access_token(user_id: int):
-    token_data = {"sub": user_id}
+def get_access_token(user_id: int, token_generation: int):
+    token_data = {"sub": user_id, "gen": token_generation}
     return create_access_token(data=token_data)
 
+def get_refresh_token(user_id: int, token_generation: int):
+    token_data = {"sub": user_id, "gen": token_generation}
+    return create_refresh_token(data=token_data)
+
+def get_auth_response(user, token_generation: int) -> AuthResponse:
+    return AuthResponse(
+        access_token=get_access_token(user.user_id, token_generation),
+        refresh_token=get_refresh_token(user.user_id, token_generation),
+        user=user
+    )
+
 @router.post("/register", response_model=AuthResponse)
 async def register(user: UserRegister, db: AsyncSession = Depends(get_db)):
     user.email = validate_email(user.email)
     user.username = user.username.strip()
 
-    if await get_user_by_email(db, user.email):
-        raise HTTPException(status_code=400, detail={"code": 8, "message": "Email is already taken!"})
     if not user.username:
         raise HTTPException(status_code=400, detail={"code": 9, "message": "Username field cannot be empty!"})
-    if await get_user_by_username(db, user.username):
-        raise HTTPException(status_code=400, detail={"code": 10, "message": "Username is already taken!"})
 
     user.password = validate_password(user.password)
     validate_password_strength(user.password)
     validate_passwords(user.password, user.password_again.strip())
-    new_user = await create_user(db, user)
 
-    return AuthResponse(access_token=get_access_token(new_user.user_id), user=new_user)
+    # uniqueness is enforced by the insert itself, so concurrent signups cannot both pass a pre-check
+    new_user, context = await create_user(db, user)
+
+    if not context.success:
+        if context.exception_message == "email":
+            raise HTTPException(status_code=400, detail={"code": 8, "message": "Email is already taken!"})
+        raise HTTPException(status_code=400, detail={"code": 10, "message": "Username is already taken!"})
+
+    return get_auth_response(new_user, new_user.token_generation)
 
 @router.post("/login", response_model=AuthResponse)
 async def login(user: UserLogin, db: AsyncSession = Depends(get_db)):
@@ -72,10 +87,10 @@ async def login(user: UserLogin, db: AsyncSession = Depends(get_db)):
     existing_user = await validate_email_existence(db, user.email)
 
     user.password = validate_password(user.password)
-    if not verify_password(user.password, existing_user.password_hash):
+    if not await verify_password_async(user.password, existing_user.password_hash):
         raise HTTPException(status_code=401, detail={"code": 8, "message": "Incorrect password!"})
 
-    return AuthResponse(access_token=get_access_token(existing_user.user_id), user=existing_user)
+    return get_auth_response(existing_user, existing_user.token_generation)
 
 @router.post("/reset-password", response_model=AuthResponse)
 async def reset_password(user: UserResetPassword, db: AsyncSession = Depends(get_db)):
@@ -85,18 +100,26 @@ async def reset_password(user: UserResetPassword, db: AsyncSession = Depends(get
     user.password = validate_password(user.password)
     validate_password_strength(user.password)
     validate_passwords(user.password, user.password_again.strip())
-    await reset_user_password(db, user)
+    token_generation = await reset_user_password(db, user)
 
-    return AuthResponse(access_token=get_access_token(existing_user.user_id), user=existing_user)
+    # the reset revoked every older token, the new pair is issued for the new generation
+    return get_auth_response(existing_user, token_generation)
 
 @router.post("/token-refresh", response_model=Token)
-async def token_refresh(current_user: UserResponse = Depends(get_current_user)):
-    return Token(access_token=get_access_token(current_user.user_id), token_type="bearer")
+async def token_refresh(request: TokenRefresh, db: AsyncSession = Depends(get_db)):
+    claims = await validate_refresh_token(db, request.refresh_token)
+
+    return Token(
+        access_token=get_access_token(claims.user_id, claims.generation),
+        refresh_token=get_refresh_token(claims.user_id, claims.generation),
+        token_type="bearer"
+    )
 
 # an example of a protected route by jwt
 @router.get("/me", response_model=AuthResponse)
-async def get_my_profile(current_user: UserResponse = Depends(get_current_user)):
-    return AuthResponse(access_token=get_access_token(current_user.user_id), user=current_user)
+async def get_my_profile(token: str = Security(oauth2_scheme), current_user: UserResponse = Depends(get_current_user)):
+    claims = decode_token(token)
+    return AuthResponse(access_token=get_access_token(current_user.user_id, claims.generation), user=current_user)
 
 @router.post("/sync", response_model=SyncResponse[AuthSync])
 async def auth_sync(request: SyncRequest[AuthSync], db: AsyncSession = Depends(get_db)):
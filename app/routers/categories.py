@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.database import get_db
-from schemas.category_schema import CategoryCreate, CategoryResponse, CategorySync
+from schemas.category_schema import CategoryCreate, CategoryResponse, CategorySync, CategoryStats
 from schemas.sync_schema import SyncRequest, SyncResponse
 from crud.category_crud import get_categories, add_category, remake_category, remove_category, make_category, get_category, set_category, get_pending_categories, set_category_sync_state
 from core.models import Category
+from services.category_services import category_stats_service
 from typing import List
 
 router = APIRouter()
@@ -24,6 +25,11 @@ async def create_category(category: CategoryCreate, db: AsyncSession = Depends(g
 async def get_all_category(user_id: int, db: AsyncSession = Depends(get_db)):
     return await get_categories(db, user_id)
 
+# note, event and finance counts and finance totals of every category of the user
+@router.get("/stats", response_model=List[CategoryStats])
+async def category_stats(user_id: int, db: AsyncSession = Depends(get_db)):
+    return await category_stats_service(db, user_id)
+
 @router.post("/update-category")
 async def update_category(category: CategoryResponse, db: AsyncSession = Depends(get_db)):
     validate_category_data(category.name, category.description)
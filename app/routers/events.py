@@ -1,18 +1,36 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.database import get_db
 from core.models import Event
 from schemas.sync_schema import SyncRequest, SyncResponse
-from schemas.event_schema import EventCreate, EventResponse, EventSync
+from schemas.event_schema import EventCreate, EventResponse, EventSync, EventPage, CalendarDay, TimeSlot
+from crud.category_crud import is_user_category
 from crud.event_crud import add_event, get_event, get_events, get_pending_events, set_event, set_event_sync_state, \
-    make_event, remove_event
+    make_event, remove_event, is_recurrence_parent
+from services.calendar_services import calendar_service
+from services.event_services import events_in_range_service, conflicts_service, free_slots_service
+from utils.date_time_converters import ms_to_datetime
+from utils.model_converters import to_recurrence_sync
+from utils.recurrence_utils import parse_recurrence_rule
 from typing import List
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
 
 router = APIRouter()
 
+def is_valid_recurrence_rule(recurrence_rule: str) -> bool:
+    if not recurrence_rule:
+        return True
+
+    try:
+        parse_recurrence_rule(recurrence_rule)
+        return True
+    except ValueError:
+        return False
+
 @router.post("/create-event")
 async def create_event(event: EventCreate, db: AsyncSession = Depends(get_db)):
+    if not is_valid_recurrence_rule(event.recurrence_rule):
+        raise HTTPException(status_code=400, detail={"code": 4, "message": "Invalid recurrence rule!"})
     await add_event(db, event)
 
 @router.get("/get-event-by-id", response_model=EventResponse)
@@ -23,6 +41,83 @@ async def get_event_by_id(event_id: int, db: AsyncSession = Depends(get_db)):
 async def get_all_event(user_id: int, db: AsyncSession = Depends(get_db)):
     return await get_events(db, user_id)
 
+# from and to are epoch milliseconds like every other date the app sends, both days are included
+@router.get("/get-events-in-range", response_model=EventPage)
+async def get_events_by_range(
+        user_id: int,
+        date_from: int = Query(alias="from"),
+        date_to: int = Query(alias="to"),
+        category_id: int | None = None,
+        cursor: str | None = None,
+        limit: int = Query(default=200, ge=1, le=500),
+        db: AsyncSession = Depends(get_db)
+):
+    return await events_in_range_service(
+        db=db,
+        user_id=user_id,
+        date_from=datetime.fromtimestamp(date_from / 1000).date(),
+        date_to=datetime.fromtimestamp(date_to / 1000).date(),
+        category_id=category_id,
+        cursor=cursor,
+        limit=limit
+    )
+
+# per day counts, highest priority and category colors for the month grid and agenda views
+@router.get("/calendar", response_model=List[CalendarDay])
+async def get_calendar(
+        user_id: int,
+        date_from: int = Query(alias="from"),
+        date_to: int = Query(alias="to"),
+        db: AsyncSession = Depends(get_db)
+):
+    return await calendar_service(
+        db=db,
+        user_id=user_id,
+        date_from=datetime.fromtimestamp(date_from / 1000).date(),
+        date_to=datetime.fromtimestamp(date_to / 1000).date()
+    )
+
+def validate_time_range(start: int, end: int):
+    if end <= start:
+        raise HTTPException(status_code=400, detail={"code": 5, "message": "End has to be after start!"})
+
+# events overlapping the slot of a new or moved event, exclude_event_id skips the event being moved
+@router.get("/conflicts", response_model=List[EventResponse])
+async def get_conflicts(
+        user_id: int,
+        start: int,
+        end: int,
+        exclude_event_id: int | None = None,
+        db: AsyncSession = Depends(get_db)
+):
+    validate_time_range(start, end)
+
+    return await conflicts_service(
+        db=db,
+        user_id=user_id,
+        range_start=ms_to_datetime(start),
+        range_end=ms_to_datetime(end),
+        exclude_event_id=exclude_event_id
+    )
+
+@router.get("/free-slots", response_model=List[TimeSlot])
+async def get_free_slots(
+        user_id: int,
+        date_from: int = Query(alias="from"),
+        date_to: int = Query(alias="to"),
+        min_duration: int = Query(default=15, ge=1), # minutes
+        db: AsyncSession = Depends(get_db)
+):
+    validate_time_range(date_from, date_to)
+
+    return await free_slots_service(
+        db=db,
+        user_id=user_id,
+        range_start=ms_to_datetime(date_from),
+        range_end=ms_to_datetime(date_to),
+        min_duration=timedelta(minutes=min_duration)
+    )
+
 @router.post("/sync", response_model=SyncResponse[EventSync])
 async def sync_event(request: SyncRequest[EventSync], db: AsyncSession = Depends(get_db)):
     acknowledged = []
@@ -40,6 +135,20 @@ async def sync_event(request: SyncRequest[EventSync], db: AsyncSession = Depends
         return SyncResponse(user_id=request.user_id, acknowledged=acknowledged, rejected=rejected)
 
     for event in request.changes:
+        if not is_valid_recurrence_rule(event.recurrence_rule):
+            rejected.append(event)
+            continue
+
+        if event.is_deleted == 0 and not await is_user_category(db, request.user_id, event.category_id):
+            rejected.append(event)
+            continue
+
+        # an override of an occurrence needs a recurring parent of the same user
+        if event.is_deleted == 0 and event.recurrence_parent_id != 0 and \
+                not await is_recurrence_parent(db, request.user_id, event.recurrence_parent_id):
+            rejected.append(event)
+            continue
+
         if event.server_id == 0:
             if event.is_deleted == 0:
                 new_event = await make_event(db, event)
@@ -50,7 +159,8 @@ async def sync_event(request: SyncRequest[EventSync], db: AsyncSession = Depends
             if event.is_deleted == 0:
                 existing_event = await get_event(db, event.server_id)
                 await set_event(db, event.server_id, event.category_id, event.reminder_id, event.title,
-                                event.description, event.date, event.start_time, event.end_time, event.priority, event.location, 0)
+                                event.description, event.date, event.start_time, event.end_time, event.priority, event.location, 0,
+                                event.recurrence_rule, event.recurrence_exceptions, event.recurrence_parent_id, event.recurrence_date)
                 await db.refresh(existing_event)
                 existing_event_data = EventSync(
                     event_id=event.event_id,
@@ -65,6 +175,7 @@ async def sync_event(request: SyncRequest[EventSync], db: AsyncSession = Depends
                     end_time=int(datetime.combine(existing_event.date, existing_event.end_time).timestamp() * 1000),
                     priority=existing_event.priority,
                     location=existing_event.location,
+                    **to_recurrence_sync(existing_event),
                     created_at=int(existing_event.created_at.timestamp() * 1000),
                     updated_at=int(existing_event.updated_at.timestamp() * 1000),
                     last_modified=int(existing_event.last_modified.timestamp() * 1000),
@@ -92,6 +203,7 @@ def to_reminder_sync(event: Event) -> EventSync:
         end_time=int(datetime.combine(event.date, event.start_time).timestamp() * 1000),
         priority=event.priority,
         location=event.location,
+        **to_recurrence_sync(event),
         created_at=int(event.created_at.timestamp() * 1000),
         updated_at=int(event.updated_at.timestamp() * 1000),
         last_modified=int(event.last_modified.timestamp() * 1000),
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, File, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database import get_db
+from schemas.finance_schema import FinanceSync, FinanceCreate, FinanceResponse, FinanceReport, FinanceImportResponse
+from schemas.sync_schema import SyncRequest, SyncResponse
+from services.finance_services import finance_sync_service, create_finance_service, get_finances_service, \
+    finance_report_service, import_finance_csv_service
+from typing import Literal
+
+router = APIRouter()
+
+@router.post("/create-finance", response_model=FinanceResponse)
+async def create_finance(finance: FinanceCreate, db: AsyncSession = Depends(get_db)) -> FinanceResponse:
+    return await create_finance_service(db=db, finance_data=finance)
+
+@router.get("/get-all-finance", response_model=list[FinanceResponse])
+async def get_all_finance(user_id: int, db: AsyncSession = Depends(get_db)) -> list[FinanceResponse]:
+    return await get_finances_service(db=db, user_id=user_id)
+
+# expense and income totals per month or year and category, start and end are epoch ms
+@router.get("/report", response_model=FinanceReport)
+async def finance_report(
+        user_id: int,
+        period: Literal["month", "year"] = "month",
+        start: int | None = None,
+        end: int | None = None,
+        db: AsyncSession = Depends(get_db)
+) -> FinanceReport:
+    return await finance_report_service(db=db, user_id=user_id, period=period, start=start, end=end)
+
+# bank statement or finance app export, rows already stored with the same date, amount and description are skipped,
+# date_format is a strptime format for dates the defaults do not recognize, decimal_separator is needed for amounts
+# like 1,234 or 1.234 that read as thousands in one export and as decimals in another, without it those rows are skipped
+@router.post("/import", response_model=FinanceImportResponse)
+async def import_finance(
+        user_id: int,
+        date_format: str | None = None,
+        decimal_separator: Literal[",", "."] | None = None,
+        file: UploadFile = File(...),
+        db: AsyncSession = Depends(get_db)
+) -> FinanceImportResponse:
+    return await import_finance_csv_service(
+        db=db,
+        user_id=user_id,
+        file=file,
+        date_format=date_format,
+        decimal_separator=decimal_separator
+    )
+
+@router.post("/sync", response_model=SyncResponse[FinanceSync])
+async def finance_sync(request: SyncRequest[FinanceSync], db: AsyncSession = Depends(get_db)) -> SyncResponse[FinanceSync]:
+    return await finance_sync_service(
+        request=request,
+        db=db
+    )
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, File, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database import get_db
+from schemas.ics_schema import IcsImportResponse
+from services.ics_services import export_ics_stream, import_ics_service
+
+router = APIRouter()
+
+# events become VEVENTs with their reminder as alarm, reminders without an event become VTODOs
+@router.get("/export")
+async def export_ics(user_id: int) -> StreamingResponse:
+    return StreamingResponse(
+        export_ics_stream(user_id),
+        media_type="text/calendar",
+        headers={"Content-Disposition": 'attachment; filename="maiplan.ics"'}
+    )
+
+# imported rows are stored as created, the clients download them on their next sync
+@router.post("/import", response_model=IcsImportResponse)
+async def import_ics(user_id: int, file: UploadFile = File(...), db: AsyncSession = Depends(get_db)) -> IcsImportResponse:
+    return await import_ics_service(
+        db=db,
+        user_id=user_id,
+        file=file
+    )
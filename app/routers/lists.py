@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database import get_db
+from schemas.list_schema import ListSync
+from schemas.sync_schema import SyncRequest, SyncResponse
+from services.list_services import list_sync_service
+
+router = APIRouter()
+
+# each list change carries its changed items, a list and all of its items are written in one transaction
+@router.post("/sync", response_model=SyncResponse[ListSync])
+async def list_sync(request: SyncRequest[ListSync], db: AsyncSession = Depends(get_db)) -> SyncResponse[ListSync]:
+    return await list_sync_service(
+        request=request,
+        db=db
+    )
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.database import get_db
-from schemas.note_schema import NoteSync
+from schemas.note_schema import NoteSync, NoteSearchPage, NoteListPage, NoteRevisionPage, NoteRevisionContent
 from schemas.sync_schema import SyncRequest, SyncResponse
-from services.note_services import note_sync_service
+from services.note_services import note_sync_service, note_search_service, note_list_service
+from services.note_revision_services import note_revisions_service, note_revision_service, restore_note_revision_service
 
 router = APIRouter()
 
@@ -12,4 +13,84 @@ async def note_sync(request: SyncRequest[NoteSync], db: AsyncSession = Depends(g
     return await note_sync_service(
         request=request,
         db=db
-    )
\ No newline at end of file
+    )
+
+# pinned notes first, then the most recently updated, each with a short preview instead of the content
+@router.get("/get-all-note", response_model=NoteListPage)
+async def get_all_note(
+        user_id: int,
+        category_id: int | None = None,
+        cursor: str | None = None,
+        limit: int = Query(default=50, ge=1, le=200),
+        db: AsyncSession = Depends(get_db)
+) -> NoteListPage:
+    return await note_list_service(
+        db=db,
+        user_id=user_id,
+        category_id=category_id,
+        cursor=cursor,
+        limit=limit
+    )
+
+# ranked full text search over title and content, q takes web search syntax: "exact phrase", or, -excluded
+@router.get("/search", response_model=NoteSearchPage)
+async def note_search(
+        user_id: int,
+        q: str,
+        cursor: str | None = None,
+        limit: int = Query(default=20, ge=1, le=100),
+        db: AsyncSession = Depends(get_db)
+) -> NoteSearchPage:
+    return await note_search_service(
+        db=db,
+        user_id=user_id,
+        query=q,
+        cursor=cursor,
+        limit=limit
+    )
+
+# earlier versions of a note, newest first, without their content
+@router.get("/revisions", response_model=NoteRevisionPage)
+async def note_revisions(
+        user_id: int,
+        note_id: int,
+        cursor: str | None = None,
+        limit: int = Query(default=50, ge=1, le=200),
+        db: AsyncSession = Depends(get_db)
+) -> NoteRevisionPage:
+    return await note_revisions_service(
+        db=db,
+        user_id=user_id,
+        note_id=note_id,
+        cursor=cursor,
+        limit=limit
+    )
+
+@router.get("/revision", response_model=NoteRevisionContent)
+async def note_revision(
+        user_id: int,
+        note_id: int,
+        revision: int,
+        db: AsyncSession = Depends(get_db)
+) -> NoteRevisionContent:
+    return await note_revision_service(
+        db=db,
+        user_id=user_id,
+        note_id=note_id,
+        revision=revision
+    )
+
+# the title and content of the revision become the latest version, the version they replace becomes a revision
+@router.post("/restore-revision", response_model=NoteSync)
+async def restore_note_revision(
+        user_id: int,
+        note_id: int,
+        revision: int,
+        db: AsyncSession = Depends(get_db)
+) -> NoteSync:
+    return await restore_note_revision_service(
+        db=db,
+        user_id=user_id,
+        note_id=note_id,
+        revision=revision
+    )
@@ -1,5 +1,9 @@
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
+from utils.cache_utils import get_cache_stats
+from utils.password_utils import get_password_pool_stats
+from services.scheduler_services import reminder_scheduler
+from services.balance_services import verify_balances
 import socket
 import time
 
@@ -24,3 +28,22 @@ async def health_check():
                 "hostname": hostname,
             }
         )
+
+@router.get("/cache-stats")
+async def cache_stats():
+    return JSONResponse(content=get_cache_stats())
+
+@router.get("/password-pool-stats")
+async def password_pool_stats():
+    return JSONResponse(content=get_password_pool_stats())
+
+
+@router.get("/scheduler-stats")
+async def scheduler_stats():
+    return JSONResponse(content=reminder_scheduler.stats())
+
+# recomputes every balance from the finance rows in batches, repair rewrites the ones that drifted,
+# a check for writes outside the app, the finance writes themselves keep the balance exact
+@router.post("/verify-balances")
+async def verify_user_balances(repair: bool = False):
+    return JSONResponse(content=await verify_balances(repair=repair))
\ No newline at end of file
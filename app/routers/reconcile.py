@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database import get_db
+from schemas.reconcile_schema import ReconcileTreeRequest, ReconcileTreeResponse, ReconcileBucketRequest, \
+    ReconcileBucketResponse
+from services.reconcile_services import reconcile_tree_service, reconcile_buckets_service
+
+router = APIRouter()
+
+# the client walks the tree level by level starting at level 0 index 0 and only asks for children of mismatching nodes
+@router.post("/tree", response_model=ReconcileTreeResponse)
+async def reconcile_tree(request: ReconcileTreeRequest, db: AsyncSession = Depends(get_db)) -> ReconcileTreeResponse:
+    return await reconcile_tree_service(
+        request=request,
+        db=db
+    )
+
+# the client sends its leaves for the mismatching buckets, differing server rows are queued for the next sync download
+@router.post("/buckets", response_model=ReconcileBucketResponse)
+async def reconcile_buckets(request: ReconcileBucketRequest, db: AsyncSession = Depends(get_db)) -> ReconcileBucketResponse:
+    return await reconcile_buckets_service(
+        request=request,
+        db=db
+    )
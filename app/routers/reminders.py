@@ -2,11 +2,15 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.database import get_db
 from core.models import Reminder
-from schemas.reminder_schema import ReminderCreate, ReminderResponse, ReminderSync
+from schemas.reminder_schema import ReminderCreate, ReminderResponse, ReminderSync, DayReminders
 from schemas.sync_schema import SyncResponse
 from crud.reminder_crud import add_reminder, get_reminder, get_reminders, get_pending_reminders, \
     set_reminder_sync_state, make_reminder, remove_reminder, set_reminder
+from services.reminder_services import day_reminders_service
+from services.scheduler_services import reminder_scheduler
+from utils.date_time_converters import ms_to_datetime
 from typing import List
+from datetime import datetime, date
 
 from schemas.sync_schema import SyncRequest
 
@@ -14,7 +18,9 @@ router = APIRouter()
 
 @router.post("/create-reminder")
 async def create_reminder(reminder: ReminderCreate, db: AsyncSession = Depends(get_db)):
-    return await add_reminder(db, reminder)
+    reminder_id = await add_reminder(db, reminder)
+    reminder_scheduler.notify(reminder_id, reminder.user_id, datetime.fromtimestamp(reminder.reminder_time), reminder.frequency, reminder.status, reminder.message)
+    return reminder_id
 
 @router.get("/get-reminder-by-id", response_model=ReminderResponse)
 async def get_reminder_by_id(reminder_id: int, db: AsyncSession = Depends(get_db)):
@@ -24,6 +30,12 @@ async def get_reminder_by_id(reminder_id: int, db: AsyncSession = Depends(get_db
 async def get_all_reminder(user_id: int, db: AsyncSession = Depends(get_db)):
     return await get_reminders(db, user_id)
 
+# occurrences of one-off, repeating and health reminders for a day, today when no date is given
+@router.get("/today", response_model=DayReminders)
+async def get_today_reminders(user_id: int, day: int | None = None, db: AsyncSession = Depends(get_db)):
+    day_date = ms_to_datetime(day).date() if day is not None else date.today()
+    return await day_reminders_service(db, user_id, day_date)
+
 @router.post("/sync", response_model=SyncResponse[ReminderSync])
 async def reminder_sync(request: SyncRequest[ReminderSync], db: AsyncSession = Depends(get_db)):
     acknowledged = []
@@ -44,6 +56,7 @@ async def reminder_sync(request: SyncRequest[ReminderSync], db: AsyncSession = D
         if reminder.server_id == 0:
             if reminder.is_deleted == 0:
                 new_reminder = await make_reminder(db, reminder)
+                reminder_scheduler.notify(new_reminder.server_id, new_reminder.user_id, ms_to_datetime(new_reminder.reminder_time), new_reminder.frequency, new_reminder.status, new_reminder.message)
                 acknowledged.append(new_reminder)
             else:
                 rejected.append(reminder)
@@ -52,6 +65,7 @@ async def reminder_sync(request: SyncRequest[ReminderSync], db: AsyncSession = D
                 existing_reminder = await get_reminder(db, reminder.server_id)
                 await set_reminder(db, reminder.server_id, reminder.reminder_time, reminder.frequency, reminder.status, reminder.message, 0)
                 await db.refresh(existing_reminder)
+                reminder_scheduler.notify(existing_reminder.reminder_id, existing_reminder.user_id, existing_reminder.reminder_time, existing_reminder.frequency, existing_reminder.status, existing_reminder.message)
                 existing_reminder_data = ReminderSync(
                     reminder_id=reminder.reminder_id,
                     server_id=existing_reminder.server_id,
@@ -69,6 +83,7 @@ async def reminder_sync(request: SyncRequest[ReminderSync], db: AsyncSession = D
                 acknowledged.append(existing_reminder_data)
             else:
                 await remove_reminder(db, reminder.server_id)
+                reminder_scheduler.discard(reminder.server_id)
                 rejected.append(reminder)
 
     return SyncResponse(user_id=request.user_id, acknowledged=acknowledged, rejected=rejected)
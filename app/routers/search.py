@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database import get_db
+from schemas.search_schema import QuickSearchResponse
+from services.search_services import quick_search_service
+
+router = APIRouter()
+
+# fuzzy and prefix matches over note, event and list titles, event locations and category names
+@router.get("/quick", response_model=QuickSearchResponse)
+async def quick_search(
+        user_id: int,
+        q: str,
+        limit: int = Query(default=10, ge=1, le=50),
+        db: AsyncSession = Depends(get_db)
+) -> QuickSearchResponse:
+    return await quick_search_service(db=db, user_id=user_id, query=q, limit=limit)
@@ -2,8 +2,12 @@ from pydantic import BaseModel
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: str
     token_type: str
 
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
 class UserResetPassword(BaseModel):
     email: str
     password: str
@@ -29,6 +33,7 @@ class UserResponse(BaseModel):
 
 class AuthResponse(BaseModel):
     access_token: str
+    refresh_token: str | None = None
     user: UserResponse
 
     class Config:
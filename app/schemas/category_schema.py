@@ -1,3 +1,4 @@
+from decimal import Decimal
 from pydantic import BaseModel
 
 class CategoryCreate(BaseModel):
@@ -33,3 +34,11 @@ class CategorySync(BaseModel):
 
     class Config:
         from_attributes = True # auto conversion from ORM model to pydantic schema
+
+class CategoryStats(BaseModel):
+    category_id: int
+    note_count: int
+    event_count: int
+    finance_count: int
+    expense_total: Decimal
+    income_total: Decimal
\ No newline at end of file
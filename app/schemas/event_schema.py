@@ -1,3 +1,4 @@
+from typing import List
 from pydantic import BaseModel
 
 class EventCreate(BaseModel):
@@ -11,6 +12,7 @@ class EventCreate(BaseModel):
     end_time: int
     priority: int
     location: str
+    recurrence_rule: str = "" # empty for one-off events
 
 class EventResponse(BaseModel):
     event_id: int
@@ -23,6 +25,7 @@ class EventResponse(BaseModel):
     end_time: int
     priority: int
     location: str
+    recurrence_rule: str = ""
 
     class Config:
         from_attributes = True # auto conversion from ORM model to pydantic schema
@@ -40,6 +43,10 @@ class EventSync(BaseModel):
     end_time: int
     priority: int
     location: str
+    recurrence_rule: str = ""
+    recurrence_exceptions: List[int] = [] # skipped occurrence dates in ms
+    recurrence_parent_id: int = 0 # server id of the recurring event an override replaces an occurrence of
+    recurrence_date: int = 0 # original occurrence date of an override in ms
     created_at: int
     updated_at: int
     last_modified: int
@@ -48,3 +55,17 @@ class EventSync(BaseModel):
 
     class Config:
         from_attributes = True # auto conversion from ORM model to pydantic schema
+
+class EventPage(BaseModel):
+    events: List[EventResponse]
+    next_cursor: str | None = None # pass back as cursor to get the next page, None on the last page
+
+class CalendarDay(BaseModel):
+    date: int
+    event_count: int
+    max_priority: int
+    colors: dict[str, int] # category color -> number of events, events without a category are counted under ""
+
+class TimeSlot(BaseModel):
+    start: int
+    end: int
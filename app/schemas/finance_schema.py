@@ -0,0 +1,57 @@
+from decimal import Decimal
+from pydantic import BaseModel
+
+class FinanceCreate(BaseModel):
+    user_id: int
+    category_id: int
+    reminder_id: int
+    type: bool
+    expense_amount: Decimal
+    expense_date: int
+    description: str
+
+class FinanceResponse(BaseModel):
+    finance_id: int
+    category_id: int
+    reminder_id: int
+    type: bool
+    expense_amount: Decimal
+    expense_date: int
+    description: str
+
+class FinanceSync(BaseModel):
+    finance_id: int
+    server_id: int
+    user_id: int
+    category_id: int
+    reminder_id: int
+    type: bool
+    expense_amount: Decimal
+    expense_date: int
+    description: str
+    last_modified: int
+    sync_state: int
+    is_deleted: int
+
+    class Config:
+        from_attributes = True # auto conversion from ORM model to pydantic schema
+
+class FinanceReportRow(BaseModel):
+    period: int # first day of the month or year
+    category_id: int
+    expense_total: Decimal
+    income_total: Decimal
+    entry_count: int
+
+class FinanceReport(BaseModel):
+    user_id: int
+    period: str
+    expense_total: Decimal
+    income_total: Decimal
+    rows: list[FinanceReportRow]
+
+class FinanceImportResponse(BaseModel):
+    user_id: int
+    imported: int
+    duplicates: int
+    skipped: int
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+class IcsImportResponse(BaseModel):
+    user_id: int
+    events: int
+    reminders: int
+    skipped: int
@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+
+class ListItemSync(BaseModel):
+    item_id: int
+    server_id: int
+    list_id: int
+    name: str
+    quantity: int
+    status: bool
+    last_modified: int
+    sync_state: int
+    is_deleted: int
+
+    class Config:
+        from_attributes = True # auto conversion from ORM model to pydantic schema
+
+class ListSync(BaseModel):
+    list_id: int
+    server_id: int
+    user_id: int
+    title: str
+    created_at: int
+    updated_at: int
+    last_modified: int
+    sync_state: int
+    is_deleted: int
+    items: list[ListItemSync] = [] # changed items only, a list change may carry none
+
+    class Config:
+        from_attributes = True # auto conversion from ORM model to pydantic schema
@@ -16,4 +16,49 @@ class NoteSync(BaseModel):
     is_pinned: int
 
     class Config:
-        from_attributes = True # auto conversion from ORM model to pydantic schema
\ No newline at end of file
+        from_attributes = True # auto conversion from ORM model to pydantic schema
+
+class NoteSearchResult(BaseModel):
+    note_id: int
+    category_id: int
+    title: str # matched words wrapped in StartSel and StopSel of the headline options
+    snippet: str
+    rank: float
+    is_pinned: int
+    updated_at: int
+
+class NoteSearchPage(BaseModel):
+    results: list[NoteSearchResult]
+    next_cursor: str | None = None # pass back as cursor to get the next page, None on the last page
+
+class NoteListItem(BaseModel):
+    note_id: int
+    category_id: int
+    reminder_id: int
+    title: str
+    preview: str # start of the content, the full content comes with the note sync
+    is_pinned: int
+    created_at: int
+    updated_at: int
+
+class NoteListPage(BaseModel):
+    notes: list[NoteListItem]
+    next_cursor: str | None = None # pass back as cursor to get the next page, None on the last page
+
+class NoteRevisionItem(BaseModel):
+    revision: int
+    title: str
+    content_length: int
+    is_keyframe: bool
+    created_at: int # when this version was written
+
+class NoteRevisionPage(BaseModel):
+    revisions: list[NoteRevisionItem]
+    next_cursor: str | None = None # pass back as cursor to get the next page, None on the last page
+
+class NoteRevisionContent(BaseModel):
+    note_id: int
+    revision: int
+    title: str
+    content: str
+    created_at: int
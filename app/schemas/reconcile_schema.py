@@ -0,0 +1,42 @@
+from typing import List
+from pydantic import BaseModel
+from core.enums import EntityType
+
+class MerkleNode(BaseModel):
+    level: int
+    index: int
+    hash: str
+
+class MerkleLeaf(BaseModel):
+    server_id: int
+    last_modified: int
+    content_hash: str
+
+class ReconcileTreeRequest(BaseModel):
+    user_id: int
+    entity_type: EntityType
+    level: int
+    indexes: List[int]
+
+class ReconcileTreeResponse(BaseModel):
+    user_id: int
+    entity_type: EntityType
+    bucket_size: int
+    fanout: int
+    depth: int
+    nodes: List[MerkleNode]
+
+class ReconcileBucket(BaseModel):
+    index: int
+    leaves: List[MerkleLeaf]
+
+class ReconcileBucketRequest(BaseModel):
+    user_id: int
+    entity_type: EntityType
+    buckets: List[ReconcileBucket]
+
+class ReconcileBucketResponse(BaseModel):
+    user_id: int
+    entity_type: EntityType
+    queued: List[int] # server ids that differ, marked pending so the next sync downloads them
+    missing: List[int] # server ids the client has but the server does not
@@ -1,3 +1,4 @@
+from typing import List
 from pydantic import BaseModel
 
 class ReminderCreate(BaseModel):
@@ -32,4 +33,21 @@ class ReminderSync(BaseModel):
     is_deleted: int
 
     class Config:
-        from_attributes = True # auto conversion from ORM model to pydantic schema
\ No newline at end of file
+        from_attributes = True # auto conversion from ORM model to pydantic schema
+
+class ReminderOccurrence(BaseModel):
+    reminder_id: int
+    occurrence_time: int
+    frequency: int
+    message: str
+
+class HealthReminderOccurrence(BaseModel):
+    reminder_id: int
+    type: int
+    occurrence_time: int
+
+class DayReminders(BaseModel):
+    user_id: int
+    date: int
+    reminders: List[ReminderOccurrence]
+    health_reminders: List[HealthReminderOccurrence]
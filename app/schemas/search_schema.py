@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from core.enums import EntityType
+
+class QuickSearchResult(BaseModel):
+    entity_type: EntityType
+    entity_id: int
+    title: str # note, event and list title or category name
+    detail: str # event location, empty for the other entities
+    score: float # 1 for a prefix match, the trigram word similarity otherwise
+
+class QuickSearchResponse(BaseModel):
+    query: str
+    results: list[QuickSearchResult]
+    partial: bool # True when the search did not answer within the time budget, the results are empty then
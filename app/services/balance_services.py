@@ -0,0 +1,50 @@
+import os
+from core.database import async_session
+from crud.finance_crud import get_balance_batch, repair_balances
+
+BALANCE_BATCH_SIZE = int(os.getenv("BALANCE_BATCH_SIZE", "500"))
+MAX_REPORTED_DRIFTS = 100
+
+async def verify_balances(repair: bool = False, batch_size: int = BALANCE_BATCH_SIZE) -> dict:
+    # walks users in keyset batches, each batch in its own short session so no snapshot or lock is held for
+    # the whole run, balances that differ from their finance rows are reported and optionally rewritten
+    checked = 0
+    drifted = 0
+    repaired = 0
+    drifts = []
+    after_user_id = 0
+
+    while True:
+        async with async_session() as db:
+            rows, context = await get_balance_batch(db, after_user_id, batch_size)
+
+            if not context.success:
+                return {
+                    "checked": checked,
+                    "drifted": drifted,
+                    "repaired": repaired,
+                    "drifts": drifts,
+                    "error": context.exception_type,
+                }
+
+            batch_drifts = [row for row in rows if row.balance != row.derived]
+
+            if repair and batch_drifts:
+                repair_context = await repair_balances(db, [row.user_id for row in batch_drifts])
+
+                if repair_context.success:
+                    repaired += len(batch_drifts)
+
+        checked += len(rows)
+        drifted += len(batch_drifts)
+        drifts.extend(
+            {"user_id": row.user_id, "balance": str(row.balance), "derived": str(row.derived)}
+            for row in batch_drifts[:MAX_REPORTED_DRIFTS - len(drifts)]
+        )
+
+        if len(rows) < batch_size:
+            break
+
+        after_user_id = rows[-1].user_id
+
+    return {"checked": checked, "drifted": drifted, "repaired": repaired, "drifts": drifts}
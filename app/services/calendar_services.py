@@ -0,0 +1,86 @@
+from datetime import date, datetime, time, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from crud.event_crud import get_calendar_rows, get_recurring_events
+from schemas.event_schema import CalendarDay
+from services.event_services import expand_event
+from utils.cache_utils import calendar_cache
+from utils.date_time_converters import datetime_to_ms
+
+def month_start(value: date) -> date:
+    return value.replace(day=1)
+
+def next_month(value: date) -> date:
+    return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def months_in_range(date_from: date, date_to: date) -> list[date]:
+    months = []
+    month = month_start(date_from)
+
+    while month <= date_to:
+        months.append(month)
+        month = next_month(month)
+
+    return months
+
+async def load_calendar_months(db: AsyncSession, user_id: int, months: list[date]) -> dict[date, list[CalendarDay]]:
+    # a single grouped query covers every missing month, the result is split per month for the cache
+    load_from = months[0]
+    load_to = next_month(months[-1]) - timedelta(days=1)
+    rows = await get_calendar_rows(db, user_id, load_from, load_to)
+    recurring_rows = await get_recurring_events(db, user_id, load_from, load_to)
+
+    days: dict[date, CalendarDay] = {}
+
+    def add_to_day(day_date: date, color: str | None, event_count: int, priority: int | None):
+        day = days.get(day_date)
+
+        if day is None:
+            day = CalendarDay(
+                date=datetime_to_ms(datetime.combine(day_date, time.min)),
+                event_count=0,
+                max_priority=0,
+                colors={},
+            )
+            days[day_date] = day
+
+        color = color or ""
+        day.event_count += event_count
+        day.max_priority = max(day.max_priority, priority or 0)
+        day.colors[color] = day.colors.get(color, 0) + event_count
+
+    for row in rows:
+        add_to_day(row.date, row.color, row.event_count, row.max_priority)
+
+    # recurring series are not rows per occurrence, they are expanded for the loaded window only
+    for event, color in recurring_rows:
+        for occurrence in expand_event(event, load_from, load_to):
+            add_to_day(occurrence, color, 1, event.priority)
+
+    loaded: dict[date, list[CalendarDay]] = {month: [] for month in months}
+
+    for day_date in sorted(days):
+        month = month_start(day_date)
+
+        if month in loaded:
+            loaded[month].append(days[day_date])
+
+    return loaded
+
+async def calendar_service(db: AsyncSession, user_id: int, date_from: date, date_to: date) -> list[CalendarDay]:
+    months = months_in_range(date_from, date_to)
+    # an event write while the months load bumps the generation, the merged months are then served but not cached
+    generation = calendar_cache.generation(user_id)
+    cached_months: dict[date, list[CalendarDay]] = calendar_cache.get(user_id) or {}
+    missing_months = [month for month in months if month not in cached_months]
+
+    if missing_months:
+        loaded = await load_calendar_months(db, user_id, missing_months)
+        cached_months = {**cached_months, **loaded}
+        calendar_cache.set(user_id, cached_months, generation=generation)
+
+    return [
+        day
+        for month in months
+        for day in cached_months[month]
+        if date_from <= datetime.fromtimestamp(day.date / 1000).date() <= date_to
+    ]
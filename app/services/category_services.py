@@ -0,0 +1,16 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from crud.category_crud import get_category_stats
+from schemas.category_schema import CategoryStats
+from utils.cache_utils import category_stats_cache
+
+async def category_stats_service(db: AsyncSession, user_id: int) -> list[CategoryStats]:
+    stats: list[CategoryStats] | None = category_stats_cache.get(user_id)
+
+    if stats is None:
+        # a note, event, finance or category write while the stats load bumps the generation, they are then not cached
+        generation = category_stats_cache.generation(user_id)
+        rows = await get_category_stats(db, user_id)
+        stats = [CategoryStats.model_validate(row, from_attributes=True) for row in rows]
+        category_stats_cache.set(user_id, stats, generation=generation)
+
+    return stats
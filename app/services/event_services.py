@@ -0,0 +1,168 @@
+import heapq
+from datetime import date, datetime, time, timedelta
+from typing import Iterator
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.models import Event
+from crud.event_crud import get_events_in_range, get_recurring_events, get_overlapping_events
+from schemas.event_schema import EventPage, EventResponse, TimeSlot
+from utils.date_time_converters import datetime_to_ms
+from utils.model_converters import to_event_response
+from utils.recurrence_utils import parse_recurrence_rule, iter_occurrences
+
+EventKey = tuple[date, time, int] # keyset order of the range query: (date, start_time, event_id)
+
+def encode_event_cursor(key: EventKey) -> str:
+    event_date, start_time, event_id = key
+    return f"{event_date.isoformat()}_{start_time.isoformat()}_{event_id}"
+
+def decode_event_cursor(cursor: str) -> EventKey:
+    try:
+        date_value, start_time, event_id = cursor.split("_")
+        return date.fromisoformat(date_value), time.fromisoformat(start_time), int(event_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail={"code": 1, "message": "Invalid cursor!"})
+
+def expand_event(event: Event, window_start: date, window_end: date) -> Iterator[date]:
+    # occurrences are generated lazily for the window only, nothing is materialized in the table
+    exceptions = [date.fromisoformat(value) for value in event.recurrence_exceptions or []]
+
+    return iter_occurrences(
+        event.date,
+        parse_recurrence_rule(event.recurrence_rule),
+        window_start,
+        window_end,
+        exceptions,
+    )
+
+def iter_event_keys(event: Event, window_start: date, window_end: date) -> Iterator[tuple[EventKey, Event]]:
+    for occurrence in expand_event(event, window_start, window_end):
+        yield (occurrence, event.start_time or time.min, event.event_id), event
+
+def iter_occurrence_keys(events: list[Event], window_start: date, window_end: date) -> Iterator[tuple[EventKey, Event]]:
+    # each series yields in date order, merging them keeps the whole stream in keyset order
+    return heapq.merge(
+        *(iter_event_keys(event, window_start, window_end) for event in events),
+        key=lambda item: item[0],
+    )
+
+async def events_in_range_service(
+        db: AsyncSession,
+        user_id: int,
+        date_from: date,
+        date_to: date,
+        category_id: int | None,
+        cursor: str | None,
+        limit: int
+) -> EventPage:
+    after = decode_event_cursor(cursor) if cursor else None
+
+    # one extra row tells whether there is a next page
+    events = await get_events_in_range(db, user_id, date_from, date_to, category_id, after, limit + 1)
+    recurring_events = [event for event, _ in await get_recurring_events(db, user_id, date_from, date_to, category_id)]
+
+    one_off = (((event.date, event.start_time or time.min, event.event_id), event) for event in events)
+    occurrences = (
+        item for item in iter_occurrence_keys(recurring_events, date_from, date_to)
+        if after is None or item[0] > after
+    )
+
+    page: list[tuple[EventKey, Event]] = []
+
+    for item in heapq.merge(one_off, occurrences, key=lambda item: item[0]):
+        page.append(item)
+
+        if len(page) > limit:
+            break
+
+    has_next = len(page) > limit
+    page = page[:limit]
+
+    return EventPage(
+        events=[to_event_response(event, key[0]) for key, event in page],
+        next_cursor=encode_event_cursor(page[-1][0]) if has_next else None,
+    )
+
+def event_interval(event: Event, occurrence_date: date | None = None) -> tuple[datetime, datetime]:
+    # same bounds as the generated time_range column, used for expanded occurrences that have no row
+    event_date = occurrence_date or event.date
+
+    if event.start_time is None:
+        start = datetime.combine(event_date, time.min)
+        return start, start + timedelta(days=1)
+
+    start = datetime.combine(event_date, event.start_time)
+
+    if event.end_time is None or event.end_time == event.start_time:
+        return start, start
+
+    end_date = event_date + timedelta(days=1) if event.end_time < event.start_time else event_date
+    return start, datetime.combine(end_date, event.end_time)
+
+def interval_overlaps(interval: tuple[datetime, datetime], range_start: datetime, range_end: datetime) -> bool:
+    start, end = interval
+
+    if start == end:
+        return range_start <= start < range_end
+
+    return start < range_end and range_start < end
+
+async def get_busy_events(
+        db: AsyncSession,
+        user_id: int,
+        range_start: datetime,
+        range_end: datetime,
+        exclude_event_id: int | None = None
+) -> list[tuple[datetime, datetime, Event, date]]:
+    events = await get_overlapping_events(db, user_id, range_start, range_end, exclude_event_id)
+    busy = [(*event_interval(event), event, event.date) for event in events]
+
+    # an occurrence that starts the day before can run past midnight into the range
+    window_start = range_start.date() - timedelta(days=1)
+    window_end = range_end.date()
+
+    for event, _ in await get_recurring_events(db, user_id, window_start, window_end):
+        if event.event_id == exclude_event_id:
+            continue
+
+        for occurrence in expand_event(event, window_start, window_end):
+            interval = event_interval(event, occurrence)
+
+            if interval_overlaps(interval, range_start, range_end):
+                busy.append((*interval, event, occurrence))
+
+    busy.sort(key=lambda item: (item[0], item[2].event_id))
+    return busy
+
+async def conflicts_service(
+        db: AsyncSession,
+        user_id: int,
+        range_start: datetime,
+        range_end: datetime,
+        exclude_event_id: int | None
+) -> list[EventResponse]:
+    busy = await get_busy_events(db, user_id, range_start, range_end, exclude_event_id)
+    return [to_event_response(event, occurrence) for _, _, event, occurrence in busy]
+
+async def free_slots_service(
+        db: AsyncSession,
+        user_id: int,
+        range_start: datetime,
+        range_end: datetime,
+        min_duration: timedelta
+) -> list[TimeSlot]:
+    busy = await get_busy_events(db, user_id, range_start, range_end)
+
+    slots: list[TimeSlot] = []
+    free_from = range_start
+
+    for start, end, _, _ in busy:
+        if start - free_from >= min_duration:
+            slots.append(TimeSlot(start=datetime_to_ms(free_from), end=datetime_to_ms(start)))
+
+        free_from = max(free_from, end)
+
+    if range_end - free_from >= min_duration:
+        slots.append(TimeSlot(start=datetime_to_ms(free_from), end=datetime_to_ms(range_end)))
+
+    return slots
@@ -0,0 +1,549 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Literal
+from fastapi import HTTPException, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.enums import EntityType, SyncResult, SyncAction
+from core.models import Finance
+from crud.category_crud import is_user_category, get_category_map
+from crud.finance_crud import get_pending_finances, set_finance_sync_state, create_finance, get_finance, delete_finance, \
+    update_finance, get_finances, get_finance_report, get_existing_finance_keys, add_finances_bulk
+from crud.sync_log_crud import create_sync_log
+from schemas.finance_schema import FinanceSync, FinanceCreate, FinanceResponse, FinanceReport, FinanceReportRow, \
+    FinanceImportResponse
+from schemas.sync_schema import SyncRequest, SyncResponse
+from utils.csv_utils import iter_csv_records, map_csv_columns, csv_field, parse_csv_date, parse_csv_amount, \
+    parse_csv_type
+from utils.date_time_converters import datetime_to_ms, ms_to_datetime
+from utils.model_converters import to_finance_sync, to_finance, to_finance_response
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_SYNC_STATE = 4 # same state a created row gets, the clients download imported rows on their next sync
+
+def finance_snapshot(finance: Finance) -> dict:
+    return to_finance_sync(finance).model_dump()
+
+async def create_finance_service(db: AsyncSession, finance_data: FinanceCreate) -> FinanceResponse:
+    if not await is_user_category(db, finance_data.user_id, finance_data.category_id):
+        raise HTTPException(status_code=400, detail={"code": 1, "message": "Category does not belong to the user!"})
+
+    finance, context = await create_finance(db=db, finance=Finance(
+        user_id=finance_data.user_id,
+        category_id=finance_data.category_id or None,
+        reminder_id=finance_data.reminder_id or None,
+        type=finance_data.type,
+        expense_amount=finance_data.expense_amount,
+        expense_date=ms_to_datetime(finance_data.expense_date),
+        description=finance_data.description,
+    ))
+
+    if not context.success or finance is None:
+        raise HTTPException(status_code=500, detail={"code": 2, "message": "Could not create finance record!"})
+
+    return to_finance_response(finance)
+
+async def get_finances_service(db: AsyncSession, user_id: int) -> list[FinanceResponse]:
+    finances, context = await get_finances(db=db, user_id=user_id)
+
+    if not context.success:
+        raise HTTPException(status_code=500, detail={"code": 3, "message": "Could not read finance records!"})
+
+    return [to_finance_response(finance) for finance in finances]
+
+async def finance_report_service(
+        db: AsyncSession,
+        user_id: int,
+        period: Literal["month", "year"],
+        start: int | None = None,
+        end: int | None = None
+) -> FinanceReport:
+    # the rollups hold whole months, the bounds are widened to the months they fall in
+    start_month = ms_to_datetime(start).date().replace(day=1) if start is not None else None
+    end_month = month_after(ms_to_datetime(end).date()) if end is not None else None
+
+    rows, context = await get_finance_report(
+        db=db,
+        user_id=user_id,
+        yearly=period == "year",
+        start=start_month,
+        end=end_month,
+    )
+
+    if not context.success:
+        raise HTTPException(status_code=500, detail={"code": 3, "message": "Could not read finance records!"})
+
+    report_rows = [
+        FinanceReportRow(
+            period=datetime_to_ms(datetime.combine(row.period, time.min)),
+            category_id=row.category_id,
+            expense_total=row.expense_total,
+            income_total=row.income_total,
+            entry_count=row.entry_count,
+        )
+        for row in rows
+    ]
+
+    return FinanceReport(
+        user_id=user_id,
+        period=period,
+        expense_total=sum((row.expense_total for row in report_rows), Decimal(0)),
+        income_total=sum((row.income_total for row in report_rows), Decimal(0)),
+        rows=report_rows,
+    )
+
+async def import_finance_csv_service(
+        db: AsyncSession,
+        user_id: int,
+        file: UploadFile,
+        date_format: str | None = None,
+        decimal_separator: str | None = None
+) -> FinanceImportResponse:
+    # the upload is parsed record by record and copied in batches, a large statement is never fully in memory
+    records = iter_csv_records(file.read)
+    header = await anext(records, None)
+    columns = map_csv_columns(header or [])
+
+    if "date" not in columns or "amount" not in columns:
+        raise HTTPException(status_code=400, detail={"code": 5, "message": "CSV needs a date and an amount column!"})
+
+    # a category column is matched to the user's categories by name, unknown names import without a category
+    category_map = await get_category_map(db, user_id)
+    categories = {category.name.strip().lower(): category_id for category_id, category in category_map.items()}
+    batch: dict[tuple, Finance] = {}
+    imported = duplicates = skipped = 0
+
+    async for record in records:
+        try:
+            finance = to_import_finance(user_id, record, columns, categories, date_format, decimal_separator)
+        except (ValueError, IndexError):
+            skipped += 1
+            continue
+
+        key = (finance.expense_date, finance.expense_amount, finance.description)
+
+        if key in batch:
+            duplicates += 1
+            continue
+
+        batch[key] = finance
+
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            added = await import_finance_batch(db, user_id, batch)
+            imported += added
+            duplicates += len(batch) - added
+            batch = {}
+
+    if batch:
+        added = await import_finance_batch(db, user_id, batch)
+        imported += added
+        duplicates += len(batch) - added
+
+    return FinanceImportResponse(user_id=user_id, imported=imported, duplicates=duplicates, skipped=skipped)
+
+async def import_finance_batch(db: AsyncSession, user_id: int, batch: dict[tuple, Finance]) -> int:
+    existing, context = await get_existing_finance_keys(db, user_id, list(batch))
+
+    if not context.success:
+        raise HTTPException(status_code=500, detail={"code": 6, "message": "Could not import finance records!"})
+
+    finances = [finance for key, finance in batch.items() if key not in existing]
+
+    if not finances:
+        return 0
+
+    context = await add_finances_bulk(db, user_id, finances)
+
+    if not context.success:
+        raise HTTPException(status_code=500, detail={"code": 6, "message": "Could not import finance records!"})
+
+    return len(finances)
+
+def to_import_finance(
+        user_id: int,
+        record: list[str],
+        columns: dict[str, int],
+        categories: dict[str, int],
+        date_format: str | None,
+        decimal_separator: str | None
+) -> Finance:
+    # raises ValueError or IndexError for a row that cannot be imported
+    amount = parse_csv_amount(record[columns["amount"]], decimal_separator)
+
+    return Finance(
+        user_id=user_id,
+        category_id=categories.get(csv_field(record, columns, "category").lower()),
+        reminder_id=None,
+        type=parse_csv_type(csv_field(record, columns, "type"), amount),
+        expense_amount=abs(amount),
+        expense_date=parse_csv_date(record[columns["date"]], date_format),
+        description=csv_field(record, columns, "description"),
+        last_modified=datetime.now(),
+        sync_state=IMPORT_SYNC_STATE,
+        is_deleted=0,
+    )
+
+def month_after(day: date) -> date:
+    return date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)
+
+async def finance_sync_service(db: AsyncSession, request: SyncRequest[FinanceSync]) -> SyncResponse[FinanceSync]:
+    acknowledged: list[FinanceSync] = []
+    rejected: list[FinanceSync] = []
+
+    change = request.changes[0] if request.changes else None
+
+    if not change:
+        await log_finance_sync(
+            db=db,
+            user_id=request.user_id,
+            action=SyncAction.SYNC_UPLOAD,
+            result=SyncResult.NO_CHANGES,
+        )
+
+        acknowledged = await process_pending_download_finances(db=db, user_id=request.user_id)
+
+        return SyncResponse(user_id=request.user_id, acknowledged=acknowledged, rejected=rejected)
+
+    for finance_sync in request.changes:
+        try:
+            if finance_sync.user_id != request.user_id:
+                rejected.append(finance_sync)
+
+                await log_finance_sync(
+                    db=db,
+                    user_id=request.user_id,
+                    entity_id=finance_sync.server_id if finance_sync.server_id != 0 else None,
+                    old_data=finance_sync.model_dump(),
+                    new_data=None,
+                    action=SyncAction.SYNC_UPLOAD,
+                    result=SyncResult.FAILED,
+                    exception_type="UserMismatch",
+                    exception_message="Finance user_id does not match sync request user_id.",
+                )
+
+                continue
+
+            if finance_sync.is_deleted == 0 and not await is_user_category(db, request.user_id, finance_sync.category_id):
+                rejected.append(finance_sync)
+
+                await log_finance_sync(
+                    db=db,
+                    user_id=request.user_id,
+                    entity_id=finance_sync.server_id if finance_sync.server_id != 0 else None,
+                    old_data=None,
+                    new_data=finance_sync.model_dump(),
+                    action=SyncAction.SYNC_UPLOAD,
+                    result=SyncResult.FAILED,
+                    exception_type="InvalidCategory",
+                    exception_message="Finance category_id is not a category of the sync request user.",
+                )
+
+                continue
+
+            # finance was created locally and needs to be created on the server
+            if finance_sync.server_id == 0 and finance_sync.is_deleted == 0:
+                new_finance = to_finance(finance_sync)
+
+                created_finance, context = await create_finance(db=db, finance=new_finance)
+
+                if not context.success or created_finance is None:
+                    rejected.append(finance_sync)
+
+                    await log_finance_sync(
+                        db=db,
+                        user_id=request.user_id,
+                        entity_id=None,
+                        old_data=None,
+                        new_data=finance_sync.model_dump(),
+                        action=SyncAction.SYNC_UPLOAD,
+                        result=SyncResult.FAILED,
+                        exception_type=context.exception_type,
+                        exception_message=context.exception_message,
+                    )
+
+                    continue
+
+                acknowledged_finance = to_finance_sync(created_finance)
+                acknowledged_finance.finance_id = finance_sync.finance_id
+                acknowledged.append(acknowledged_finance)
+
+                await log_finance_sync(
+                    db=db,
+                    user_id=request.user_id,
+                    entity_id=created_finance.finance_id,
+                    old_data=None,
+                    new_data=finance_snapshot(created_finance),
+                    action=SyncAction.SYNC_UPLOAD,
+                    result=SyncResult.SUCCESS,
+                )
+
+            # finance was created locally but deleted before reaching server
+            elif finance_sync.server_id == 0 and finance_sync.is_deleted == 1:
+                rejected.append(finance_sync)
+
+                await log_finance_sync(
+                    db=db,
+                    user_id=request.user_id,
+                    entity_id=None,
+                    old_data=finance_sync.model_dump(),
+                    new_data=None,
+                    action=SyncAction.SYNC_UPLOAD,
+                    result=SyncResult.NO_CHANGES,
+                    exception_type="LocalOnlyDeletedFinance",
+                    exception_message="Finance was created locally and deleted before it was synced to the server."
+                )
+
+            # finance exists on the sever and was updated locally
+            elif finance_sync.server_id != 0 and finance_sync.is_deleted == 0:
+                existing_finance, context = await get_finance(
+                    db=db,
+                    finance_id=finance_sync.server_id,
+                )
+
+                if not context.success or existing_finance is None:
+                    rejected.append(finance_sync)
+
+                    await log_finance_sync(
+                        db=db,
+                        user_id=request.user_id,
+                        entity_id=finance_sync.server_id,
+                        old_data=None,
+                        new_data=finance_sync.model_dump(),
+                        action=SyncAction.SYNC_UPLOAD,
+                        result=SyncResult.FAILED,
+                        exception_type=context.exception_type,
+                        exception_message=context.exception_message or "Finance DB record not found.",
+                    )
+
+                    continue
+
+                if existing_finance.user_id != request.user_id:
+                    rejected.append(finance_sync)
+
+                    await log_finance_sync(
+                        db=db,
+                        user_id=request.user_id,
+                        entity_id=finance_sync.server_id,
+                        old_data=finance_snapshot(existing_finance),
+                        new_data=finance_sync.model_dump(),
+                        action=SyncAction.SYNC_UPLOAD,
+                        result=SyncResult.FAILED,
+                        exception_type="UserMismatch",
+                        exception_message="Finance DB record does not belong to sync request user_id.",
+                    )
+
+                    continue
+
+                old_data = finance_snapshot(existing_finance)
+
+                updated_finance, context = await update_finance(
+                    db=db,
+                    finance_id=finance_sync.server_id,
+                    finance_data=finance_sync,
+                )
+
+                if not context.success or updated_finance is None:
+                    rejected.append(finance_sync)
+
+                    await log_finance_sync(
+                        db=db,
+                        user_id=request.user_id,
+                        entity_id=finance_sync.server_id,
+                        old_data=old_data,
+                        new_data=finance_sync.model_dump(),
+                        action=SyncAction.SYNC_UPLOAD,
+                        result=SyncResult.FAILED,
+                        exception_type=context.exception_type,
+                        exception_message=context.exception_message,
+                    )
+
+                    continue
+
+                new_data = finance_snapshot(updated_finance)
+
+                acknowledged_finance = to_finance_sync(updated_finance)
+                acknowledged.append(acknowledged_finance)
+
+                await log_finance_sync(
+                    db=db,
+                    user_id=request.user_id,
+                    entity_id=updated_finance.finance_id,
+                    old_data=old_data,
+                    new_data=new_data,
+                    action=SyncAction.SYNC_UPLOAD,
+                    result=SyncResult.SUCCESS,
+                )
+
+            # finance exists on the sever and was deleted locally
+            elif finance_sync.server_id != 0 and finance_sync.is_deleted == 1:
+                existing_finance, context = await get_finance(
+                    db=db,
+                    finance_id=finance_sync.server_id,
+                )
+
+                if not context.success or existing_finance is None:
+                    rejected.append(finance_sync)
+
+                    await log_finance_sync(
+                        db=db,
+                        user_id=request.user_id,
+                        entity_id=finance_sync.server_id,
+                        old_data=None,
+                        new_data=finance_sync.model_dump(),
+                        action=SyncAction.SYNC_UPLOAD,
+                        result=SyncResult.FAILED,
+                        exception_type=context.exception_type,
+                        exception_message=context.exception_message or "Finance DB record not found.",
+                    )
+
+                    continue
+
+                if existing_finance.user_id != request.user_id:
+                    rejected.append(finance_sync)
+
+                    await log_finance_sync(
+                        db=db,
+                        user_id=request.user_id,
+                        entity_id=finance_sync.server_id,
+                        old_data=finance_snapshot(existing_finance),
+                        new_data=None,
+                        action=SyncAction.SYNC_UPLOAD,
+                        result=SyncResult.FAILED,
+                        exception_type="UserMismatch",
+                        exception_message="Finance DB record does not belong to sync request user_id.",
+                    )
+
+                    continue
+
+                old_data = finance_snapshot(existing_finance)
+
+                delete_context = await delete_finance(
+                    db=db,
+                    finance_id=finance_sync.server_id,
+                )
+
+                if not delete_context.success:
+                    rejected.append(finance_sync)
+
+                    await log_finance_sync(
+                        db=db,
+                        user_id=request.user_id,
+                        entity_id=finance_sync.server_id,
+                        old_data=old_data,
+                        new_data=None,
+                        action=SyncAction.SYNC_UPLOAD,
+                        result=SyncResult.FAILED,
+                        exception_type=delete_context.exception_type,
+                        exception_message=delete_context.exception_message,
+                    )
+
+                    continue
+
+                # acknowledge the delete if it succeeded
+                acknowledged.append(finance_sync)
+
+                await log_finance_sync(
+                    db=db,
+                    user_id=request.user_id,
+                    entity_id=finance_sync.server_id,
+                    old_data=old_data,
+                    new_data=None,
+                    action=SyncAction.SYNC_UPLOAD,
+                    result=SyncResult.SUCCESS,
+                )
+
+        except Exception as e:
+            rejected.append(finance_sync)
+
+            await log_finance_sync(
+                db=db,
+                user_id=request.user_id,
+                entity_id=finance_sync.server_id if finance_sync.server_id != 0 else None,
+                old_data=finance_sync.model_dump(),
+                new_data=None,
+                action=SyncAction.SYNC_UPLOAD,
+                result=SyncResult.FAILED,
+                exception_type=type(e).__name__,
+                exception_message=str(e),
+            )
+
+    pending_download_finances = await process_pending_download_finances(
+        db=db,
+        user_id=request.user_id,
+    )
+
+    acknowledged.extend(pending_download_finances)
+
+    return SyncResponse(user_id=request.user_id, acknowledged=acknowledged, rejected=rejected)
+
+async def process_pending_download_finances(
+    db: AsyncSession,
+    user_id: int
+) -> list[FinanceSync]:
+
+    acknowledged: list[FinanceSync] = []
+
+    pending_finances, context = await get_pending_finances(db, user_id)
+
+    if not context.success:
+        await log_finance_sync(
+            db=db,
+            user_id=user_id,
+            action=SyncAction.SYNC_DOWNLOAD,
+            result=SyncResult.NO_CHANGES,
+        )
+        return acknowledged
+
+    for pending_finance in pending_finances:
+        old_data = finance_snapshot(pending_finance)
+
+        sync_state_result = await set_finance_sync_state(
+            db=db,
+            finance_id=pending_finance.finance_id,
+            sync_state=0,
+        )
+
+        if not sync_state_result.success:
+            continue
+
+        await db.refresh(pending_finance)
+
+        new_data = finance_snapshot(pending_finance)
+
+        finance_sync = to_finance_sync(pending_finance)
+        acknowledged.append(finance_sync)
+
+        await log_finance_sync(
+            db=db,
+            user_id=user_id,
+            entity_id=pending_finance.finance_id,
+            old_data=old_data,
+            new_data=new_data,
+            action=SyncAction.SYNC_DOWNLOAD,
+            result=SyncResult.SUCCESS,
+        )
+
+    return acknowledged
+
+async def log_finance_sync(
+    db: AsyncSession,
+    user_id: int,
+    action: SyncAction,
+    result: SyncResult,
+    entity_id: int | None = None,
+    old_data: dict | None = None,
+    new_data: dict | None = None,
+    exception_type: str | None = None,
+    exception_message: str | None = None,
+):
+    await create_sync_log(
+        db=db,
+        user_id=user_id,
+        entity_type=EntityType.FINANCE,
+        entity_id=entity_id,
+        old_data=old_data,
+        new_data=new_data,
+        action=action,
+        result=result,
+        exception_type=exception_type,
+        exception_message=exception_message,
+    )
@@ -0,0 +1,253 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import AsyncIterator
+from fastapi import UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database import async_session
+from core.models import Event, Reminder
+from crud.event_crud import stream_export_events, add_events_bulk
+from crud.reminder_crud import stream_export_reminders, add_reminders_bulk
+from schemas.ics_schema import IcsImportResponse
+from services.scheduler_services import reminder_scheduler
+from utils.ics_utils import escape_text, unescape_text, fold_line, format_date, format_date_time, \
+    parse_content_line, parse_date_time, split_date_time, iter_unfolded_lines
+from utils.model_converters import to_recurrence_columns
+
+EXPORT_BATCH_SIZE = 500
+IMPORT_BATCH_SIZE = 1000
+IMPORT_SYNC_STATE = 4 # same state a created row gets, the clients download imported rows on their next sync
+PRODUCT_ID = "-//MaiPlan//Server//EN"
+
+Properties = dict[str, tuple[dict[str, str], str]]
+
+def format_timestamp(value: datetime | None) -> str:
+    # DTSTAMP has to be UTC, stored times are naive local times
+    value = value or datetime.now()
+    return format_date_time(value.astimezone(timezone.utc)) + "Z"
+
+def to_alarm_lines(trigger: datetime, message: str | None) -> list[str]:
+    return [
+        "BEGIN:VALARM",
+        "ACTION:DISPLAY",
+        f"DESCRIPTION:{escape_text(message) or 'Reminder'}",
+        f"TRIGGER;VALUE=DATE-TIME:{format_date_time(trigger)}",
+        "END:VALARM",
+    ]
+
+def to_vevent(event: Event, reminder_time: datetime | None, reminder_message: str | None) -> str:
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:event-{event.event_id}@maiplan",
+        f"DTSTAMP:{format_timestamp(event.last_modified)}",
+    ]
+
+    if event.start_time is None:
+        lines.append(f"DTSTART;VALUE=DATE:{format_date(event.date)}")
+        lines.append(f"DTEND;VALUE=DATE:{format_date(event.date + timedelta(days=1))}")
+    else:
+        lines.append(f"DTSTART:{format_date_time(datetime.combine(event.date, event.start_time))}")
+
+        if event.end_time is not None and event.end_time != event.start_time:
+            end_date = event.date + timedelta(days=1) if event.end_time < event.start_time else event.date
+            lines.append(f"DTEND:{format_date_time(datetime.combine(end_date, event.end_time))}")
+
+    lines.append(f"SUMMARY:{escape_text(event.title)}")
+
+    if event.description:
+        lines.append(f"DESCRIPTION:{escape_text(event.description)}")
+    if event.location:
+        lines.append(f"LOCATION:{escape_text(event.location)}")
+    if event.priority:
+        lines.append(f"X-MAIPLAN-PRIORITY:{event.priority}")
+
+    if event.recurrence_rule:
+        lines.append(f"RRULE:{event.recurrence_rule.removeprefix('RRULE:')}")
+
+        exceptions = [date.fromisoformat(value) for value in event.recurrence_exceptions or []]
+
+        if exceptions and event.start_time is None:
+            lines.append("EXDATE;VALUE=DATE:" + ",".join(format_date(value) for value in exceptions))
+        elif exceptions:
+            lines.append("EXDATE:" + ",".join(
+                format_date_time(datetime.combine(value, event.start_time)) for value in exceptions
+            ))
+
+    if reminder_time is not None:
+        lines.extend(to_alarm_lines(reminder_time, reminder_message or event.title))
+
+    lines.append("END:VEVENT")
+    return "".join(fold_line(line) for line in lines)
+
+def to_vtodo(reminder: Reminder) -> str:
+    lines = [
+        "BEGIN:VTODO",
+        f"UID:reminder-{reminder.reminder_id}@maiplan",
+        f"DTSTAMP:{format_timestamp(reminder.last_modified)}",
+        f"SUMMARY:{escape_text(reminder.message)}",
+        f"DUE:{format_date_time(reminder.reminder_time)}",
+        *to_alarm_lines(reminder.reminder_time, reminder.message),
+        "END:VTODO",
+    ]
+
+    return "".join(fold_line(line) for line in lines)
+
+async def export_ics_stream(user_id: int) -> AsyncIterator[str]:
+    # the response outlives the request scoped session, so the stream opens its own
+    yield "".join(fold_line(line) for line in ("BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODUCT_ID}", "CALSCALE:GREGORIAN"))
+
+    async with async_session() as db:
+        async for partition in stream_export_events(db, user_id, EXPORT_BATCH_SIZE):
+            yield "".join(to_vevent(event, reminder_time, message) for event, reminder_time, message in partition)
+
+        async for partition in stream_export_reminders(db, user_id, EXPORT_BATCH_SIZE):
+            yield "".join(to_vtodo(reminder) for reminder in partition)
+
+    yield fold_line("END:VCALENDAR")
+
+def get_text(properties: Properties, name: str, max_length: int | None = None) -> str:
+    _, value = properties.get(name, ({}, ""))
+    return unescape_text(value)[:max_length]
+
+def get_date_time(properties: Properties, name: str) -> datetime | date | None:
+    if name not in properties:
+        return None
+
+    params, value = properties[name]
+    return parse_date_time(value, params)
+
+def to_event_row(user_id: int, properties: Properties, exdates: list[tuple[dict[str, str], str]]) -> dict | None:
+    # raises ValueError for malformed dates or a rule the expansion engine does not understand
+    start = get_date_time(properties, "DTSTART")
+
+    if start is None:
+        return None
+
+    event_date, start_time = split_date_time(start)
+    end = get_date_time(properties, "DTEND") if start_time is not None else None
+    end_time = split_date_time(end)[1] if end is not None else None
+
+    _, recurrence_rule = properties.get("RRULE", ({}, ""))
+    recurrence = to_recurrence_columns(recurrence_rule, event_date)
+
+    if recurrence_rule:
+        exceptions = sorted({
+            split_date_time(parse_date_time(value, params))[0].isoformat()
+            for params, values in exdates
+            for value in values.split(",")
+        })
+        recurrence["recurrence_exceptions"] = exceptions or None
+
+    _, priority = properties.get("X-MAIPLAN-PRIORITY", ({}, "0"))
+
+    return {
+        "user_id": user_id,
+        "title": get_text(properties, "SUMMARY", 255),
+        "description": get_text(properties, "DESCRIPTION") or None,
+        "date": event_date,
+        "start_time": start_time,
+        "end_time": end_time,
+        "priority": int(priority),
+        "location": get_text(properties, "LOCATION", 255) or None,
+        **recurrence,
+        "sync_state": IMPORT_SYNC_STATE,
+        "is_deleted": 0,
+    }
+
+def to_reminder_row(user_id: int, properties: Properties) -> dict | None:
+    due = get_date_time(properties, "DUE") or get_date_time(properties, "DTSTART")
+
+    if due is None:
+        return None
+
+    reminder_date, reminder_time = split_date_time(due)
+
+    return {
+        "user_id": user_id,
+        "reminder_time": datetime.combine(reminder_date, reminder_time or time.min),
+        "message": get_text(properties, "SUMMARY") or None,
+        "sync_state": IMPORT_SYNC_STATE,
+        "is_deleted": 0,
+    }
+
+async def import_ics_service(db: AsyncSession, user_id: int, file: UploadFile) -> IcsImportResponse:
+    # the upload is parsed line by line and written in batches, a large calendar is never fully in memory
+    event_rows: list[dict] = []
+    reminder_rows: list[dict] = []
+    imported_events = imported_reminders = skipped = 0
+
+    components: list[str] = []
+    properties: Properties = {}
+    exdates: list[tuple[dict[str, str], str]] = []
+
+    async for line in iter_unfolded_lines(file.read):
+        try:
+            name, params, value = parse_content_line(line)
+        except ValueError:
+            continue
+
+        if name == "BEGIN":
+            components.append(value.upper())
+
+            if len(components) == 2:
+                properties, exdates = {}, []
+            continue
+
+        if name == "END":
+            component = components.pop() if components else ""
+
+            # only top level components of the calendar are imported, alarms inside them are not
+            if len(components) != 1 or component not in ("VEVENT", "VTODO"):
+                continue
+
+            try:
+                if component == "VEVENT":
+                    row = to_event_row(user_id, properties, exdates)
+                    rows = event_rows
+                else:
+                    row = to_reminder_row(user_id, properties)
+                    rows = reminder_rows
+            except ValueError:
+                # malformed dates and rules the expansion engine does not support are counted as skipped
+                row = None
+
+            if row is None:
+                skipped += 1
+                continue
+
+            rows.append(row)
+
+            if len(event_rows) >= IMPORT_BATCH_SIZE:
+                await add_events_bulk(db, user_id, event_rows)
+                imported_events += len(event_rows)
+                event_rows = []
+
+            if len(reminder_rows) >= IMPORT_BATCH_SIZE:
+                await add_reminders_bulk(db, user_id, reminder_rows)
+                imported_reminders += len(reminder_rows)
+                reminder_rows = []
+            continue
+
+        if len(components) != 2:
+            continue
+
+        if name == "EXDATE":
+            exdates.append((params, value))
+        else:
+            properties.setdefault(name, (params, value))
+
+    if event_rows:
+        await add_events_bulk(db, user_id, event_rows)
+        imported_events += len(event_rows)
+
+    if reminder_rows:
+        await add_reminders_bulk(db, user_id, reminder_rows)
+        imported_reminders += len(reminder_rows)
+
+    if imported_reminders:
+        reminder_scheduler.reload()
+
+    return IcsImportResponse(
+        user_id=user_id,
+        events=imported_events,
+        reminders=imported_reminders,
+        skipped=skipped,
+    )
@@ -0,0 +1,338 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.enums import EntityType, SyncResult, SyncAction
+from core.models import List
+from crud.list_crud import get_list, get_list_item_names, save_list, get_pending_lists, set_lists_sync_state
+from crud.sync_log_crud import create_sync_log
+from schemas.list_schema import ListSync, ListItemSync
+from schemas.sync_schema import SyncRequest, SyncResponse
+from utils.model_converters import to_list_sync, to_list_item_sync
+
+def list_snapshot(list_row: List) -> dict:
+    return to_list_sync(list_row).model_dump()
+
+def split_item_changes(
+        items: list[ListItemSync],
+        item_names: dict[int, str]
+) -> tuple[list[ListItemSync], list[int], list[ListItemSync], list[ListItemSync]]:
+    # (items to upsert, item ids to soft delete, deleted items to acknowledge, rejected items)
+    upserts: dict[str, ListItemSync] = {}
+    deleted_ids: list[int] = []
+    deleted: list[ListItemSync] = []
+    rejected: list[ListItemSync] = []
+
+    for item in items:
+        # created locally and deleted before reaching the server, or not an item of this list
+        if (item.server_id == 0 and item.is_deleted == 1) or (item.server_id != 0 and item.server_id not in item_names):
+            rejected.append(item)
+            continue
+
+        if item.is_deleted == 1:
+            deleted_ids.append(item.server_id)
+            deleted.append(item)
+            continue
+
+        # items are identified by name within a list, a renamed item leaves its old row behind as deleted
+        if item.server_id != 0 and item_names[item.server_id] != item.name:
+            deleted_ids.append(item.server_id)
+
+        # one upsert cannot touch a row twice, the latest change of a name wins
+        current = upserts.get(item.name)
+
+        if current is None or item.last_modified >= current.last_modified:
+            if current is not None:
+                rejected.append(current)
+
+            upserts[item.name] = item
+        else:
+            rejected.append(item)
+
+    return list(upserts.values()), deleted_ids, deleted, rejected
+
+async def list_sync_service(db: AsyncSession, request: SyncRequest[ListSync]) -> SyncResponse[ListSync]:
+    acknowledged: list[ListSync] = []
+    rejected: list[ListSync] = []
+
+    change = request.changes[0] if request.changes else None
+
+    if not change:
+        await log_list_sync(
+            db=db,
+            user_id=request.user_id,
+            action=SyncAction.SYNC_UPLOAD,
+            result=SyncResult.NO_CHANGES,
+        )
+
+        acknowledged = await process_pending_download_lists(db=db, user_id=request.user_id)
+
+        return SyncResponse(user_id=request.user_id, acknowledged=acknowledged, rejected=rejected)
+
+    for list_sync in request.changes:
+        try:
+            if list_sync.user_id != request.user_id:
+                rejected.append(list_sync)
+
+                await log_list_sync(
+                    db=db,
+                    user_id=request.user_id,
+                    entity_id=list_sync.server_id if list_sync.server_id != 0 else None,
+                    old_data=list_sync.model_dump(),
+                    new_data=None,
+                    action=SyncAction.SYNC_UPLOAD,
+                    result=SyncResult.FAILED,
+                    exception_type="UserMismatch",
+                    exception_message="List user_id does not match sync request user_id.",
+                )
+
+                continue
+
+            # list was created locally but deleted before reaching server
+            if list_sync.server_id == 0 and list_sync.is_deleted == 1:
+                rejected.append(list_sync)
+
+                await log_list_sync(
+                    db=db,
+                    user_id=request.user_id,
+                    entity_id=None,
+                    old_data=list_sync.model_dump(),
+                    new_data=None,
+                    action=SyncAction.SYNC_UPLOAD,
+                    result=SyncResult.NO_CHANGES,
+                    exception_type="LocalOnlyDeletedList",
+                    exception_message="List was created locally and deleted before it was synced to the server."
+                )
+
+                continue
+
+            existing_list: List | None = None
+            item_names: dict[int, str] = {}
+            old_data: dict | None = None
+
+            # list exists on the server and was updated or deleted locally
+            if list_sync.server_id != 0:
+                existing_list, context = await get_list(db=db, list_id=list_sync.server_id)
+
+                if not context.success or existing_list is None:
+                    rejected.append(list_sync)
+
+                    await log_list_sync(
+                        db=db,
+                        user_id=request.user_id,
+                        entity_id=list_sync.server_id,
+                        old_data=None,
+                        new_data=list_sync.model_dump(),
+                        action=SyncAction.SYNC_UPLOAD,
+                        result=SyncResult.FAILED,
+                        exception_type=context.exception_type,
+                        exception_message=context.exception_message or "List DB record not found.",
+                    )
+
+                    continue
+
+                if existing_list.user_id != request.user_id:
+                    rejected.append(list_sync)
+
+                    await log_list_sync(
+                        db=db,
+                        user_id=request.user_id,
+                        entity_id=list_sync.server_id,
+                        old_data=list_snapshot(existing_list),
+                        new_data=list_sync.model_dump(),
+                        action=SyncAction.SYNC_UPLOAD,
+                        result=SyncResult.FAILED,
+                        exception_type="UserMismatch",
+                        exception_message="List DB record does not belong to sync request user_id.",
+                    )
+
+                    continue
+
+                old_data = list_snapshot(existing_list)
+
+                if list_sync.items:
+                    item_names, context = await get_list_item_names(db=db, list_id=existing_list.list_id)
+
+                    if not context.success:
+                        rejected.append(list_sync)
+
+                        await log_list_sync(
+                            db=db,
+                            user_id=request.user_id,
+                            entity_id=list_sync.server_id,
+                            old_data=old_data,
+                            new_data=list_sync.model_dump(),
+                            action=SyncAction.SYNC_UPLOAD,
+                            result=SyncResult.FAILED,
+                            exception_type=context.exception_type,
+                            exception_message=context.exception_message,
+                        )
+
+                        continue
+
+            upserted_items, deleted_item_ids, deleted_items, rejected_items = split_item_changes(list_sync.items, item_names)
+
+            saved, context = await save_list(
+                db=db,
+                list_sync=list_sync,
+                existing_list=existing_list,
+                upserted_items=upserted_items,
+                deleted_item_ids=deleted_item_ids,
+            )
+
+            if not context.success or saved is None:
+                rejected.append(list_sync)
+
+                await log_list_sync(
+                    db=db,
+                    user_id=request.user_id,
+                    entity_id=list_sync.server_id if list_sync.server_id != 0 else None,
+                    old_data=old_data,
+                    new_data=list_sync.model_dump(),
+                    action=SyncAction.SYNC_UPLOAD,
+                    result=SyncResult.FAILED,
+                    exception_type=context.exception_type,
+                    exception_message=context.exception_message,
+                )
+
+                continue
+
+            list_row, list_items = saved
+
+            # the client ids of the items are echoed back, the rows are matched by name
+            client_item_ids = {item.name: item.item_id for item in upserted_items}
+            acknowledged_items = []
+
+            for list_item in list_items:
+                acknowledged_item = to_list_item_sync(list_item)
+                acknowledged_item.item_id = client_item_ids.get(list_item.name, list_item.item_id)
+                acknowledged_items.append(acknowledged_item)
+
+            acknowledged_list = to_list_sync(list_row)
+            acknowledged_list.list_id = list_sync.list_id
+            acknowledged_list.items = acknowledged_items + deleted_items if not list_row.is_deleted else []
+            acknowledged.append(acknowledged_list)
+
+            if rejected_items:
+                rejected.append(list_sync.model_copy(update={"items": rejected_items}))
+
+            await log_list_sync(
+                db=db,
+                user_id=request.user_id,
+                entity_id=list_row.list_id,
+                old_data=old_data,
+                new_data=list_snapshot(list_row),
+                action=SyncAction.SYNC_UPLOAD,
+                result=SyncResult.SUCCESS,
+            )
+
+            # one entry for all item changes of the list instead of one per item
+            if list_sync.items:
+                await log_list_sync(
+                    db=db,
+                    user_id=request.user_id,
+                    entity_type=EntityType.LIST_ITEM,
+                    entity_id=list_row.list_id,
+                    old_data=None,
+                    new_data={
+                        "upserted": len(list_items),
+                        "deleted": len(deleted_items),
+                        "rejected": len(rejected_items),
+                    },
+                    action=SyncAction.SYNC_UPLOAD,
+                    result=SyncResult.SUCCESS,
+                )
+
+        except Exception as e:
+            rejected.append(list_sync)
+
+            await log_list_sync(
+                db=db,
+                user_id=request.user_id,
+                entity_id=list_sync.server_id if list_sync.server_id != 0 else None,
+                old_data=list_sync.model_dump(),
+                new_data=None,
+                action=SyncAction.SYNC_UPLOAD,
+                result=SyncResult.FAILED,
+                exception_type=type(e).__name__,
+                exception_message=str(e),
+            )
+
+    pending_download_lists = await process_pending_download_lists(
+        db=db,
+        user_id=request.user_id,
+    )
+
+    acknowledged.extend(pending_download_lists)
+
+    return SyncResponse(user_id=request.user_id, acknowledged=acknowledged, rejected=rejected)
+
+async def process_pending_download_lists(
+    db: AsyncSession,
+    user_id: int
+) -> list[ListSync]:
+
+    acknowledged: list[ListSync] = []
+
+    pending_lists, context = await get_pending_lists(db, user_id)
+
+    if not context.success:
+        await log_list_sync(
+            db=db,
+            user_id=user_id,
+            action=SyncAction.SYNC_DOWNLOAD,
+            result=SyncResult.NO_CHANGES,
+        )
+        return acknowledged
+
+    if not pending_lists:
+        return acknowledged
+
+    # every pending list and item is cleared with one statement per table
+    sync_state_result = await set_lists_sync_state(
+        db=db,
+        list_ids=[list_row.list_id for list_row, _ in pending_lists],
+        item_ids=[list_item.item_id for _, list_items in pending_lists for list_item in list_items],
+        sync_state=0,
+    )
+
+    if not sync_state_result.success:
+        return acknowledged
+
+    for list_row, list_items in pending_lists:
+        list_sync = to_list_sync(list_row, list_items)
+        acknowledged.append(list_sync)
+
+        await log_list_sync(
+            db=db,
+            user_id=user_id,
+            entity_id=list_row.list_id,
+            old_data=None,
+            new_data=list_sync.model_dump(),
+            action=SyncAction.SYNC_DOWNLOAD,
+            result=SyncResult.SUCCESS,
+        )
+
+    return acknowledged
+
+async def log_list_sync(
+    db: AsyncSession,
+    user_id: int,
+    action: SyncAction,
+    result: SyncResult,
+    entity_type: EntityType = EntityType.LIST,
+    entity_id: int | None = None,
+    old_data: dict | None = None,
+    new_data: dict | None = None,
+    exception_type: str | None = None,
+    exception_message: str | None = None,
+):
+    await create_sync_log(
+        db=db,
+        user_id=user_id,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        old_data=old_data,
+        new_data=new_data,
+        action=action,
+        result=result,
+        exception_type=exception_type,
+        exception_message=exception_message,
+    )
@@ -0,0 +1,142 @@
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.enums import SyncResult, SyncAction
+from core.models import Note, NoteRevision
+from crud.note_crud import get_note, restore_note
+from crud.note_revision_crud import get_note_revisions, get_note_revision_chain
+from schemas.note_schema import NoteSync, NoteRevisionItem, NoteRevisionPage, NoteRevisionContent
+from services.note_services import log_note_sync, note_snapshot
+from utils.date_time_converters import datetime_to_ms
+from utils.delta_utils import apply_delta
+from utils.model_converters import to_note_sync
+
+RESTORE_SYNC_STATE = 2 # same state an updated row gets, the clients download the restored note on their next sync
+
+def decode_revision_cursor(cursor: str) -> int:
+    try:
+        return int(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail={"code": 1, "message": "Invalid cursor!"})
+
+def rebuild_revision_content(chain: list[NoteRevision], note_content: str | None) -> str:
+    # starts at the keyframe that ends the chain, or at the note itself, and walks back to the oldest revision of it
+    if chain[-1].content is not None:
+        content = chain[-1].content
+        deltas = chain[:-1]
+    else:
+        content = note_content or ""
+        deltas = chain
+
+    for row in reversed(deltas):
+        content = apply_delta(content, row.delta)
+
+    return content
+
+async def get_user_note(db: AsyncSession, user_id: int, note_id: int, with_content: bool) -> Note:
+    note, context = await get_note(db, note_id, with_content=with_content)
+
+    if not context.success:
+        raise HTTPException(status_code=500, detail={"code": 3, "message": "Could not read notes!"})
+
+    if note is None or note.user_id != user_id:
+        raise HTTPException(status_code=404, detail={"code": 4, "message": "Note not found!"})
+
+    return note
+
+async def read_note_revision(db: AsyncSession, note: Note, revision: int) -> tuple[NoteRevision, str]:
+    chain, context = await get_note_revision_chain(db, note.note_id, revision)
+
+    if not context.success:
+        raise HTTPException(status_code=500, detail={"code": 3, "message": "Could not read notes!"})
+
+    if not chain or chain[0].revision != revision:
+        raise HTTPException(status_code=404, detail={"code": 5, "message": "Revision not found!"})
+
+    return chain[0], rebuild_revision_content(chain, note.content)
+
+async def note_revisions_service(
+        db: AsyncSession,
+        user_id: int,
+        note_id: int,
+        cursor: str | None,
+        limit: int
+) -> NoteRevisionPage:
+    await get_user_note(db, user_id, note_id, with_content=False)
+
+    before = decode_revision_cursor(cursor) if cursor else None
+
+    # one extra row tells whether there is a next page
+    rows, context = await get_note_revisions(db, note_id, before, limit + 1)
+
+    if not context.success:
+        raise HTTPException(status_code=500, detail={"code": 3, "message": "Could not read notes!"})
+
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+
+    return NoteRevisionPage(
+        revisions=[
+            NoteRevisionItem(
+                revision=row.revision,
+                title=row.title,
+                content_length=row.content_length,
+                is_keyframe=row.is_keyframe,
+                created_at=datetime_to_ms(row.created_at) or 0,
+            )
+            for row in rows
+        ],
+        next_cursor=str(rows[-1].revision) if has_next else None,
+    )
+
+async def note_revision_service(db: AsyncSession, user_id: int, note_id: int, revision: int) -> NoteRevisionContent:
+    note = await get_user_note(db, user_id, note_id, with_content=True)
+    note_revision, content = await read_note_revision(db, note, revision)
+
+    return NoteRevisionContent(
+        note_id=note.note_id,
+        revision=note_revision.revision,
+        title=note_revision.title,
+        content=content,
+        created_at=datetime_to_ms(note_revision.created_at) or 0,
+    )
+
+async def restore_note_revision_service(db: AsyncSession, user_id: int, note_id: int, revision: int) -> NoteSync:
+    note = await get_user_note(db, user_id, note_id, with_content=True)
+    note_revision, content = await read_note_revision(db, note, revision)
+
+    old_data = note_snapshot(note)
+
+    restored_note, context = await restore_note(
+        db=db,
+        note=note,
+        title=note_revision.title,
+        content=content,
+        sync_state=RESTORE_SYNC_STATE,
+    )
+
+    if not context.success or restored_note is None:
+        await log_note_sync(
+            db=db,
+            user_id=user_id,
+            entity_id=note_id,
+            old_data=old_data,
+            new_data=None,
+            action=SyncAction.UPDATE,
+            result=SyncResult.FAILED,
+            exception_type=context.exception_type,
+            exception_message=context.exception_message,
+        )
+
+        raise HTTPException(status_code=500, detail={"code": 6, "message": "Could not restore revision!"})
+
+    await log_note_sync(
+        db=db,
+        user_id=user_id,
+        entity_id=note_id,
+        old_data=old_data,
+        new_data=note_snapshot(restored_note),
+        action=SyncAction.UPDATE,
+        result=SyncResult.SUCCESS,
+    )
+
+    return to_note_sync(restored_note)
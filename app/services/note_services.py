@@ -1,15 +1,124 @@
+from datetime import datetime
+from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.inspection import inspect
 from core.enums import EntityType, SyncResult, SyncAction
 from core.models import Note
-from crud.note_crud import get_pending_notes, set_note_sync_state, create_note, get_note, delete_note, update_note
+from crud.category_crud import is_user_category
+from crud.note_crud import get_pending_notes, set_note_sync_state, create_note, get_note, delete_note, update_note, \
+    search_notes, get_note_page, load_note_content, refresh_note
 from crud.sync_log_crud import create_sync_log
-from schemas.note_schema import NoteSync
+from schemas.note_schema import NoteSync, NoteSearchResult, NoteSearchPage, NoteListItem, NoteListPage
 from schemas.sync_schema import SyncRequest, SyncResponse
+from utils.date_time_converters import datetime_to_ms
 from utils.model_converters import to_note_sync, to_note
 
+NoteSearchKey = tuple[float, int] # keyset order of the search: (rank, note_id), both descending
+NoteListKey = tuple[int, datetime, int] # keyset order of the listing: (is_pinned, updated_at, note_id), all descending
+
 def note_snapshot(note: Note) -> dict:
+    # a note that was only loaded for a check has no content, e.g. the note of another user, it stays out of the log
+    if "content" in inspect(note).unloaded:
+        return to_note_sync(note, with_content=False).model_dump(exclude={"content"})
+
     return to_note_sync(note).model_dump()
 
+def encode_search_cursor(key: NoteSearchKey) -> str:
+    # repr keeps every digit, the rank has to compare equal when it comes back
+    rank, note_id = key
+    return f"{rank!r}_{note_id}"
+
+def decode_search_cursor(cursor: str) -> NoteSearchKey:
+    try:
+        rank, note_id = cursor.split("_")
+        return float(rank), int(note_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail={"code": 1, "message": "Invalid cursor!"})
+
+def encode_list_cursor(key: NoteListKey) -> str:
+    # isoformat keeps the microseconds, milliseconds could skip or repeat notes updated within the same one
+    is_pinned, updated_at, note_id = key
+    return f"{is_pinned}_{updated_at.isoformat()}_{note_id}"
+
+def decode_list_cursor(cursor: str) -> NoteListKey:
+    try:
+        is_pinned, updated_at, note_id = cursor.split("_")
+        return int(is_pinned), datetime.fromisoformat(updated_at), int(note_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail={"code": 1, "message": "Invalid cursor!"})
+
+async def note_list_service(
+        db: AsyncSession,
+        user_id: int,
+        category_id: int | None,
+        cursor: str | None,
+        limit: int
+) -> NoteListPage:
+    after = decode_list_cursor(cursor) if cursor else None
+
+    # one extra row tells whether there is a next page
+    rows, context = await get_note_page(db, user_id, category_id, after, limit + 1)
+
+    if not context.success:
+        raise HTTPException(status_code=500, detail={"code": 3, "message": "Could not read notes!"})
+
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+
+    return NoteListPage(
+        notes=[
+            NoteListItem(
+                note_id=row.note_id,
+                category_id=row.category_id or 0,
+                reminder_id=row.reminder_id or 0,
+                title=row.title,
+                preview=row.preview,
+                is_pinned=row.is_pinned,
+                created_at=datetime_to_ms(row.created_at),
+                updated_at=datetime_to_ms(row.updated_at),
+            )
+            for row in rows
+        ],
+        next_cursor=encode_list_cursor((rows[-1].is_pinned, rows[-1].updated_at, rows[-1].note_id)) if has_next else None,
+    )
+
+async def note_search_service(
+        db: AsyncSession,
+        user_id: int,
+        query: str,
+        cursor: str | None,
+        limit: int
+) -> NoteSearchPage:
+    if not query.strip():
+        raise HTTPException(status_code=400, detail={"code": 2, "message": "Search query cannot be empty!"})
+
+    after = decode_search_cursor(cursor) if cursor else None
+
+    # one extra row tells whether there is a next page
+    rows, context = await search_notes(db, user_id, query, after, limit + 1)
+
+    if not context.success:
+        raise HTTPException(status_code=500, detail={"code": 3, "message": "Could not search notes!"})
+
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+
+    return NoteSearchPage(
+        results=[
+            NoteSearchResult(
+                note_id=row.note_id,
+                category_id=row.category_id or 0,
+                title=row.title,
+                snippet=row.snippet,
+                rank=row.rank,
+                is_pinned=row.is_pinned,
+                updated_at=datetime_to_ms(row.updated_at) or 0,
+            )
+            for row in rows
+        ],
+        next_cursor=encode_search_cursor((rows[-1].rank, rows[-1].note_id)) if has_next else None,
+    )
+
 async def note_sync_service(db: AsyncSession, request: SyncRequest[NoteSync]) -> SyncResponse[NoteSync]:
     acknowledged: list[NoteSync] = []
     rejected: list[NoteSync] = []
@@ -47,6 +156,23 @@ async def note_sync_service(db: AsyncSession, request: SyncRequest[NoteSync]) ->
 
                 continue
 
+            if note_sync.is_deleted == 0 and not await is_user_category(db, request.user_id, note_sync.category_id):
+                rejected.append(note_sync)
+
+                await log_note_sync(
+                    db=db,
+                    user_id=request.user_id,
+                    entity_id=note_sync.server_id if note_sync.server_id != 0 else None,
+                    old_data=None,
+                    new_data=note_sync.model_dump(),
+                    action=SyncAction.SYNC_UPLOAD,
+                    result=SyncResult.FAILED,
+                    exception_type="InvalidCategory",
+                    exception_message="Note category_id is not a category of the sync request user.",
+                )
+
+                continue
+
             # note was created locally and needs to be created on the server
             if note_sync.server_id == 0 and note_sync.is_deleted == 0:
                 new_note = to_note(note_sync)
@@ -141,6 +267,26 @@ async def note_sync_service(db: AsyncSession, request: SyncRequest[NoteSync]) ->
 
                     continue
 
+                # the ownership check passed, only now the content is read for the log
+                context = await load_note_content(db=db, note=existing_note)
+
+                if not context.success:
+                    rejected.append(note_sync)
+
+                    await log_note_sync(
+                        db=db,
+                        user_id=request.user_id,
+                        entity_id=note_sync.server_id,
+                        old_data=None,
+                        new_data=note_sync.model_dump(),
+                        action=SyncAction.SYNC_UPLOAD,
+                        result=SyncResult.FAILED,
+                        exception_type=context.exception_type,
+                        exception_message=context.exception_message,
+                    )
+
+                    continue
+
                 old_data = note_snapshot(existing_note)
 
                 updated_note, context = await update_note(
@@ -222,6 +368,26 @@ async def note_sync_service(db: AsyncSession, request: SyncRequest[NoteSync]) ->
 
                     continue
 
+                # the ownership check passed, only now the content is read for the log
+                context = await load_note_content(db=db, note=existing_note)
+
+                if not context.success:
+                    rejected.append(note_sync)
+
+                    await log_note_sync(
+                        db=db,
+                        user_id=request.user_id,
+                        entity_id=note_sync.server_id,
+                        old_data=None,
+                        new_data=None,
+                        action=SyncAction.SYNC_UPLOAD,
+                        result=SyncResult.FAILED,
+                        exception_type=context.exception_type,
+                        exception_message=context.exception_message,
+                    )
+
+                    continue
+
                 old_data = note_snapshot(existing_note)
 
                 delete_context = await delete_note(
@@ -313,7 +479,7 @@ async def process_pending_download_notes(
         if not sync_state_result.success:
             continue
 
-        await db.refresh(pending_note)
+        await refresh_note(db, pending_note)
 
         new_data = note_snapshot(pending_note)
 
@@ -0,0 +1,233 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, date, time
+from typing import Callable
+from fastapi import HTTPException
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+from core.enums import EntityType, SyncAction, SyncResult
+from core.models import Note, Category, Event, Reminder, Finance, List
+from crud.reconcile_crud import get_reconcile_fingerprint, get_reconcile_rows, set_reconcile_sync_state
+from crud.sync_log_crud import create_sync_log
+from schemas.reconcile_schema import ReconcileTreeRequest, ReconcileTreeResponse, ReconcileBucketRequest, \
+    ReconcileBucketResponse, MerkleNode
+from utils.date_time_converters import datetime_to_ms
+from utils.merkle_utils import MerkleTree, build_merkle_tree, content_hash, leaf_hash
+
+TREE_CACHE_SIZE = 256
+RECONCILE_SYNC_STATE = 2 # same state an updated row gets, the regular sync download picks it up
+
+@dataclass(frozen=True)
+class MerkleSource:
+    id_column: InstrumentedAttribute
+    user_id_column: InstrumentedAttribute
+    last_modified_column: InstrumentedAttribute
+    content_columns: tuple
+    content: Callable[[Row], tuple] # values in the same order the client hashes them
+
+def date_time_to_ms(date_value: date | None, time_value: time | None) -> int | None:
+    if date_value is None or time_value is None:
+        return None
+
+    return datetime_to_ms(datetime.combine(date_value, time_value))
+
+MERKLE_SOURCES: dict[EntityType, MerkleSource] = {
+    EntityType.NOTE: MerkleSource(
+        id_column=Note.note_id,
+        user_id_column=Note.user_id,
+        last_modified_column=Note.last_modified,
+        content_columns=(Note.category_id, Note.reminder_id, Note.title, Note.content, Note.created_at,
+                         Note.is_deleted, Note.is_pinned),
+        content=lambda row: (row.category_id or 0, row.reminder_id or 0, row.title, row.content,
+                             datetime_to_ms(row.created_at), row.is_deleted, row.is_pinned),
+    ),
+    EntityType.CATEGORY: MerkleSource(
+        id_column=Category.category_id,
+        user_id_column=Category.user_id,
+        last_modified_column=Category.last_modified,
+        content_columns=(Category.name, Category.description, Category.color, Category.icon,
+                         Category.created_at, Category.is_deleted),
+        content=lambda row: (row.name, row.description, row.color, row.icon,
+                             datetime_to_ms(row.created_at), row.is_deleted),
+    ),
+    EntityType.EVENT: MerkleSource(
+        id_column=Event.event_id,
+        user_id_column=Event.user_id,
+        last_modified_column=Event.last_modified,
+        content_columns=(Event.category_id, Event.reminder_id, Event.title, Event.description, Event.date,
+                         Event.start_time, Event.end_time, Event.priority, Event.location, Event.recurrence_rule,
+                         Event.recurrence_exceptions, Event.recurrence_parent_id, Event.recurrence_date, Event.is_deleted),
+        content=lambda row: (row.category_id or 0, row.reminder_id or 0, row.title, row.description,
+                             date_time_to_ms(row.date, time.min), date_time_to_ms(row.date, row.start_time),
+                             date_time_to_ms(row.date, row.end_time), row.priority, row.location,
+                             row.recurrence_rule, ",".join(row.recurrence_exceptions or []),
+                             row.recurrence_parent_id or 0, date_time_to_ms(row.recurrence_date, time.min),
+                             row.is_deleted),
+    ),
+    EntityType.REMINDER: MerkleSource(
+        id_column=Reminder.reminder_id,
+        user_id_column=Reminder.user_id,
+        last_modified_column=Reminder.last_modified,
+        content_columns=(Reminder.reminder_time, Reminder.frequency, Reminder.status, Reminder.message,
+                         Reminder.is_deleted),
+        content=lambda row: (datetime_to_ms(row.reminder_time), row.frequency, row.status, row.message,
+                             row.is_deleted),
+    ),
+    EntityType.FINANCE: MerkleSource(
+        id_column=Finance.finance_id,
+        user_id_column=Finance.user_id,
+        last_modified_column=Finance.last_modified,
+        content_columns=(Finance.category_id, Finance.reminder_id, Finance.type, Finance.expense_amount,
+                         Finance.expense_date, Finance.description, Finance.is_deleted),
+        content=lambda row: (row.category_id or 0, row.reminder_id or 0, int(row.type), row.expense_amount,
+                             datetime_to_ms(row.expense_date), row.description, row.is_deleted),
+    ),
+    EntityType.LIST: MerkleSource(
+        id_column=List.list_id,
+        user_id_column=List.user_id,
+        last_modified_column=List.last_modified,
+        content_columns=(List.title, List.created_at, List.is_deleted),
+        content=lambda row: (row.title, datetime_to_ms(row.created_at), row.is_deleted),
+    ),
+}
+
+# (user_id, entity_type) -> (fingerprint, tree), least recently used entries are evicted first
+tree_cache: OrderedDict[tuple[int, EntityType], tuple[tuple, MerkleTree]] = OrderedDict()
+
+def get_merkle_source(entity_type: EntityType) -> MerkleSource:
+    source = MERKLE_SOURCES.get(entity_type)
+
+    if source is None:
+        raise HTTPException(status_code=400, detail={"code": 1, "message": "Entity type cannot be reconciled!"})
+
+    return source
+
+async def get_merkle_tree(db: AsyncSession, user_id: int, entity_type: EntityType) -> MerkleTree:
+    source = get_merkle_source(entity_type)
+    cache_key = (user_id, entity_type)
+
+    fingerprint, context = await get_reconcile_fingerprint(
+        db=db,
+        id_column=source.id_column,
+        user_id_column=source.user_id_column,
+        last_modified_column=source.last_modified_column,
+        user_id=user_id,
+    )
+
+    if not context.success:
+        raise HTTPException(status_code=500, detail={"code": 2, "message": "Could not read reconciliation data!"})
+
+    cached = tree_cache.get(cache_key)
+
+    if cached is not None and cached[0] == fingerprint:
+        tree_cache.move_to_end(cache_key)
+        return cached[1]
+
+    rows, context = await get_reconcile_rows(
+        db=db,
+        columns=(source.id_column, source.last_modified_column, *source.content_columns),
+        user_id_column=source.user_id_column,
+        user_id=user_id,
+    )
+
+    if not context.success:
+        raise HTTPException(status_code=500, detail={"code": 2, "message": "Could not read reconciliation data!"})
+
+    leaves = {
+        row[0]: leaf_hash(row[0], datetime_to_ms(row[1]) or 0, content_hash(source.content(row)))
+        for row in rows
+    }
+
+    tree = build_merkle_tree(leaves)
+
+    tree_cache[cache_key] = (fingerprint, tree)
+    tree_cache.move_to_end(cache_key)
+
+    while len(tree_cache) > TREE_CACHE_SIZE:
+        tree_cache.popitem(last=False)
+
+    return tree
+
+async def reconcile_tree_service(db: AsyncSession, request: ReconcileTreeRequest) -> ReconcileTreeResponse:
+    tree = await get_merkle_tree(db, request.user_id, request.entity_type)
+
+    nodes = [
+        MerkleNode(level=request.level, index=index, hash=tree.node_hash(request.level, index))
+        for index in request.indexes
+    ]
+
+    return ReconcileTreeResponse(
+        user_id=request.user_id,
+        entity_type=request.entity_type,
+        bucket_size=tree.bucket_size,
+        fanout=tree.fanout,
+        depth=tree.depth,
+        nodes=nodes,
+    )
+
+async def reconcile_buckets_service(db: AsyncSession, request: ReconcileBucketRequest) -> ReconcileBucketResponse:
+    source = get_merkle_source(request.entity_type)
+    tree = await get_merkle_tree(db, request.user_id, request.entity_type)
+
+    queued: list[int] = []
+    missing: list[int] = []
+
+    for bucket in request.buckets:
+        server_leaves = tree.buckets.get(bucket.index, {})
+        client_leaves = {
+            leaf.server_id: leaf_hash(leaf.server_id, leaf.last_modified, leaf.content_hash)
+            for leaf in bucket.leaves
+        }
+
+        for server_id, hashed_leaf in server_leaves.items():
+            if client_leaves.get(server_id) != hashed_leaf:
+                queued.append(server_id)
+
+        missing.extend(server_id for server_id in client_leaves if server_id not in server_leaves)
+
+    if queued:
+        context = await set_reconcile_sync_state(
+            db=db,
+            id_column=source.id_column,
+            user_id_column=source.user_id_column,
+            user_id=request.user_id,
+            ids=queued,
+            sync_state=RECONCILE_SYNC_STATE,
+        )
+
+        if not context.success:
+            await create_sync_log(
+                db=db,
+                user_id=request.user_id,
+                entity_type=request.entity_type,
+                entity_id=None,
+                old_data=None,
+                new_data={"queued": queued, "missing": missing},
+                action=SyncAction.SYNC,
+                result=SyncResult.FAILED,
+                exception_type=context.exception_type,
+                exception_message=context.exception_message,
+            )
+
+            raise HTTPException(status_code=500, detail={"code": 3, "message": "Could not queue differing records!"})
+
+    await create_sync_log(
+        db=db,
+        user_id=request.user_id,
+        entity_type=request.entity_type,
+        entity_id=None,
+        old_data=None,
+        new_data={"queued": queued, "missing": missing},
+        action=SyncAction.SYNC,
+        result=SyncResult.SUCCESS if queued or missing else SyncResult.NO_CHANGES,
+        exception_type=None,
+        exception_message=None,
+    )
+
+    return ReconcileBucketResponse(
+        user_id=request.user_id,
+        entity_type=request.entity_type,
+        queued=queued,
+        missing=missing,
+    )
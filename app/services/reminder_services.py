@@ -0,0 +1,53 @@
+import numpy as np
+from datetime import date, datetime, time, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from crud.health_reminder_crud import get_active_health_reminders
+from crud.reminder_crud import get_day_reminders
+from schemas.reminder_schema import DayReminders, ReminderOccurrence, HealthReminderOccurrence
+from services.scheduler_services import REMINDER_ACTIVE_STATUS
+from utils.date_time_converters import datetime_to_ms
+from utils.schedule_utils import to_datetime64, reminder_occurrences_in_window, health_occurrences_in_window
+
+async def day_reminders_service(db: AsyncSession, user_id: int, day: date) -> DayReminders:
+    day_start = datetime.combine(day, time.min)
+    day_end = day_start + timedelta(days=1)
+
+    reminders = await get_day_reminders(db, user_id, REMINDER_ACTIVE_STATUS, day_start, day_end)
+    health_reminders = await get_active_health_reminders(db, user_id)
+
+    rows, times = reminder_occurrences_in_window(
+        to_datetime64([reminder.reminder_time for reminder in reminders]),
+        np.asarray([reminder.frequency or 0 for reminder in reminders], dtype=np.int64),
+        day_start,
+        day_end,
+    )
+
+    health_rows, health_times = health_occurrences_in_window(
+        [health_reminder.start_time for health_reminder in health_reminders],
+        [health_reminder.end_time for health_reminder in health_reminders],
+        [health_reminder.frequency for health_reminder in health_reminders],
+        day_start,
+        day_end,
+    )
+
+    return DayReminders(
+        user_id=user_id,
+        date=datetime_to_ms(day_start),
+        reminders=[
+            ReminderOccurrence(
+                reminder_id=reminders[row].reminder_id,
+                occurrence_time=datetime_to_ms(occurrence),
+                frequency=reminders[row].frequency or 0,
+                message=reminders[row].message or "",
+            )
+            for row, occurrence in zip(rows.tolist(), times.tolist())
+        ],
+        health_reminders=[
+            HealthReminderOccurrence(
+                reminder_id=health_reminders[row].reminder_id,
+                type=health_reminders[row].type,
+                occurrence_time=datetime_to_ms(occurrence),
+            )
+            for row, occurrence in zip(health_rows.tolist(), health_times.tolist())
+        ],
+    )
@@ -0,0 +1,254 @@
+import asyncio
+import heapq
+import os
+import numpy as np
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+from core.database import async_session
+from crud.reminder_crud import get_due_reminders, get_repeating_reminders
+from utils.schedule_utils import REPEATING_FREQUENCIES, to_datetime64, reminder_occurrences_in_window
+
+REMINDER_ACTIVE_STATUS = 1
+SCHEDULER_HORIZON = timedelta(minutes=int(os.getenv("REMINDER_HORIZON_MINUTES", "15")))
+SCHEDULER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "10000")) # upper bound of reminders held in memory
+SCHEDULER_RETRY_SECONDS = 5
+SCHEDULER_MAX_SLEEP_SECONDS = 60
+MAX_REMINDER_ID = 2 ** 31 - 1
+
+ReminderKey = tuple[datetime, int] # keyset order of idx_reminder_due: (reminder_time, reminder_id)
+
+@dataclass(frozen=True)
+class DueReminder:
+    reminder_id: int
+    user_id: int
+    reminder_time: datetime
+    message: str | None
+
+ReminderSink = Callable[[DueReminder], Awaitable[None]]
+ReminderLoader = Callable[[ReminderKey, datetime, int], Awaitable[list]]
+RepeatingLoader = Callable[[datetime, datetime, int, int], Awaitable[list]] # (window start, window end, after id, limit)
+
+async def print_sink(reminder: DueReminder):
+    print("Reminder due:", reminder.reminder_id, reminder.user_id, reminder.reminder_time.isoformat())
+
+async def load_due_reminders(after: ReminderKey, until: datetime, limit: int) -> list:
+    async with async_session() as db:
+        return await get_due_reminders(db, REMINDER_ACTIVE_STATUS, after, until, limit)
+
+async def load_repeating_reminders(window_start: datetime, window_end: datetime, after_id: int, limit: int) -> list:
+    async with async_session() as db:
+        return await get_repeating_reminders(db, REMINDER_ACTIVE_STATUS, window_start, window_end, after_id, limit)
+
+class ReminderScheduler:
+    # only the reminders due within the horizon are held in a heap, the rest stay in the table until a refill
+    # reaches them, a refill is a keyset scan that continues where the previous one stopped
+    # repeating reminders are read for each window too, only the ones that can fire in it, their occurrences count
+    # against the same batch size
+    def __init__(
+            self,
+            sink: ReminderSink = print_sink,
+            load: ReminderLoader = load_due_reminders,
+            load_repeating: RepeatingLoader = load_repeating_reminders,
+            horizon: timedelta = SCHEDULER_HORIZON,
+            batch_size: int = SCHEDULER_BATCH_SIZE,
+            clock: Callable[[], datetime] = datetime.now
+    ):
+        self.sink = sink
+        self.load = load
+        self.load_repeating = load_repeating
+        self.horizon = horizon
+        self.batch_size = batch_size
+        self.clock = clock
+        self.heap: list[ReminderKey] = []
+        self.entries: dict[int, DueReminder] = {} # reminder_id -> reminder, heap keys missing here are stale
+        self.position: ReminderKey = (clock(), MAX_REMINDER_ID) # last key loaded from the table
+        self.loaded_until: ReminderKey = self.position # every active reminder up to this key is in entries
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task | None = None
+        self.fired = 0
+        self.refills = 0
+        self.repeating_rows = 0 # repeating reminders read by the last refill
+
+    def start(self):
+        now = self.clock()
+        self.position = self.loaded_until = (now, MAX_REMINDER_ID)
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+
+        self.task.cancel()
+
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+        self.task = None
+
+    def push(self, reminder: DueReminder):
+        self.entries[reminder.reminder_id] = reminder
+        heapq.heappush(self.heap, (reminder.reminder_time, reminder.reminder_id))
+
+    def notify(
+            self,
+            reminder_id: int,
+            user_id: int,
+            reminder_time: datetime,
+            frequency: int | None,
+            status: int,
+            message: str | None
+    ):
+        # called after a reminder write, the old heap entry is left behind and skipped once it surfaces
+        self.entries.pop(reminder_id, None)
+
+        # only the written reminder is recomputed, its occurrence in the loaded window goes on the heap
+        if status == REMINDER_ACTIVE_STATUS and frequency in REPEATING_FREQUENCIES:
+            _, times = reminder_occurrences_in_window(
+                to_datetime64([reminder_time]),
+                np.asarray([frequency]),
+                self.clock(),
+                self.loaded_until[0] + timedelta(microseconds=1),
+            )
+
+            if len(times):
+                self.push(DueReminder(reminder_id, user_id, times[0].item(), message))
+
+        elif status == REMINDER_ACTIVE_STATUS and reminder_time > self.clock() \
+                and (reminder_time, reminder_id) <= self.loaded_until:
+            self.push(DueReminder(reminder_id, user_id, reminder_time, message))
+
+        # anything past loaded_until is picked up by a later refill
+        self.wakeup.set()
+
+    def discard(self, reminder_id: int):
+        self.entries.pop(reminder_id, None)
+
+    def reload(self):
+        # for bulk writes that do not report ids, the next refill rescans everything not yet due
+        self.position = min(self.position, (self.clock(), 0))
+        self.loaded_until = self.position
+        self.wakeup.set()
+
+    async def load_repeating_window(self, after: ReminderKey, until: datetime, limit: int) -> list[DueReminder]:
+        # occurrences with a key in (after, (until, MAX_REMINDER_ID)], computed page by page, only the first limit + 1
+        # of them are kept, one more than fits tells the caller the window has to be cut short,
+        # neither the reminders nor their occurrences pile up
+        step = timedelta(microseconds=1)
+        selected: list[tuple[ReminderKey, DueReminder]] = []
+        after_id = 0
+        self.repeating_rows = 0
+
+        while True:
+            rows = await self.load_repeating(after[0], until, after_id, self.batch_size)
+            self.repeating_rows += len(rows)
+
+            if rows:
+                indexes, times = reminder_occurrences_in_window(
+                    to_datetime64([row[2] for row in rows]),
+                    np.asarray([row[4] for row in rows], dtype=np.int64),
+                    after[0],
+                    until + step,
+                )
+                found = [
+                    ((occurrence, rows[index][0]), DueReminder(rows[index][0], rows[index][1], occurrence, rows[index][3]))
+                    for index, occurrence in zip(indexes.tolist(), times.tolist())
+                    if (occurrence, rows[index][0]) > after
+                ]
+                selected = heapq.nsmallest(limit + 1, selected + found, key=lambda item: item[0])
+
+            if len(rows) < self.batch_size:
+                break
+
+            after_id = rows[-1][0]
+
+        return [reminder for _, reminder in selected]
+
+    def needs_refill(self, now: datetime) -> bool:
+        return self.loaded_until[0] < now + self.horizon / 2 and len(self.entries) <= self.batch_size // 2
+
+    async def refill(self, now: datetime):
+        until = now + self.horizon
+        limit = self.batch_size - len(self.entries)
+        rows = await self.load(self.position, until, limit)
+        repeating = await self.load_repeating_window(self.loaded_until, until, limit)
+
+        due = sorted(
+            [DueReminder(*row) for row in rows] + repeating,
+            key=lambda reminder: (reminder.reminder_time, reminder.reminder_id)
+        )
+
+        for reminder in due[:limit]:
+            self.push(reminder)
+
+        if len(rows) == limit or len(due) > limit:
+            # the window was cut short, the rest is loaded once enough of the heap has fired
+            last = due[limit - 1]
+            self.position = self.loaded_until = (last.reminder_time, last.reminder_id)
+        else:
+            self.position = self.loaded_until = (until, MAX_REMINDER_ID)
+
+        self.refills += 1
+
+    async def fire_due(self, now: datetime):
+        while self.heap and self.heap[0][0] <= now:
+            reminder_time, reminder_id = heapq.heappop(self.heap)
+            reminder = self.entries.get(reminder_id)
+
+            if reminder is None or reminder.reminder_time != reminder_time:
+                continue
+
+            del self.entries[reminder_id]
+
+            try:
+                await self.sink(reminder)
+            except Exception as e:
+                print("Reminder sink failed:", type(e).__name__, str(e))
+
+            self.fired += 1
+
+    def sleep_seconds(self, now: datetime) -> float:
+        wake_at = now + timedelta(seconds=SCHEDULER_MAX_SLEEP_SECONDS)
+
+        if self.heap:
+            wake_at = min(wake_at, self.heap[0][0])
+
+        if len(self.entries) <= self.batch_size // 2:
+            wake_at = min(wake_at, self.loaded_until[0] - self.horizon / 2)
+
+        return max(0.0, (wake_at - now).total_seconds())
+
+    async def run(self):
+        while True:
+            now = self.clock()
+
+            if self.needs_refill(now):
+                try:
+                    await self.refill(now)
+                except Exception as e:
+                    print("Reminder refill failed:", type(e).__name__, str(e))
+                    await asyncio.sleep(SCHEDULER_RETRY_SECONDS)
+                    continue
+
+            await self.fire_due(self.clock())
+
+            self.wakeup.clear()
+
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.sleep_seconds(self.clock()))
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "scheduled": len(self.entries),
+            "repeating_rows": self.repeating_rows,
+            "heap_size": len(self.heap),
+            "loaded_until": self.loaded_until[0].isoformat(),
+            "fired": self.fired,
+            "refills": self.refills,
+        }
+
+reminder_scheduler = ReminderScheduler()
@@ -0,0 +1,59 @@
+import asyncio
+import os
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+from core.enums import EntityType
+from core.models import Note, Event, Category, List
+from crud.search_crud import quick_search_entities
+from schemas.search_schema import QuickSearchResult, QuickSearchResponse
+
+QUICK_SEARCH_BUDGET_SECONDS = int(os.getenv("QUICK_SEARCH_BUDGET_MS", "50")) / 1000
+MAX_QUERY_LENGTH = 64
+
+# entity -> (id column, user_id column, searched text columns), the first text column is the shown title
+QUICK_SEARCH_SOURCES: dict[EntityType, tuple[InstrumentedAttribute, InstrumentedAttribute, tuple]] = {
+    EntityType.NOTE: (Note.note_id, Note.user_id, (Note.title,)),
+    EntityType.EVENT: (Event.event_id, Event.user_id, (Event.title, Event.location)),
+    EntityType.CATEGORY: (Category.category_id, Category.user_id, (Category.name,)),
+    EntityType.LIST: (List.list_id, List.user_id, (List.title,)),
+}
+
+async def quick_search_service(db: AsyncSession, user_id: int, query: str, limit: int) -> QuickSearchResponse:
+    query = query.strip()[:MAX_QUERY_LENGTH]
+
+    if not query:
+        raise HTTPException(status_code=400, detail={"code": 1, "message": "Search query cannot be empty!"})
+
+    # the connection is opened before the budget starts, only the search statement itself is timed
+    await db.connection()
+
+    sources = {entity_type.value: columns for entity_type, columns in QUICK_SEARCH_SOURCES.items()}
+
+    # a search that has not answered within the budget is dropped, a search as you type is replaced by the next
+    # keystroke, the running statement is cancelled on the server
+    try:
+        rows, context = await asyncio.wait_for(
+            quick_search_entities(db, sources, user_id, query, limit),
+            QUICK_SEARCH_BUDGET_SECONDS
+        )
+    except asyncio.TimeoutError:
+        return QuickSearchResponse(query=query, results=[], partial=True)
+
+    if not context.success:
+        raise HTTPException(status_code=500, detail={"code": 2, "message": "Could not search!"})
+
+    return QuickSearchResponse(
+        query=query,
+        results=[
+            QuickSearchResult(
+                entity_type=EntityType(row.entity_type),
+                entity_id=row.entity_id,
+                title=row.title,
+                detail=row.detail or "",
+                score=row.score,
+            )
+            for row in rows
+        ],
+        partial=False
+    )
@@ -1,13 +1,16 @@
 import os
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from jose import jwt
-from jwt import ExpiredSignatureError, InvalidTokenError
+from jose import jwt, JWTError, ExpiredSignatureError
 from fastapi import HTTPException, Depends, Security
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from pathlib import Path
 from core.database import get_db
-from crud.user_crud import get_user_by_id
+from crud.user_crud import get_user_by_id, get_user_token_generation
+from schemas.auth_schema import UserResponse
+from utils.cache_utils import token_claims_cache, user_cache, token_generation_cache
 from dotenv import load_dotenv
 
 env = os.environ["ENV"]
@@ -16,38 +19,111 @@ env_file = BASE_DIR / f".env.{env}"
 load_dotenv(env_file)
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRY = int(os.getenv("ACCESS_TOKEN_EXPIRY")) # days
+ACCESS_TOKEN_EXPIRY_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRY_MINUTES", "15")) # minutes
+REFRESH_TOKEN_EXPIRY = int(os.getenv("REFRESH_TOKEN_EXPIRY", os.getenv("ACCESS_TOKEN_EXPIRY"))) # days
+
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def create_access_token(data: dict):
+@dataclass(frozen=True)
+class TokenClaims:
+    user_id: int
+    expires_at: float # unix timestamp from the exp claim
+    token_type: str
+    generation: int # bumped on password reset, tokens from an older generation are revoked
+
+def create_token(data: dict, token_type: str, expires_delta: timedelta):
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(days=ACCESS_TOKEN_EXPIRY)
-    to_encode.update({"exp": expire})
-    
+    expire = datetime.now(timezone.utc) + expires_delta
+    to_encode.update({"exp": expire, "type": token_type})
+
     if 'sub' in to_encode:
         to_encode['sub'] = str(to_encode['sub'])
 
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(token: str = Security(oauth2_scheme), db: AsyncSession = Depends(get_db)):
-    credential_exception = HTTPException(status_code=401, detail={"code": 1, "message": "Could not validate credentials"})
+def create_access_token(data: dict):
+    return create_token(data, ACCESS_TOKEN_TYPE, timedelta(minutes=ACCESS_TOKEN_EXPIRY_MINUTES))
 
-    try: 
-        payload = jwt.decode(token, SECRET_KEY, algorithms=ALGORITHM)
-        user_id: str = payload.get("sub")
+def create_refresh_token(data: dict):
+    return create_token(data, REFRESH_TOKEN_TYPE, timedelta(days=REFRESH_TOKEN_EXPIRY))
+
+def decode_token(token: str) -> TokenClaims:
+    credential_exception = HTTPException(status_code=401, detail={"code": 1, "message": "Could not validate credentials"})
 
-        if user_id is None:
-            raise credential_exception
+    claims: TokenClaims | None = token_claims_cache.get(token)
 
-        user = await get_user_by_id(db, int(user_id))
+    if claims is not None:
+        return claims
 
-        if user is None:
-            raise credential_exception
-        
-        return user
-    
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=ALGORITHM)
     except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail={"code": 2, "message": "Token has expired"})
-    except InvalidTokenError:
+    except JWTError:
         raise HTTPException(status_code=401, detail={"code": 3, "message": "Invalid token"})
+
+    user_id: str = payload.get("sub")
+
+    if user_id is None:
+        raise credential_exception
+
+    claims = TokenClaims(
+        user_id=int(user_id),
+        expires_at=float(payload.get("exp")),
+        token_type=payload.get("type", ACCESS_TOKEN_TYPE),
+        generation=int(payload.get("gen", 0)),
+    )
+    # the cached claims never outlive the token itself
+    token_claims_cache.set(token, claims, ttl=claims.expires_at - time.time())
+
+    return claims
+
+async def validate_token_generation(db: AsyncSession, claims: TokenClaims):
+    generation: int | None = token_generation_cache.get(claims.user_id)
+
+    if generation is None:
+        generation = await get_user_token_generation(db, claims.user_id)
+
+        if generation is None:
+            raise HTTPException(status_code=401, detail={"code": 1, "message": "Could not validate credentials"})
+
+        token_generation_cache.set(claims.user_id, generation)
+
+    if claims.generation != generation:
+        raise HTTPException(status_code=401, detail={"code": 4, "message": "Token has been revoked"})
+
+async def validate_refresh_token(db: AsyncSession, token: str) -> TokenClaims:
+    claims = decode_token(token)
+
+    if claims.token_type != REFRESH_TOKEN_TYPE:
+        raise HTTPException(status_code=401, detail={"code": 3, "message": "Invalid token"})
+
+    await validate_token_generation(db, claims)
+
+    return claims
+
+async def get_current_user(token: str = Security(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    claims = decode_token(token)
+
+    if claims.token_type != ACCESS_TOKEN_TYPE:
+        raise HTTPException(status_code=401, detail={"code": 3, "message": "Invalid token"})
+
+    # the db session is only opened on a cache miss, hot paths skip the database entirely
+    user: UserResponse | None = user_cache.get(claims.user_id)
+
+    if user is None:
+        db_user = await get_user_by_id(db, claims.user_id)
+
+        if db_user is None:
+            raise HTTPException(status_code=401, detail={"code": 1, "message": "Could not validate credentials"})
+
+        user = UserResponse.model_validate(db_user)
+        user_cache.set(claims.user_id, user)
+        token_generation_cache.set(claims.user_id, db_user.token_generation)
+
+    await validate_token_generation(db, claims)
+
+    return user
@@ -0,0 +1,120 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+class TTLCache:
+    def __init__(self, name: str, max_size: int, ttl: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl # seconds
+        self.entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict() # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        # invalidations and write throughs bump the generation of a key, a fill started before them is not written back
+        self.generations: dict[Hashable, int] = {}
+        caches[name] = self
+
+    def generation(self, key: Hashable) -> int:
+        return self.generations.get(key, 0)
+
+    def bump(self, key: Hashable):
+        self.generations[key] = self.generations.get(key, 0) + 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            self.misses += 1
+            return default
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None, generation: int | None = None):
+        # a fill passes the generation it read before going to the database, it is dropped if the key changed since
+        if generation is not None and generation != self.generation(key):
+            return
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+
+        if ttl <= 0:
+            self.entries.pop(key, None)
+            return
+
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+
+        # least recently used entries are evicted first
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self.bump(key)
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+# every cache registers itself here so the stats can be reported in one place
+caches: dict[str, TTLCache] = {}
+
+def get_cache_stats() -> dict[str, dict]:
+    return {name: cache.stats() for name, cache in caches.items()}
+
+token_claims_cache = TTLCache(name="token_claims", max_size=4096, ttl=300)
+user_cache = TTLCache(name="user", max_size=1024, ttl=300)
+# only this process bumps generations, so the cached value stays authoritative for as long as it lives
+token_generation_cache = TTLCache(name="token_generation", max_size=65536, ttl=86400)
+# user_id -> {first day of month: days}, one entry per user so an event write drops all of its months at once
+calendar_cache = TTLCache(name="calendar", max_size=512, ttl=3600)
+# user_id -> {category_id: category}, written through by every category write
+category_cache = TTLCache(name="category", max_size=1024, ttl=3600)
+# user_id -> [CategoryStats], dropped by every note, event, finance and category write of the user
+category_stats_cache = TTLCache(name="category_stats", max_size=1024, ttl=300)
+
+def invalidate_user(user_id: int):
+    user_cache.invalidate(user_id)
+
+def set_token_generation(user_id: int, generation: int):
+    token_generation_cache.set(user_id, generation)
+
+def invalidate_calendar(user_id: int):
+    calendar_cache.invalidate(user_id)
+
+def invalidate_category_stats(user_id: int):
+    category_stats_cache.invalidate(user_id)
+
+def write_category(user_id: int, category_id: int, category: Any | None):
+    # the cached map is replaced instead of mutated, a reader holding the old map never sees it change
+    entry = category_cache.entries.get(user_id)
+
+    if entry is None or entry[0] <= time.monotonic():
+        category_cache.invalidate(user_id)
+        return
+
+    categories = dict(entry[1])
+
+    if category is None:
+        categories.pop(category_id, None)
+    else:
+        categories[category_id] = category
+
+    category_cache.bump(user_id)
+    category_cache.set(user_id, categories)
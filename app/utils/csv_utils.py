@@ -0,0 +1,147 @@
+import codecs
+import csv
+import re
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncIterator, Awaitable, Callable
+
+CSV_DELIMITERS = ",;\t|"
+CSV_DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%d.%m.%Y", "%d/%m/%Y", "%Y/%m/%d")
+
+# header names of the exports of common banking and finance apps, matched after lowercasing
+CSV_COLUMN_ALIASES = {
+    "date": ("date", "expense_date", "booking date", "transaction date", "value date", "datum"),
+    "amount": ("amount", "expense_amount", "value", "sum", "betrag"),
+    "description": ("description", "memo", "payee", "details", "reference", "note", "verwendungszweck"),
+    "category": ("category", "kategorie"),
+    "type": ("type", "transaction type", "direction"),
+}
+
+EXPENSE_TYPES = ("expense", "debit", "withdrawal", "out", "-")
+INCOME_TYPES = ("income", "credit", "deposit", "in", "+")
+
+async def iter_csv_records(
+        read: Callable[[int], Awaitable[bytes]],
+        chunk_size: int = 65536
+) -> AsyncIterator[list[str]]:
+    # reads the upload chunk by chunk, a quoted field may span lines, so lines are joined until the quotes balance
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    record = ""
+    dialect = None
+
+    while True:
+        chunk = await read(chunk_size)
+        buffer += decoder.decode(chunk, final=not chunk)
+        *lines, buffer = buffer.split("\n")
+
+        if not chunk:
+            lines.append(buffer)
+
+        for line in lines:
+            record += line.rstrip("\r") if not record else "\n" + line.rstrip("\r")
+
+            if record.count('"') % 2:
+                continue
+
+            if record.strip():
+                if dialect is None:
+                    dialect = sniff_dialect(record)
+
+                yield next(csv.reader([record], dialect))
+
+            record = ""
+
+        if not chunk:
+            break
+
+def sniff_dialect(header: str) -> type[csv.Dialect]:
+    # a header line says nothing about quoting, only the delimiter is taken from it
+    try:
+        delimiter = csv.Sniffer().sniff(header, delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        return csv.excel
+
+    return type("SniffedDialect", (csv.excel,), {"delimiter": delimiter})
+
+def map_csv_columns(header: list[str]) -> dict[str, int]:
+    # field name -> column index, columns without a known header are ignored
+    names = [name.strip().lower() for name in header]
+    columns = {}
+
+    for field, aliases in CSV_COLUMN_ALIASES.items():
+        for index, name in enumerate(names):
+            if name in aliases:
+                columns[field] = index
+                break
+
+    return columns
+
+def csv_field(record: list[str], columns: dict[str, int], field: str) -> str:
+    # optional columns, a missing column or a short row reads as empty
+    index = columns.get(field)
+    return record[index].strip() if index is not None and index < len(record) else ""
+
+def parse_csv_date(value: str, date_format: str | None = None) -> datetime:
+    value = value.strip()
+
+    for candidate in (date_format,) if date_format else CSV_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, candidate)
+        except ValueError:
+            continue
+
+    raise ValueError(f"Unknown date: {value}")
+
+def guess_decimal_separator(value: str) -> str | None:
+    # the last of two different separators is the decimal one, a repeated separator only groups thousands,
+    # a single one followed by exactly three digits (1,234 or 1.234) is a thousands separator in one export and
+    # a decimal separator in the next, such an amount needs an explicit decimal_separator
+    separators = [separator for separator in ",." if separator in value]
+
+    if len(separators) == 2:
+        return "," if value.rfind(",") > value.rfind(".") else "."
+
+    if not separators or value.count(separators[0]) > 1:
+        return None
+
+    if len(value) - value.rfind(separators[0]) - 1 == 3:
+        raise ValueError(f"Ambiguous amount: {value}")
+
+    return separators[0]
+
+def parse_csv_amount(value: str, decimal_separator: str | None = None) -> Decimal:
+    # accepts 1234.56, 1,234.56, 1.234,56, 1234,56 and 1,234,567 with an optional currency sign around it,
+    # more than two decimal places are rejected instead of rounded
+    value = "".join(character for character in value.strip() if character.isdigit() or character in ",.-+()")
+
+    if value.startswith("(") and value.endswith(")"):
+        value = "-" + value[1:-1]
+
+    decimal_separator = decimal_separator or guess_decimal_separator(value)
+    integer, _, fraction = value.partition(decimal_separator) if decimal_separator else (value, "", "")
+    sign = integer[:1] if integer[:1] in ("+", "-") else ""
+    thousands_separators = ",.".replace(decimal_separator or "", "")
+    groups = re.split(f"[{re.escape(thousands_separators)}]", integer[len(sign):])
+
+    # thousands separators only between groups of three digits, 12,34 or 1.2345 is not an amount
+    if not all(group.isdigit() for group in groups) or any(len(group) != 3 for group in groups[1:]) or \
+            (len(groups) > 1 and len(groups[0]) > 3):
+        raise ValueError(f"Unknown amount: {value}")
+
+    if fraction and (not fraction.isdigit() or len(fraction) > 2):
+        raise ValueError(f"Unknown amount: {value}")
+
+    return Decimal(f"{sign}{''.join(groups)}.{fraction or '0'}").quantize(Decimal("0.01"))
+
+def parse_csv_type(value: str | None, amount: Decimal) -> bool:
+    # True for an expense, a missing or unknown type falls back to the sign of the amount
+    value = (value or "").strip().lower()
+
+    if value in EXPENSE_TYPES:
+        return True
+
+    if value in INCOME_TYPES:
+        return False
+
+    return amount < 0
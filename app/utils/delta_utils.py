@@ -0,0 +1,39 @@
+import re
+from difflib import SequenceMatcher
+
+# a word with the whitespace after it, or leading whitespace, joining the tokens gives back the text
+TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+TextDelta = list[list[int] | str] # [start, end] copies tokens of the base text, a string is inserted as is
+
+def tokenize_text(value: str) -> list[str]:
+    return TOKEN_PATTERN.findall(value)
+
+def make_delta(base: str, target: str) -> TextDelta:
+    # turns base into target, a note revision stores the delta from the newer content back to its own
+    base_tokens = tokenize_text(base)
+    target_tokens = tokenize_text(target)
+    delta: TextDelta = []
+
+    # autojunk skips the most common words as match anchors, long notes diff in milliseconds instead of seconds
+    for tag, base_start, base_end, target_start, target_end in SequenceMatcher(None, base_tokens, target_tokens).get_opcodes():
+        if tag == "equal":
+            delta.append([base_start, base_end])
+        elif target_start < target_end:
+            inserted = "".join(target_tokens[target_start:target_end])
+
+            # a replace right after an insert, one string instead of two
+            if delta and isinstance(delta[-1], str):
+                delta[-1] += inserted
+            else:
+                delta.append(inserted)
+
+    return delta
+
+def apply_delta(base: str, delta: TextDelta) -> str:
+    base_tokens = tokenize_text(base)
+
+    return "".join(
+        part if isinstance(part, str) else "".join(base_tokens[part[0]:part[1]])
+        for part in delta
+    )
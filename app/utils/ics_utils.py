@@ -0,0 +1,138 @@
+import codecs
+from datetime import date, datetime, time, timezone
+from typing import AsyncIterator, Awaitable, Callable
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+ICS_DATE_FORMAT = "%Y%m%d"
+ICS_DATE_TIME_FORMAT = "%Y%m%dT%H%M%S"
+ICS_LINE_LIMIT = 75 # octets per line before it has to be folded, RFC 5545 3.1
+
+def escape_text(value: str | None) -> str:
+    if not value:
+        return ""
+
+    return (value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+def unescape_text(value: str) -> str:
+    result = []
+    characters = iter(value)
+
+    for character in characters:
+        if character == "\\":
+            escaped = next(characters, "")
+            result.append("\n" if escaped in ("n", "N") else escaped)
+        else:
+            result.append(character)
+
+    return "".join(result)
+
+def fold_line(line: str) -> str:
+    encoded = line.encode("utf-8")
+
+    if len(encoded) <= ICS_LINE_LIMIT:
+        return line + "\r\n"
+
+    parts = []
+    start = 0
+    limit = ICS_LINE_LIMIT
+
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+
+        # never split a multi byte character, continuation bytes look like 10xxxxxx
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+
+        parts.append(encoded[start:end].decode("utf-8"))
+        start = end
+        limit = ICS_LINE_LIMIT - 1 # continuation lines start with a space
+
+    return "\r\n ".join(parts) + "\r\n"
+
+def format_date(value: date) -> str:
+    return value.strftime(ICS_DATE_FORMAT)
+
+def format_date_time(value: datetime) -> str:
+    # the server stores naive local times, so they are exported as floating times
+    return value.strftime(ICS_DATE_TIME_FORMAT)
+
+def parse_content_line(line: str) -> tuple[str, dict[str, str], str]:
+    # NAME;PARAM=VALUE;PARAM="QUOTED:VALUE":value
+    in_quotes = False
+    split_at = -1
+
+    for index, character in enumerate(line):
+        if character == '"':
+            in_quotes = not in_quotes
+        elif character == ":" and not in_quotes:
+            split_at = index
+            break
+
+    if split_at == -1:
+        raise ValueError(f"Invalid content line: {line[:40]}")
+
+    name, *raw_params = line[:split_at].split(";")
+    params = {}
+
+    for raw_param in raw_params:
+        key, _, value = raw_param.partition("=")
+        params[key.upper()] = value.strip('"')
+
+    return name.upper(), params, line[split_at + 1:]
+
+def parse_date_time(value: str, params: dict[str, str]) -> datetime | date:
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime.strptime(value[:8], ICS_DATE_FORMAT).date()
+
+    parsed = datetime.strptime(value[:15], ICS_DATE_TIME_FORMAT)
+
+    if value.endswith("Z"):
+        return parsed.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+    if "TZID" in params:
+        try:
+            return parsed.replace(tzinfo=ZoneInfo(params["TZID"])).astimezone().replace(tzinfo=None)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+
+    # floating time, taken as server local time like everything else
+    return parsed
+
+def split_date_time(value: datetime | date) -> tuple[date, time | None]:
+    if isinstance(value, datetime):
+        return value.date(), value.time()
+
+    return value, None
+
+async def iter_unfolded_lines(read: Callable[[int], Awaitable[bytes]], chunk_size: int = 65536) -> AsyncIterator[str]:
+    # reads the upload chunk by chunk, only one chunk and one logical line are ever held in memory
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    current: str | None = None
+
+    while True:
+        chunk = await read(chunk_size)
+        buffer += decoder.decode(chunk, final=not chunk)
+        *lines, buffer = buffer.split("\n")
+
+        if not chunk:
+            lines.append(buffer)
+
+        for line in lines:
+            line = line.rstrip("\r")
+
+            if line[:1] in (" ", "\t") and current is not None:
+                current += line[1:]
+                continue
+
+            if current:
+                yield current
+
+            current = line
+
+        if not chunk:
+            break
+
+    if current:
+        yield current
@@ -0,0 +1,63 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import Iterable
+
+BUCKET_SIZE = 64 # number of consecutive server ids that share a leaf bucket
+FANOUT = 16 # number of children per inner node
+
+def sha256_hex(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+def content_hash(values: Iterable) -> str:
+    # None and empty string hash the same, the client stores missing text as ""
+    return sha256_hex("\x1f".join("" if value is None else str(value) for value in values))
+
+def leaf_hash(server_id: int, last_modified: int, row_content_hash: str) -> str:
+    return sha256_hex(f"{server_id}:{last_modified}:{row_content_hash}")
+
+def bucket_hash(leaves: dict[int, str]) -> str:
+    return sha256_hex("".join(leaves[server_id] for server_id in sorted(leaves)))
+
+@dataclass
+class MerkleTree:
+    bucket_size: int
+    fanout: int
+    depth: int
+    levels: list[dict[int, str]] = field(default_factory=list) # level 0 is the root, level depth holds the buckets
+    buckets: dict[int, dict[int, str]] = field(default_factory=dict) # bucket index -> {server_id: leaf hash}
+
+    def node_hash(self, level: int, index: int) -> str:
+        if level < 0 or level > self.depth:
+            return ""
+
+        # empty subtrees are not stored, they hash to an empty string on both sides
+        return self.levels[level].get(index, "")
+
+def build_merkle_tree(leaves: dict[int, str], bucket_size: int = BUCKET_SIZE, fanout: int = FANOUT) -> MerkleTree:
+    buckets: dict[int, dict[int, str]] = {}
+
+    for server_id, hashed_leaf in leaves.items():
+        buckets.setdefault(server_id // bucket_size, {})[server_id] = hashed_leaf
+
+    bucket_count = max(buckets) + 1 if buckets else 1
+
+    depth = 0
+    while fanout ** depth < bucket_count:
+        depth += 1
+
+    level = {index: bucket_hash(bucket) for index, bucket in buckets.items()}
+    levels = [level]
+
+    for _ in range(depth):
+        children: dict[int, list[str]] = {}
+
+        for index in sorted(level):
+            # the child position is part of the parent hash so shifted buckets never collide
+            children.setdefault(index // fanout, []).append(f"{index % fanout}:{level[index]}")
+
+        level = {index: sha256_hex("|".join(child_hashes)) for index, child_hashes in children.items()}
+        levels.append(level)
+
+    levels.reverse()
+
+    return MerkleTree(bucket_size=bucket_size, fanout=fanout, depth=depth, levels=levels, buckets=buckets)
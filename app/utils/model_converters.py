@@ -1,8 +1,13 @@
-from core.models import Note
+from datetime import datetime, date, time
+from core.models import Note, Event, Finance, List, ListItem
+from schemas.event_schema import EventResponse
+from schemas.finance_schema import FinanceSync, FinanceResponse
+from schemas.list_schema import ListSync, ListItemSync
 from schemas.note_schema import NoteSync
 from utils.date_time_converters import datetime_to_ms, ms_to_datetime
+from utils.recurrence_utils import parse_recurrence_rule, recurrence_end
 
-def to_note_sync(note: Note) -> NoteSync:
+def to_note_sync(note: Note, with_content: bool = True) -> NoteSync:
     return NoteSync(
         note_id=note.note_id,
         server_id=note.server_id or note.note_id,
@@ -10,7 +15,7 @@ def to_note_sync(note: Note) -> NoteSync:
         category_id=note.category_id or 0,
         reminder_id=note.reminder_id or 0,
         title=note.title,
-        content=note.content or "",
+        content=(note.content or "") if with_content else "",
         created_at=datetime_to_ms(note.created_at),
         updated_at=datetime_to_ms(note.updated_at),
         last_modified=datetime_to_ms(note.last_modified),
@@ -34,3 +39,121 @@ def to_note(note_sync: NoteSync) -> Note:
         is_deleted=note_sync.is_deleted,
         is_pinned=note_sync.is_pinned
     )
+
+def to_finance_sync(finance: Finance) -> FinanceSync:
+    return FinanceSync(
+        finance_id=finance.finance_id,
+        server_id=finance.server_id or finance.finance_id,
+        user_id=finance.user_id,
+        category_id=finance.category_id or 0,
+        reminder_id=finance.reminder_id or 0,
+        type=finance.type,
+        expense_amount=finance.expense_amount,
+        expense_date=datetime_to_ms(finance.expense_date or finance.last_modified),
+        description=finance.description or "",
+        last_modified=datetime_to_ms(finance.last_modified),
+        sync_state=finance.sync_state,
+        is_deleted=finance.is_deleted
+    )
+
+def to_finance(finance_sync: FinanceSync) -> Finance:
+    return Finance(
+        server_id=finance_sync.server_id,
+        user_id=finance_sync.user_id,
+        category_id=None if finance_sync.category_id == 0 else finance_sync.category_id,
+        reminder_id=None if finance_sync.reminder_id == 0 else finance_sync.reminder_id,
+        type=finance_sync.type,
+        expense_amount=finance_sync.expense_amount,
+        expense_date=ms_to_datetime(finance_sync.expense_date),
+        description=finance_sync.description,
+        last_modified=ms_to_datetime(finance_sync.last_modified),
+        sync_state=finance_sync.sync_state,
+        is_deleted=finance_sync.is_deleted
+    )
+
+def to_finance_response(finance: Finance) -> FinanceResponse:
+    return FinanceResponse(
+        finance_id=finance.finance_id,
+        category_id=finance.category_id or 0,
+        reminder_id=finance.reminder_id or 0,
+        type=finance.type,
+        expense_amount=finance.expense_amount,
+        expense_date=datetime_to_ms(finance.expense_date or finance.last_modified),
+        description=finance.description or ""
+    )
+
+def to_list_item_sync(list_item: ListItem) -> ListItemSync:
+    return ListItemSync(
+        item_id=list_item.item_id,
+        server_id=list_item.server_id or list_item.item_id,
+        list_id=list_item.list_id,
+        name=list_item.name,
+        quantity=list_item.quantity or 0,
+        status=bool(list_item.status),
+        last_modified=datetime_to_ms(list_item.last_modified),
+        sync_state=list_item.sync_state,
+        is_deleted=list_item.is_deleted
+    )
+
+def to_list_sync(list_row: List, list_items: list[ListItem] | None = None) -> ListSync:
+    return ListSync(
+        list_id=list_row.list_id,
+        server_id=list_row.server_id or list_row.list_id,
+        user_id=list_row.user_id,
+        title=list_row.title,
+        created_at=datetime_to_ms(list_row.created_at),
+        updated_at=datetime_to_ms(list_row.updated_at),
+        last_modified=datetime_to_ms(list_row.last_modified),
+        sync_state=list_row.sync_state,
+        is_deleted=list_row.is_deleted,
+        items=[to_list_item_sync(list_item) for list_item in list_items or []]
+    )
+
+def to_event_response(event: Event, occurrence_date: date | None = None) -> EventResponse:
+    # occurrences of a recurring event share its event_id and only differ in the date
+    event_date = occurrence_date or event.date
+
+    return EventResponse(
+        event_id=event.event_id,
+        category_id=event.category_id or 0,
+        reminder_id=event.reminder_id or 0,
+        title=event.title,
+        description=event.description or "",
+        date=datetime_to_ms(datetime.combine(event_date, time.min)),
+        start_time=datetime_to_ms(datetime.combine(event_date, event.start_time or time.min)),
+        end_time=datetime_to_ms(datetime.combine(event_date, event.end_time or time.min)),
+        priority=event.priority or 0,
+        location=event.location or "",
+        recurrence_rule=event.recurrence_rule or ""
+    )
+
+def to_recurrence_columns(
+        recurrence_rule: str,
+        event_date: date,
+        recurrence_exceptions: list[int] | None = None,
+        recurrence_parent_id: int = 0,
+        recurrence_date: int = 0
+) -> dict:
+    # raises ValueError for a rule the expansion engine does not understand
+    rule = parse_recurrence_rule(recurrence_rule) if recurrence_rule else None
+
+    return {
+        "recurrence_rule": recurrence_rule or None,
+        "recurrence_end": recurrence_end(event_date, rule) if rule else None,
+        "recurrence_exceptions": [
+            ms_to_datetime(value).date().isoformat() for value in recurrence_exceptions or []
+        ] or None,
+        "recurrence_parent_id": recurrence_parent_id or None,
+        "recurrence_date": ms_to_datetime(recurrence_date).date() if recurrence_date else None,
+    }
+
+def to_recurrence_sync(event: Event) -> dict:
+    return {
+        "recurrence_rule": event.recurrence_rule or "",
+        "recurrence_exceptions": [
+            datetime_to_ms(datetime.combine(date.fromisoformat(value), time.min))
+            for value in event.recurrence_exceptions or []
+        ],
+        "recurrence_parent_id": event.recurrence_parent_id or 0,
+        "recurrence_date": datetime_to_ms(datetime.combine(event.recurrence_date, time.min)) if event.recurrence_date else 0,
+    }
@@ -1,16 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
+from typing import Callable, TypeVar
+import asyncio
+import os
 import re
 
+T = TypeVar("T")
+
 # deprecated auto means that if bcrypt gets a new update then passlib will rehash old passwords
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# unused code but I leave it here just in case
+# bcrypt takes around a quarter second on the pi, so it runs in its own small pool instead of on the event loop
+# the worker count is the concurrency cap, everything above it waits in the executor queue
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="password")
+
+password_pool_stats = {
+    "workers": PASSWORD_WORKERS,
+    "in_flight": 0,
+    "max_queue_depth": 0,
+    "completed": 0,
+}
+
+def get_password_pool_stats() -> dict:
+    return {
+        **password_pool_stats,
+        "queue_depth": max(0, password_pool_stats["in_flight"] - PASSWORD_WORKERS),
+    }
+
+async def run_password_task(func: Callable[..., T], *args) -> T:
+    password_pool_stats["in_flight"] += 1
+    queue_depth = password_pool_stats["in_flight"] - PASSWORD_WORKERS
+    password_pool_stats["max_queue_depth"] = max(password_pool_stats["max_queue_depth"], queue_depth)
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
+    finally:
+        password_pool_stats["in_flight"] -= 1
+        password_pool_stats["completed"] += 1
+
+def shutdown_password_pool():
+    password_executor.shutdown(wait=False, cancel_futures=True)
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password, hashed_password) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def hash_password_async(password: str) -> str:
+    return await run_password_task(hash_password, password)
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    return await run_password_task(verify_password, plain_password, hashed_password)
+
 def is_valid_password(password: str) -> bool:
     if len(password) < 8:
         return False
@@ -0,0 +1,158 @@
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Iterable, Iterator
+
+# a subset of RFC 5545 RRULE: FREQ=DAILY|WEEKLY|MONTHLY|YEARLY;INTERVAL=n;COUNT=n;UNTIL=YYYYMMDD;BYDAY=MO,WE,FR,
+# BYDAY only on WEEKLY rules, any other part is rejected instead of being ignored
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+RULE_KEYS = ("FREQ", "INTERVAL", "COUNT", "UNTIL", "BYDAY")
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+
+@dataclass(frozen=True)
+class RecurrenceRule:
+    frequency: str
+    interval: int = 1
+    count: int | None = None
+    until: date | None = None
+    by_weekday: tuple[int, ...] = () # only used by WEEKLY rules
+
+def parse_recurrence_rule(rule: str) -> RecurrenceRule:
+    parts: dict[str, str] = {}
+
+    for part in rule.removeprefix("RRULE:").split(";"):
+        if not part:
+            continue
+
+        key, separator, value = part.partition("=")
+
+        if not separator:
+            raise ValueError(f"Invalid recurrence rule part: {part}")
+
+        key = key.strip().upper()
+
+        # BYMONTH, BYMONTHDAY, BYSETPOS, ... would be ignored by the expansion and give wrong dates, so refuse them
+        if key not in RULE_KEYS:
+            raise ValueError(f"Unsupported recurrence rule part: {key}")
+
+        parts[key] = value.strip().upper()
+
+    frequency = parts.get("FREQ")
+
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"Unsupported recurrence frequency: {frequency}")
+
+    interval = int(parts.get("INTERVAL", "1"))
+    count = int(parts["COUNT"]) if "COUNT" in parts else None
+    until = datetime.strptime(parts["UNTIL"][:8], "%Y%m%d").date() if "UNTIL" in parts else None
+
+    if interval < 1 or (count is not None and count < 1):
+        raise ValueError("Recurrence interval and count must be positive")
+
+    if count is not None and until is not None:
+        raise ValueError("Recurrence rule cannot have both COUNT and UNTIL")
+
+    if "BYDAY" in parts and frequency != "WEEKLY":
+        raise ValueError("BYDAY is only supported on WEEKLY recurrence rules")
+
+    by_days = parts["BYDAY"].split(",") if "BYDAY" in parts else []
+
+    if any(day not in WEEKDAYS for day in by_days):
+        raise ValueError(f"Unsupported recurrence weekday in: {parts['BYDAY']}")
+
+    by_weekday = tuple(sorted({WEEKDAYS[day] for day in by_days}))
+
+    return RecurrenceRule(frequency=frequency, interval=interval, count=count, until=until, by_weekday=by_weekday)
+
+def add_months(value: date, months: int) -> date | None:
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+
+    try:
+        return value.replace(year=year, month=month)
+    except ValueError:
+        # the 31st or the 29th of february does not exist in every month, RFC 5545 skips those
+        return None
+
+def iter_all_occurrences(start: date, rule: RecurrenceRule, from_date: date) -> Iterator[tuple[int, date]]:
+    # yields (occurrence index, date) from the first occurrence on or after from_date, jumping there in O(1)
+    # for daily and weekly rules, the index is what COUNT is checked against
+    if rule.frequency == "DAILY":
+        step = rule.interval
+        index = max(0, -(-(from_date - start).days // step))
+
+        while True:
+            yield index, start + timedelta(days=index * step)
+            index += 1
+
+    elif rule.frequency == "WEEKLY":
+        weekdays = rule.by_weekday or (start.weekday(),)
+        anchor = start - timedelta(days=start.weekday())
+        first_week = [weekday for weekday in weekdays if weekday >= start.weekday()]
+        week_length = 7 * rule.interval
+        week = max(0, (from_date - anchor).days // week_length)
+        index = 0 if week == 0 else len(first_week) + (week - 1) * len(weekdays)
+
+        while True:
+            week_start = anchor + timedelta(days=week * week_length)
+
+            for weekday in (first_week if week == 0 else weekdays):
+                occurrence = week_start + timedelta(days=weekday)
+
+                if occurrence >= from_date:
+                    yield index, occurrence
+
+                index += 1
+
+            week += 1
+
+    else:
+        months = rule.interval if rule.frequency == "MONTHLY" else 12 * rule.interval
+        step = 0
+        index = 0
+
+        while True:
+            occurrence = add_months(start, step * months)
+
+            if occurrence is not None:
+                if occurrence >= from_date:
+                    yield index, occurrence
+
+                index += 1
+
+            step += 1
+
+def iter_occurrences(
+        start: date,
+        rule: RecurrenceRule,
+        window_start: date,
+        window_end: date,
+        exceptions: Iterable[date] = (),
+) -> Iterator[date]:
+    excluded = set(exceptions)
+
+    for index, occurrence in iter_all_occurrences(start, rule, max(start, window_start)):
+        if occurrence > window_end:
+            return
+        if rule.count is not None and index >= rule.count:
+            return
+        if rule.until is not None and occurrence > rule.until:
+            return
+        if occurrence not in excluded:
+            yield occurrence
+
+def recurrence_end(start: date, rule: RecurrenceRule) -> date | None:
+    # last possible occurrence, stored on the event so range queries can skip finished series, None never ends
+    if rule.until is not None:
+        return rule.until
+
+    if rule.count is None:
+        return None
+
+    last = start
+
+    for index, occurrence in iter_all_occurrences(start, rule, start):
+        if index >= rule.count:
+            break
+        last = occurrence
+
+    return last
@@ -0,0 +1,199 @@
+import numpy as np
+from datetime import datetime, time, timedelta
+from typing import Sequence
+from core.enums import ReminderFrequency
+
+# occurrences of many schedules are computed at once as datetime64 matrices, one row per schedule,
+# NaT marks a missing occurrence, e.g. after a one-off reminder has passed
+DATETIME_TYPE = "datetime64[us]"
+NOT_A_TIME = np.datetime64("NaT", "us")
+DAY = np.timedelta64(1, "D").astype("timedelta64[us]")
+MINUTE = np.timedelta64(1, "m").astype("timedelta64[us]")
+ONE_MICROSECOND = np.timedelta64(1, "us")
+
+DAY_STEPS = {ReminderFrequency.DAILY: 1, ReminderFrequency.WEEKLY: 7}
+MONTH_STEPS = {ReminderFrequency.MONTHLY: 1, ReminderFrequency.YEARLY: 12}
+REPEATING_FREQUENCIES = tuple(int(frequency) for frequency in (*DAY_STEPS, *MONTH_STEPS))
+# shortest period of each frequency, a window at least this long contains an occurrence of every reminder
+REPEAT_PERIODS = {
+    ReminderFrequency.DAILY: timedelta(days=1),
+    ReminderFrequency.WEEKLY: timedelta(days=7),
+    ReminderFrequency.MONTHLY: timedelta(days=28),
+    ReminderFrequency.YEARLY: timedelta(days=365),
+}
+
+def to_datetime64(values: Sequence[datetime] | datetime) -> np.ndarray:
+    return np.asarray(values, dtype=DATETIME_TYPE)
+
+def to_time_of_day(values: Sequence[time]) -> np.ndarray:
+    seconds = [value.hour * 3600 + value.minute * 60 + value.second for value in values]
+    return np.asarray(seconds, dtype=np.int64).astype("timedelta64[s]").astype("timedelta64[us]")
+
+def ceil_divide(numerator: np.ndarray, denominator: int) -> np.ndarray:
+    return -(-numerator // denominator)
+
+def day_step_occurrences(starts: np.ndarray, step_days: int, after: np.datetime64, count: int) -> np.ndarray:
+    step = step_days * DAY
+    first = np.maximum(0, ceil_divide((after - starts) // ONE_MICROSECOND, step // ONE_MICROSECOND))
+    return starts[:, None] + (first[:, None] + np.arange(count)) * step
+
+def month_step_occurrences(starts: np.ndarray, step_months: int, after: np.datetime64, count: int) -> np.ndarray:
+    months = starts.astype("datetime64[M]")
+    offset = starts - months.astype(DATETIME_TYPE)
+    offset_days = offset // DAY
+    time_of_day = offset - offset_days * DAY
+
+    elapsed_months = (after.astype("datetime64[M]") - months).astype(np.int64)
+    first = np.maximum(0, ceil_divide(elapsed_months, step_months))
+
+    # one extra candidate, the first one can fall earlier in the month than after
+    candidate_months = months[:, None] + ((first[:, None] + np.arange(count + 1)) * step_months).astype("timedelta64[M]")
+    month_starts = candidate_months.astype(DATETIME_TYPE)
+    month_days = ((candidate_months + np.timedelta64(1, "M")).astype(DATETIME_TYPE) - month_starts) // DAY
+
+    # the 31st of a shorter month falls on its last day instead
+    days = np.minimum(offset_days[:, None], month_days - 1)
+    candidates = month_starts + days * DAY + time_of_day[:, None]
+
+    shift = (candidates[:, 0] < after).astype(np.int64)
+    return np.take_along_axis(candidates, shift[:, None] + np.arange(count), axis=1)
+
+def once_occurrences(starts: np.ndarray, after: np.datetime64, count: int) -> np.ndarray:
+    occurrences = np.full((len(starts), count), NOT_A_TIME)
+    occurrences[:, 0] = np.where(starts >= after, starts, NOT_A_TIME)
+    return occurrences
+
+def frequency_occurrences(starts: np.ndarray, frequency: int, after: np.datetime64, count: int) -> np.ndarray:
+    if frequency in DAY_STEPS:
+        return day_step_occurrences(starts, DAY_STEPS[frequency], after, count)
+
+    if frequency in MONTH_STEPS:
+        return month_step_occurrences(starts, MONTH_STEPS[frequency], after, count)
+
+    # unknown frequencies fire once, like the reminders created before frequencies had a meaning
+    return once_occurrences(starts, after, count)
+
+def next_reminder_occurrences(starts: np.ndarray, frequencies: np.ndarray, after: datetime, count: int) -> np.ndarray:
+    # (len(starts), count) matrix of the next occurrences at or after after
+    after = np.datetime64(after, "us")
+    occurrences = np.full((len(starts), count), NOT_A_TIME)
+
+    for frequency in np.unique(frequencies):
+        rows = np.flatnonzero(frequencies == frequency)
+        occurrences[rows] = frequency_occurrences(starts[rows], int(frequency), after, count)
+
+    return occurrences
+
+def max_occurrences(frequency: int, window_start: np.datetime64, window_end: np.datetime64) -> int:
+    # upper bound of occurrences one schedule can have in [window_start, window_end)
+    if frequency in DAY_STEPS:
+        return max(1, int(ceil_divide((window_end - window_start) // ONE_MICROSECOND, DAY_STEPS[frequency] * DAY // ONE_MICROSECOND)))
+
+    if frequency in MONTH_STEPS:
+        months = (window_end.astype("datetime64[M]") - window_start.astype("datetime64[M]")).astype(np.int64) + 1
+        return int(ceil_divide(months, MONTH_STEPS[frequency])) + 1
+
+    return 1
+
+def reminder_occurrences_in_window(
+        starts: np.ndarray,
+        frequencies: np.ndarray,
+        window_start: datetime,
+        window_end: datetime
+) -> tuple[np.ndarray, np.ndarray]:
+    # (row indexes, occurrences) of every occurrence in [window_start, window_end), ordered by occurrence
+    window_start = np.datetime64(window_start, "us")
+    window_end = np.datetime64(window_end, "us")
+    found_rows, found_times = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=DATETIME_TYPE)]
+
+    for frequency in np.unique(frequencies):
+        rows = np.flatnonzero(frequencies == frequency)
+        count = max_occurrences(int(frequency), window_start, window_end)
+        occurrences = frequency_occurrences(starts[rows], int(frequency), window_start, count)
+
+        # NaT compares false, so finished one-off reminders drop out here
+        row_index, column = np.nonzero(occurrences < window_end)
+        found_rows.append(rows[row_index])
+        found_times.append(occurrences[row_index, column])
+
+    rows = np.concatenate(found_rows)
+    times = np.concatenate(found_times)
+    order = np.argsort(times, kind="stable")
+    return rows[order], times[order]
+
+def seconds_of_day(value: datetime) -> float:
+    return value.hour * 3600 + value.minute * 60 + value.second + value.microsecond / 1_000_000
+
+def repeat_day_offsets(day: datetime, frequency: int) -> list[int]:
+    # days from the start of the period of the reminders firing on day, the last day of a month also takes the days
+    # shorter months clamp to it, a reminder on the 31st fires on the 30th of april
+    if frequency == ReminderFrequency.DAILY:
+        return [0]
+
+    if frequency == ReminderFrequency.WEEKLY:
+        return [day.weekday()]
+
+    month_offset = (day.month - 1) * 31 if frequency == ReminderFrequency.YEARLY else 0
+    last_day = 31 if (day + timedelta(days=1)).month != day.month else day.day
+
+    return [month_offset + month_day - 1 for month_day in range(day.day, last_day + 1)]
+
+def repeat_offset_ranges(frequency: int, window_start: datetime, window_end: datetime) -> list[tuple[float, float]] | None:
+    # ranges of Reminder.repeat_offset that can have an occurrence in [window_start, window_end], None for every offset,
+    # padded by a second against float rounding, the occurrences themselves are computed exactly afterwards
+    if window_end - window_start >= REPEAT_PERIODS[frequency]:
+        return None
+
+    ranges: list[tuple[float, float]] = []
+    day = datetime.combine(window_start.date(), time.min)
+
+    while day <= window_end:
+        first = seconds_of_day(max(window_start, day))
+        last = seconds_of_day(min(window_end, datetime.combine(day.date(), time.max)))
+
+        for day_offset in repeat_day_offsets(day, frequency):
+            low, high = day_offset * 86400 + first - 1, day_offset * 86400 + last + 1
+
+            if ranges and ranges[-1][0] <= low <= ranges[-1][1]:
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], high))
+            else:
+                ranges.append((low, high))
+
+        day += timedelta(days=1)
+
+    return ranges
+
+def health_occurrences_in_window(
+        start_times: Sequence[time],
+        end_times: Sequence[time],
+        frequencies: Sequence[int],
+        window_start: datetime,
+        window_end: datetime
+) -> tuple[np.ndarray, np.ndarray]:
+    # health reminders repeat every frequency minutes from start_time to end_time each day,
+    # an end before the start runs past midnight, a frequency of 0 fires once at start_time
+    starts = to_time_of_day(start_times)
+    ends = to_time_of_day(end_times)
+    ends = np.where(ends < starts, ends + DAY, ends)
+    steps = np.asarray(frequencies, dtype=np.int64) * MINUTE
+
+    slots = np.where(steps > np.timedelta64(0, "us"), (ends - starts) // np.maximum(steps, MINUTE) + 1, 1)
+    row_index = np.repeat(np.arange(len(starts)), slots)
+    slot_index = np.arange(slots.sum()) - np.repeat(np.cumsum(slots) - slots, slots)
+    offsets = starts[row_index] + slot_index * steps[row_index]
+
+    # the day before the window is included for schedules running past midnight
+    window_start = np.datetime64(window_start, "us")
+    window_end = np.datetime64(window_end, "us")
+    days = np.arange(
+        window_start.astype("datetime64[D]") - np.timedelta64(1, "D"),
+        window_end.astype("datetime64[D]") + np.timedelta64(1, "D"),
+    ).astype(DATETIME_TYPE)
+
+    occurrences = days[:, None] + offsets[None, :]
+    day, column = np.nonzero((occurrences >= window_start) & (occurrences < window_end))
+
+    rows = row_index[column]
+    times = occurrences[day, column]
+    order = np.argsort(times, kind="stable")
+    return rows[order], times[order]
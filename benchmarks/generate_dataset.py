@@ -0,0 +1,414 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, time as day_time
+from decimal import Decimal
+from itertools import accumulate
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+os.environ.setdefault("ENV", "dev")
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://localhost/unused")
+
+import asyncpg
+from passlib.hash import bcrypt
+from sqlalchemy import Table
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.schema import CreateIndex
+from core.enums import EntityType, SyncAction, SyncResult
+from core.models import Base, User, Category, Reminder, Note, Event, Finance, FinanceMonthly, List, ListItem, SyncLog
+from utils.recurrence_utils import parse_recurrence_rule, recurrence_end
+
+# generates users with years of categories, reminders, notes, events, finance rows, lists and sync log entries,
+# the same seed and options always give the same rows, they are loaded with COPY batch by batch,
+# the finance rollups and balances are computed on the way so they match the finance rows
+
+DATASET_PASSWORD = "Dataset_1" # every generated user logs in with it
+
+# loaded in this order, parents before children
+LOAD_TABLES: tuple[Table, ...] = tuple(model.__table__ for model in (
+    User, Category, Reminder, Note, Event, Finance, FinanceMonthly, List, ListItem, SyncLog
+))
+
+WORDS = (
+    "the a to and of in for on with at is it this that from by we be will as are meeting project budget review "
+    "draft call notes idea todo follow up client invoice design team week plan release bug fix feature test "
+    "deploy server backup garden recipe travel book list shopping doctor school monday friday tomorrow today "
+    "morning evening email report price order delivery kids dinner birthday gift flight hotel car repair tax "
+    "bank insurance rent water power internet phone gym run yoga coffee lunch weekend holiday summer winter"
+).split()
+# zipf weights, the first words of the list are by far the most common like in real text
+WORD_WEIGHTS = list(accumulate(1 / rank for rank in range(1, len(WORDS) + 1)))
+
+CATEGORY_NAMES = ("Work", "Home", "Family", "Health", "Finance", "Travel", "Shopping", "Hobby", "School", "Sport",
+                  "Friends", "Car", "Garden", "Pets", "Projects", "Ideas")
+COLORS = ("#e53935", "#8e24aa", "#3949ab", "#039be5", "#00897b", "#7cb342", "#fdd835", "#fb8c00", "#6d4c41")
+ICONS = ("work", "home", "family", "health", "money", "plane", "cart", "star", "school", "sport")
+PLACES = ("Office", "Home", "Gym", "Cafe", "School", "Downtown", "Clinic", "Park", "Online")
+PAYEES = ("Supermarket", "Bakery", "Fuel station", "Pharmacy", "Restaurant", "Online shop", "Electricity", "Rent",
+          "Insurance", "Salary", "Refund", "Transfer", "Cinema", "Bookstore")
+LIST_NAMES = ("Groceries", "Packing", "Gifts", "Books to read", "Movies", "Home repairs", "Party", "Garden", "Errands")
+ITEM_NAMES = ("milk", "bread", "eggs", "butter", "cheese", "apples", "bananas", "rice", "pasta", "tomatoes",
+              "onions", "coffee", "tea", "sugar", "flour", "chicken", "fish", "yogurt", "juice", "water",
+              "soap", "shampoo", "toothpaste", "batteries", "tape", "candles", "napkins", "charger", "socks", "towels")
+RECURRENCE_RULES = ("FREQ=DAILY;COUNT=10", "FREQ=WEEKLY;COUNT=20", "FREQ=WEEKLY;INTERVAL=2", "FREQ=MONTHLY;COUNT=12",
+                    "FREQ=YEARLY")
+
+def copy_columns(table: Table) -> list[str]:
+    # generated columns (search_vector, time_range) are computed by Postgres and cannot be copied
+    return [column.name for column in table.columns if column.computed is None]
+
+COPY_COLUMNS = {table.name: copy_columns(table) for table in LOAD_TABLES}
+
+def poisson(rng: random.Random, mean: float) -> int:
+    # normal approximation above 30, it only decides how many rows a user gets
+    if mean <= 0:
+        return 0
+
+    if mean > 30:
+        return max(0, round(rng.gauss(mean, math.sqrt(mean))))
+
+    limit = math.exp(-mean)
+    count = 0
+    product = rng.random()
+
+    while product > limit:
+        count += 1
+        product *= rng.random()
+
+    return count
+
+def words(rng: random.Random, count: int) -> list[str]:
+    return rng.choices(WORDS, cum_weights=WORD_WEIGHTS, k=count)
+
+def title_text(rng: random.Random) -> str:
+    return " ".join(words(rng, rng.randint(2, 6))).capitalize()
+
+def body_text(rng: random.Random, count: int) -> str:
+    # lines of about a dozen words
+    tokens = words(rng, count)
+    return "\n".join(" ".join(tokens[start:start + 12]) for start in range(0, len(tokens), 12))
+
+def lognormal(rng: random.Random, median: float, sigma: float) -> float:
+    return median * math.exp(rng.gauss(0, sigma))
+
+class Period:
+    def __init__(self, end: date, years: float):
+        self.end = datetime.combine(end, day_time(23, 59, 59))
+        self.start = self.end - timedelta(days=round(years * 365))
+        self.seconds = (self.end - self.start).total_seconds()
+        self.days = self.seconds / 86400
+
+    def moment(self, rng: random.Random, after: datetime | None = None) -> datetime:
+        start = after or self.start
+        span = max(0.0, (self.end - start).total_seconds())
+        return (start + timedelta(seconds=rng.random() * span)).replace(microsecond=0)
+
+    def later(self, rng: random.Random, moment: datetime, mean_days: float) -> datetime:
+        # edits follow the creation after an exponential wait, never after the end of the period
+        return min(self.end, moment + timedelta(days=rng.expovariate(1 / mean_days))).replace(microsecond=0)
+
+class Batch:
+    # rows of a few users, table name -> records in COPY_COLUMNS order
+
+    def __init__(self):
+        self.records: dict[str, list[tuple]] = {table.name: [] for table in LOAD_TABLES}
+        self.rollups: dict[tuple, list] = {}
+
+    def add(self, table: Table, **row):
+        self.records[table.name].append(tuple(row.get(column) for column in COPY_COLUMNS[table.name]))
+
+    def add_finance_rollup(self, user_id: int, expense_date: datetime, category_id: int | None, is_expense: bool,
+                           amount: Decimal):
+        # same keys as finance_rollup_key, category 0 for the rows without one
+        key = (user_id, expense_date.date().replace(day=1), category_id or 0, is_expense)
+        rollup = self.rollups.setdefault(key, [Decimal(0), 0])
+        rollup[0] += amount
+        rollup[1] += 1
+
+    def close(self):
+        for (user_id, month, category_id, is_expense), (total, count) in sorted(self.rollups.items()):
+            self.add(FinanceMonthly.__table__, user_id=user_id, month=month, category_id=category_id, type=is_expense,
+                     total=total, entry_count=count)
+
+    def row_count(self) -> int:
+        return sum(len(records) for records in self.records.values())
+
+class IdCounter:
+    # ids are assigned here, a generated row can reference its parent without reading anything back
+
+    def __init__(self, starts: dict[str, int]):
+        self.next_ids = dict(starts)
+
+    def next(self, table: Table) -> int:
+        value = self.next_ids[table.name]
+        self.next_ids[table.name] = value + 1
+        return value
+
+def row_state(rng: random.Random, args) -> dict:
+    return {"sync_state": 0, "is_deleted": int(rng.random() < args.deleted_ratio)}
+
+def generate_user(args, index: int, ids: IdCounter, batch: Batch, period: Period, password_hash: str):
+    # every user has its own random stream, the rows of a user do not depend on the batch size
+    rng = random.Random(f"{args.seed}:{index}")
+    activity = lognormal(rng, 1.0, args.activity_sigma) / math.exp(args.activity_sigma ** 2 / 2) # mean 1
+    user_id = ids.next(User.__table__)
+    joined = period.start - timedelta(days=rng.randint(0, 60))
+
+    category_ids = []
+
+    for name in rng.sample(CATEGORY_NAMES, min(len(CATEGORY_NAMES), max(1, poisson(rng, args.categories_per_user)))):
+        category_id = ids.next(Category.__table__)
+        category_ids.append(category_id)
+        created = period.moment(rng)
+        batch.add(Category.__table__, category_id=category_id, server_id=category_id, user_id=user_id, name=name,
+                  description=body_text(rng, rng.randint(3, 12)), color=rng.choice(COLORS), icon=rng.choice(ICONS),
+                  created_at=created, updated_at=created, last_modified=created, sync_state=0, is_deleted=0)
+
+    def category() -> int | None:
+        return rng.choice(category_ids) if category_ids and rng.random() < 0.8 else None
+
+    reminder_ids = []
+
+    for _ in range(poisson(rng, args.reminders_per_user * activity)):
+        reminder_id = ids.next(Reminder.__table__)
+        reminder_ids.append(reminder_id)
+        created = period.moment(rng)
+        batch.add(Reminder.__table__, reminder_id=reminder_id, server_id=reminder_id, user_id=user_id,
+                  reminder_time=period.later(rng, created, 14), frequency=rng.choices((0, 1, 2, 3, 4), (60, 15, 15, 8, 2))[0],
+                  status=int(rng.random() < 0.7), message=title_text(rng), created_at=created, updated_at=created,
+                  last_modified=created, **row_state(rng, args))
+
+    def reminder() -> int | None:
+        return rng.choice(reminder_ids) if reminder_ids and rng.random() < 0.05 else None
+
+    notes = []
+
+    for _ in range(poisson(rng, args.notes_per_day * period.days * activity)):
+        note_id = ids.next(Note.__table__)
+        created = period.moment(rng)
+        updated = period.later(rng, created, 20)
+        title = title_text(rng)
+        content = body_text(rng, max(1, round(lognormal(rng, args.note_words_median, args.note_words_sigma))))
+        state = row_state(rng, args)
+        notes.append((note_id, title, content))
+        batch.add(Note.__table__, note_id=note_id, server_id=note_id, user_id=user_id, category_id=category(),
+                  reminder_id=reminder(), title=title, content=content, created_at=created, updated_at=updated,
+                  last_modified=updated, is_pinned=int(rng.random() < args.pinned_ratio), **state)
+
+    events = []
+
+    for _ in range(poisson(rng, args.events_per_day * period.days * activity)):
+        event_id = ids.next(Event.__table__)
+        events.append(event_id)
+        created = period.moment(rng)
+        event_date = period.moment(rng).date()
+        start_time = day_time(rng.randint(7, 20), rng.choice((0, 15, 30, 45))) if rng.random() < 0.7 else None
+        end_time = (datetime.combine(event_date, start_time) + timedelta(minutes=rng.choice((30, 60, 90, 120)))).time() \
+            if start_time else None
+        rule = rng.choice(RECURRENCE_RULES) if rng.random() < args.recurring_ratio else None
+        batch.add(Event.__table__, event_id=event_id, server_id=event_id, user_id=user_id, category_id=category(),
+                  reminder_id=reminder(), title=title_text(rng), description=body_text(rng, rng.randint(0, 30)),
+                  date=event_date, start_time=start_time, end_time=end_time, priority=rng.choice((0, 0, 0, 1, 2)),
+                  location=rng.choice(PLACES) if rng.random() < 0.4 else None, recurrence_rule=rule,
+                  recurrence_end=recurrence_end(event_date, parse_recurrence_rule(rule)) if rule else None,
+                  created_at=created, updated_at=created, last_modified=created, **row_state(rng, args))
+
+    balance = Decimal(0)
+    finances = []
+
+    for _ in range(poisson(rng, args.finances_per_day * period.days * activity)):
+        finance_id = ids.next(Finance.__table__)
+        finances.append(finance_id)
+        expense_date = period.moment(rng)
+        is_expense = rng.random() < args.expense_ratio
+        amount = Decimal(f"{lognormal(rng, 25 if is_expense else 400, 1.0):.2f}")
+        category_id = category()
+        state = row_state(rng, args)
+        batch.add(Finance.__table__, finance_id=finance_id, server_id=finance_id, user_id=user_id,
+                  category_id=category_id, reminder_id=reminder(), type=is_expense, expense_amount=amount,
+                  expense_date=expense_date, description=rng.choice(PAYEES), last_modified=expense_date, **state)
+
+        # soft deleted rows are part of neither the rollups nor the balance
+        if not state["is_deleted"]:
+            batch.add_finance_rollup(user_id, expense_date, category_id, is_expense, amount)
+            balance += -amount if is_expense else amount
+
+    for title in rng.sample(LIST_NAMES, min(len(LIST_NAMES), poisson(rng, args.lists_per_user))):
+        list_id = ids.next(List.__table__)
+        created = period.moment(rng)
+        batch.add(List.__table__, list_id=list_id, server_id=list_id, user_id=user_id, title=title, created_at=created,
+                  updated_at=created, last_modified=created, **row_state(rng, args))
+
+        for name in rng.sample(ITEM_NAMES, min(len(ITEM_NAMES), poisson(rng, args.items_per_list))):
+            item_id = ids.next(ListItem.__table__)
+            batch.add(ListItem.__table__, item_id=item_id, server_id=item_id, list_id=list_id, name=name,
+                      quantity=rng.randint(1, 6), status=rng.random() < 0.3, last_modified=period.later(rng, created, 3),
+                      sync_state=0, is_deleted=0)
+
+    # the sync log mostly records note uploads with their full snapshots, the rest are small entries
+    for _ in range(poisson(rng, args.sync_log_per_day * period.days * activity)):
+        entity_type, entity_id, new_data = EntityType.USER, user_id, None
+
+        if notes and rng.random() < 0.5:
+            note_id, title, content = rng.choice(notes)
+            entity_type, entity_id = EntityType.NOTE, note_id
+            new_data = {"note_id": note_id, "server_id": note_id, "user_id": user_id, "title": title, "content": content}
+        elif events and rng.random() < 0.5:
+            entity_type, entity_id = EntityType.EVENT, rng.choice(events)
+        elif finances:
+            entity_type, entity_id = EntityType.FINANCE, rng.choice(finances)
+
+        result = rng.choices((SyncResult.SUCCESS, SyncResult.NO_CHANGES, SyncResult.FAILED), (90, 7, 3))[0]
+        batch.add(SyncLog.__table__, sync_log_id=ids.next(SyncLog.__table__), user_id=user_id,
+                  entity_type=entity_type.value, entity_id=entity_id,
+                  old_data=None, new_data=json.dumps(new_data) if new_data else None,
+                  action=rng.choice((SyncAction.SYNC_UPLOAD, SyncAction.SYNC_DOWNLOAD)).value, result=result.value,
+                  exception_type="UserMismatch" if result == SyncResult.FAILED else None,
+                  exception_message=None, timestamp=period.moment(rng))
+
+    batch.add(User.__table__, user_id=user_id, server_id=user_id, email=f"user{index}.s{args.seed}@example.com",
+              username=f"u{index}_s{args.seed}", balance=balance, password_hash=password_hash, created_at=joined,
+              updated_at=joined, last_modified=joined, sync_state=0, is_deleted=0, token_generation=0)
+
+def asyncpg_dsn(database_url: str) -> str:
+    return make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+async def prepare_schema(database_url: str, replace: bool):
+    engine = create_async_engine(database_url)
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    await engine.dispose()
+
+    if replace:
+        connection = await asyncpg.connect(asyncpg_dsn(database_url))
+        await connection.execute(
+            f"TRUNCATE {', '.join(table.name for table in LOAD_TABLES)} RESTART IDENTITY CASCADE"
+        )
+        await connection.close()
+
+async def drop_indexes(connection: asyncpg.Connection) -> list:
+    # secondary indexes are built once after the load instead of row by row during it, only the existing ones
+    dropped = []
+
+    for table in LOAD_TABLES:
+        existing = {row["indexname"] for row in await connection.fetch(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = $1", table.name)}
+
+        for index in table.indexes:
+            if index.name in existing:
+                await connection.execute(f'DROP INDEX "{index.name}"')
+                dropped.append(index)
+
+    return dropped
+
+async def load(args):
+    period = Period(args.end_date, args.years)
+    await prepare_schema(args.database_url, args.replace)
+    connection = await asyncpg.connect(asyncpg_dsn(args.database_url))
+
+    starts = {}
+
+    for table in LOAD_TABLES:
+        primary_key = list(table.primary_key.columns)
+
+        if len(primary_key) == 1 and primary_key[0].autoincrement is True:
+            starts[table.name] = await connection.fetchval(
+                f'SELECT coalesce(max("{primary_key[0].name}"), 0) + 1 FROM "{table.name}"')
+
+    ids = IdCounter(starts)
+    # a fixed salt keeps the rows identical between runs
+    password_hash = bcrypt.using(salt=f"{args.seed:021d}.").hash(DATASET_PASSWORD)
+    dropped = [] if args.keep_indexes else await drop_indexes(connection)
+    totals = {table.name: 0 for table in LOAD_TABLES}
+    started = time.perf_counter()
+
+    for first in range(0, args.users, args.batch_users):
+        batch = Batch()
+
+        for index in range(first, min(args.users, first + args.batch_users)):
+            generate_user(args, index, ids, batch, period, password_hash)
+
+        batch.close()
+
+        # one transaction per batch, an interrupted load keeps whole users only
+        async with connection.transaction():
+            for table in LOAD_TABLES:
+                records = batch.records[table.name]
+
+                if records:
+                    await connection.copy_records_to_table(table.name, records=records, columns=COPY_COLUMNS[table.name])
+                    totals[table.name] += len(records)
+
+        print({"users": min(args.users, first + args.batch_users), "rows": batch.row_count(),
+               "elapsed_s": round(time.perf_counter() - started, 1)})
+
+    index_started = time.perf_counter()
+
+    for index in dropped:
+        await connection.execute(str(CreateIndex(index).compile(dialect=postgresql.dialect())))
+
+    # the ids were assigned here, the sequences continue after them
+    for table in LOAD_TABLES:
+        if table.name in starts:
+            column = list(table.primary_key.columns)[0].name
+            await connection.execute(
+                f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', '{column}'), "
+                f"coalesce((SELECT max(\"{column}\") FROM \"{table.name}\"), 1))"
+            )
+
+    await connection.execute(f"ANALYZE {', '.join(table.name for table in LOAD_TABLES)}")
+    await connection.close()
+
+    elapsed = time.perf_counter() - started
+    print({"tables": totals, "rows": sum(totals.values()), "elapsed_s": round(elapsed, 1),
+           "index_s": round(time.perf_counter() - index_started, 1),
+           "rows_per_s": round(sum(totals.values()) / elapsed) if elapsed else None})
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic synthetic dataset generator, loaded with COPY")
+    parser.add_argument("--database-url", default=os.getenv("BENCHMARK_DATABASE_URL"),
+                        help="scratch database, tables are created if missing, e.g. postgresql+asyncpg://u:p@localhost/bench")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--years", type=float, default=2.0, help="length of the history of every user")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=date(2025, 12, 31),
+                        help="last day of the history, fixed so a seed always gives the same rows")
+    parser.add_argument("--activity-sigma", type=float, default=0.8,
+                        help="spread of the per user activity, lognormal with mean 1, a few users are very heavy")
+    parser.add_argument("--categories-per-user", type=float, default=8)
+    parser.add_argument("--reminders-per-user", type=float, default=25)
+    parser.add_argument("--notes-per-day", type=float, default=0.3)
+    parser.add_argument("--note-words-median", type=float, default=60, help="note length, lognormal")
+    parser.add_argument("--note-words-sigma", type=float, default=1.1)
+    parser.add_argument("--pinned-ratio", type=float, default=0.05)
+    parser.add_argument("--deleted-ratio", type=float, default=0.03, help="soft deleted share of every table")
+    parser.add_argument("--events-per-day", type=float, default=0.6)
+    parser.add_argument("--recurring-ratio", type=float, default=0.05)
+    parser.add_argument("--finances-per-day", type=float, default=1.0)
+    parser.add_argument("--expense-ratio", type=float, default=0.85)
+    parser.add_argument("--lists-per-user", type=float, default=4)
+    parser.add_argument("--items-per-list", type=float, default=10)
+    parser.add_argument("--sync-log-per-day", type=float, default=2.0)
+    parser.add_argument("--batch-users", type=int, default=50, help="users generated and copied per transaction")
+    parser.add_argument("--keep-indexes", action="store_true", help="load into the indexed tables instead of indexing after")
+    parser.add_argument("--replace", action="store_true", help="truncate every generated table before loading")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("--database-url or BENCHMARK_DATABASE_URL is required")
+
+    asyncio.run(load(args))
+
+if __name__ == "__main__":
+    main()
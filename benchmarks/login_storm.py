@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from routers.raspi import health_check
+from utils.password_utils import hash_password, verify_password, verify_password_async, get_password_pool_stats
+
+# measures how long a cheap endpoint takes while a burst of logins is verifying passwords
+# inline mode is the old behaviour (bcrypt on the event loop), pool mode uses the password worker pool
+
+def percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def inline_login(password: str, hashed_password: str) -> bool:
+    return verify_password(password, hashed_password)
+
+async def pool_login(password: str, hashed_password: str) -> bool:
+    return await verify_password_async(password, hashed_password)
+
+async def probe_health(stop: asyncio.Event, latencies: list[float], interval: float):
+    while not stop.is_set():
+        # a health request arrives every interval, its latency is how long it waits for the loop plus the handler
+        arrived = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        await health_check()
+        latencies.append((time.perf_counter() - arrived) * 1000)
+
+async def run_storm(mode: str, logins: int, interval: float) -> dict:
+    password = "Benchmark_1"
+    hashed_password = hash_password(password)
+    login = inline_login if mode == "inline" else pool_login
+
+    latencies: list[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_health(stop, latencies, interval))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login(password, hashed_password) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+
+    return {
+        "mode": mode,
+        "logins": logins,
+        "elapsed_s": round(elapsed, 3),
+        "probes": len(latencies),
+        "health_p50_ms": round(statistics.median(latencies), 3) if latencies else None,
+        "health_p99_ms": round(percentile(latencies, 99), 3) if latencies else None,
+        "health_max_ms": round(max(latencies), 3) if latencies else None,
+        "pool": get_password_pool_stats() if mode == "pool" else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Login storm benchmark for the password worker pool")
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds between health probes")
+    args = parser.parse_args()
+
+    for mode in ("inline", "pool"):
+        print(asyncio.run(run_storm(mode, args.logins, args.interval)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+os.environ.setdefault("ENV", "dev")
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://localhost/unused")
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from core.models import Base, Note, User
+from crud.note_crud import get_note
+
+# seeds one heavy note user into a scratch database and runs the ownership checks of a note sync against it,
+# once the way they load now (content deferred) and once with the content, as every check loaded it before,
+# then compares how the content is stored with pglz and lz4
+
+WORDS = (
+    "meeting project budget review draft call notes idea todo follow up client invoice design team week plan "
+    "release bug fix feature test deploy server backup garden recipe travel book list shopping doctor school"
+).split()
+
+def make_content(rng: random.Random, large_share: float) -> str:
+    # most notes are a few lines, some are long documents, pasted logs or meeting minutes
+    if rng.random() < large_share:
+        length = rng.randint(5_000, 60_000)
+    else:
+        length = rng.randint(50, 400)
+
+    words = []
+    size = 0
+
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word + ("\n" if rng.random() < 0.08 else " "))
+        size += len(word) + 1
+
+    return "".join(words)
+
+async def seed(session_factory: async_sessionmaker, notes: int, large_share: float, seed_value: int) -> int:
+    rng = random.Random(seed_value)
+
+    async with session_factory() as db:
+        user = User(
+            email=f"bench-{seed_value}-{time.time_ns()}@example.com",
+            username=f"bench{time.time_ns() % 10**12}",
+            password_hash="x",
+        )
+        db.add(user)
+        await db.flush()
+
+        rows = [
+            {"user_id": user.user_id, "title": f"note {index}", "content": make_content(rng, large_share),
+             "sync_state": 0, "is_deleted": 0, "is_pinned": 0}
+            for index in range(notes)
+        ]
+
+        for start in range(0, len(rows), 500):
+            await db.execute(insert(Note), rows[start:start + 500])
+
+        await db.commit()
+
+        return user.user_id
+
+async def run_checks(session_factory: async_sessionmaker, note_ids: list[int], with_content: bool) -> dict:
+    # one session for the whole run like one sync request, every checked note stays in its identity map
+    tracemalloc.start()
+    started = time.perf_counter()
+    content_bytes = 0
+
+    async with session_factory() as db:
+        for note_id in note_ids:
+            note, context = await get_note(db, note_id, with_content=with_content)
+
+            if with_content and note is not None:
+                content_bytes += len((note.content or "").encode())
+
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+
+    tracemalloc.stop()
+
+    return {
+        "mode": "with_content" if with_content else "deferred",
+        "checks": len(note_ids),
+        "elapsed_s": round(elapsed, 3),
+        "per_check_ms": round(elapsed / len(note_ids) * 1000, 3),
+        "content_bytes_read": content_bytes,
+        "python_peak_mb": round(peak / 2**20, 2),
+    }
+
+async def storage_stats(db: AsyncSession, user_id: int) -> dict:
+    row = (await db.execute(
+        select(
+            func.count().label("notes"),
+            func.sum(func.octet_length(Note.content)).label("raw_bytes"),
+            func.sum(func.pg_column_size(Note.content)).label("stored_bytes"),
+        ).where(Note.user_id == user_id)
+    )).one()
+
+    relation = (await db.execute(text(
+        "SELECT pg_relation_size('note') AS heap_bytes, pg_relation_size(reltoastrelid) AS toast_bytes "
+        "FROM pg_class WHERE relname = 'note'"
+    ))).one()
+
+    return {
+        "notes": row.notes,
+        "raw_mb": round((row.raw_bytes or 0) / 2**20, 2),
+        "stored_mb": round((row.stored_bytes or 0) / 2**20, 2),
+        "heap_mb": round(relation.heap_bytes / 2**20, 2),
+        "toast_mb": round(relation.toast_bytes / 2**20, 2),
+    }
+
+async def compression_stats(db: AsyncSession, user_id: int, method: str) -> dict:
+    # the same content copied into a temporary table with the given compression, lz4 needs Postgres 14 built with it
+    try:
+        await db.execute(text(f"CREATE TEMP TABLE note_content_{method} (content text COMPRESSION {method})"))
+        await db.execute(text(f"INSERT INTO note_content_{method} SELECT content FROM note WHERE user_id = :user_id"),
+                         {"user_id": user_id})
+
+        row = (await db.execute(text(
+            f"SELECT sum(octet_length(content)) AS raw_bytes, sum(pg_column_size(content)) AS stored_bytes "
+            f"FROM note_content_{method}"
+        ))).one()
+
+        started = time.perf_counter()
+        await db.execute(text(f"SELECT sum(length(content)) FROM note_content_{method}"))
+        read_elapsed = time.perf_counter() - started
+
+        await db.execute(text(f"DROP TABLE note_content_{method}"))
+        await db.commit()
+
+    except Exception as e:
+        await db.rollback()
+        return {"method": method, "error": type(e).__name__}
+
+    return {
+        "method": method,
+        "ratio": round(row.raw_bytes / row.stored_bytes, 2) if row.stored_bytes else None,
+        "stored_mb": round(row.stored_bytes / 2**20, 2),
+        "decompress_all_s": round(read_elapsed, 3),
+    }
+
+async def run(args):
+    engine = create_async_engine(args.database_url)
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    user_id = await seed(session_factory, args.notes, args.large_share, args.seed)
+
+    try:
+        async with session_factory() as db:
+            note_ids = list((await db.execute(select(Note.note_id).where(Note.user_id == user_id))).scalars().all())
+            print(await storage_stats(db, user_id))
+
+        for with_content in (True, False):
+            print(await run_checks(session_factory, note_ids, with_content))
+
+        async with session_factory() as db:
+            for method in ("pglz", "lz4"):
+                print(await compression_stats(db, user_id, method))
+
+    finally:
+        if not args.keep:
+            async with session_factory() as db:
+                await db.execute(delete(User).where(User.user_id == user_id))
+                await db.commit()
+
+        await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Deferred and compressed note content benchmark")
+    parser.add_argument("--database-url", default=os.getenv("BENCHMARK_DATABASE_URL"),
+                        help="scratch database, tables are created if missing, e.g. postgresql+asyncpg://u:p@localhost/bench")
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--large-share", type=float, default=0.2, help="share of notes with 5-60 KB of content")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded user and notes")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("--database-url or BENCHMARK_DATABASE_URL is required")
+
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+os.environ.setdefault("ENV", "dev")
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://localhost/unused")
+
+from crud.note_revision_crud import NOTE_REVISION_KEYFRAME_INTERVAL
+from services.note_revision_services import rebuild_revision_content
+from utils.delta_utils import make_delta
+
+# edits one note many times and compares what its history takes as revisions (keyframes and reverse deltas)
+# with the sync_log snapshots, which keep the full note twice per update, then rebuilds every revision
+
+WORDS = (
+    "meeting project budget review draft call notes idea todo follow up client invoice design team week plan "
+    "release bug fix feature test deploy server backup garden recipe travel book list shopping doctor school"
+).split()
+
+def random_words(rng: random.Random, count: int) -> list[str]:
+    return [rng.choice(WORDS) for _ in range(count)]
+
+def edit(rng: random.Random, words: list[str]) -> list[str]:
+    # typical edits: fix a few words, add a sentence, drop a sentence, append a paragraph
+    words = list(words)
+    action = rng.random()
+    position = rng.randrange(len(words) + 1)
+
+    if action < 0.4:
+        for _ in range(rng.randint(1, 3)):
+            words[rng.randrange(len(words))] = rng.choice(WORDS)
+    elif action < 0.65:
+        words[position:position] = random_words(rng, rng.randint(5, 20))
+    elif action < 0.8 and len(words) > 40:
+        del words[position:position + rng.randint(5, 20)]
+    else:
+        words.extend(["\n"] + random_words(rng, rng.randint(20, 80)))
+
+    return words
+
+def snapshot_bytes(note_id: int, title: str, content: str) -> int:
+    # the NoteSync dump the sync log stores, as compact JSON
+    return len(json.dumps({
+        "note_id": note_id, "server_id": note_id, "user_id": 1, "category_id": 0, "reminder_id": 0,
+        "title": title, "content": content, "created_at": 0, "updated_at": 0, "last_modified": 0,
+        "sync_state": 0, "is_deleted": 0, "is_pinned": 0,
+    }, separators=(",", ":")).encode())
+
+def run(args) -> dict:
+    rng = random.Random(args.seed)
+    title = "benchmark note"
+    words = random_words(rng, args.words)
+    content = " ".join(words)
+
+    versions = [content]
+    revisions = []
+    snapshot_total = 0
+    delta_seconds = 0.0
+
+    for revision in range(1, args.edits + 1):
+        words = edit(rng, words)
+        new_content = " ".join(words)
+
+        # same rows set_note_text writes: the replaced version, as a keyframe or as a delta from the new content
+        started = time.perf_counter()
+        is_keyframe = revision % NOTE_REVISION_KEYFRAME_INTERVAL == 0
+        revisions.append(SimpleNamespace(
+            revision=revision,
+            content=content if is_keyframe else None,
+            delta=None if is_keyframe else make_delta(new_content, content),
+        ))
+        delta_seconds += time.perf_counter() - started
+
+        snapshot_total += snapshot_bytes(1, title, content) + snapshot_bytes(1, title, new_content)
+        content = new_content
+        versions.append(content)
+
+    revision_total = sum(
+        len(row.content.encode()) if row.content is not None else len(json.dumps(row.delta, separators=(",", ":")).encode())
+        for row in revisions
+    )
+
+    # every revision rebuilt from the same chain get_note_revision_chain reads
+    rebuild_times = []
+
+    for row in revisions:
+        chain = []
+
+        for newer in revisions[row.revision - 1:row.revision - 1 + NOTE_REVISION_KEYFRAME_INTERVAL]:
+            chain.append(newer)
+
+            if newer.content is not None:
+                break
+
+        started = time.perf_counter()
+        rebuilt = rebuild_revision_content(chain, content)
+        rebuild_times.append(time.perf_counter() - started)
+
+        if rebuilt != versions[row.revision - 1]:
+            raise AssertionError(f"revision {row.revision} does not rebuild")
+
+    return {
+        "edits": args.edits,
+        "final_kb": round(len(content.encode()) / 1024, 1),
+        "keyframe_interval": NOTE_REVISION_KEYFRAME_INTERVAL,
+        "snapshot_kb": round(snapshot_total / 1024, 1),
+        "revision_kb": round(revision_total / 1024, 1),
+        "ratio": round(snapshot_total / revision_total, 1) if revision_total else None,
+        "delta_ms_per_edit": round(delta_seconds / args.edits * 1000, 3),
+        "rebuild_max_ms": round(max(rebuild_times) * 1000, 3),
+        "rebuild_mean_ms": round(sum(rebuild_times) / len(rebuild_times) * 1000, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Note revision storage benchmark against sync log snapshots")
+    parser.add_argument("--edits", type=int, default=500)
+    parser.add_argument("--words", type=int, default=800, help="words of the first version")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(run(args))
+
+if __name__ == "__main__":
+    main()
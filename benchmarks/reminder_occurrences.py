@@ -0,0 +1,153 @@
+import argparse
+import calendar
+import random
+import sys
+import time
+from datetime import datetime, timedelta, time as time_of_day
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from core.enums import ReminderFrequency
+from utils.schedule_utils import to_datetime64, next_reminder_occurrences, reminder_occurrences_in_window, \
+    health_occurrences_in_window
+
+# next N occurrences and one day of occurrences for many reminders, NumPy against a per row Python loop
+
+def add_months(value: datetime, months: int) -> datetime:
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    return value.replace(year=year, month=month, day=min(value.day, calendar.monthrange(year, month)[1]))
+
+def loop_next_occurrences(start: datetime, frequency: int, after: datetime, count: int) -> list[datetime | None]:
+    if frequency in (ReminderFrequency.DAILY, ReminderFrequency.WEEKLY):
+        step = timedelta(days=1 if frequency == ReminderFrequency.DAILY else 7)
+        occurrence = start
+
+        while occurrence < after:
+            occurrence += step
+
+        return [occurrence + step * index for index in range(count)]
+
+    if frequency in (ReminderFrequency.MONTHLY, ReminderFrequency.YEARLY):
+        months = 1 if frequency == ReminderFrequency.MONTHLY else 12
+        occurrences = []
+        index = 0
+
+        while len(occurrences) < count:
+            occurrence = add_months(start, index * months)
+
+            if occurrence >= after:
+                occurrences.append(occurrence)
+
+            index += 1
+
+        return occurrences
+
+    return [start if start >= after else None] + [None] * (count - 1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Reminder occurrence computation benchmark")
+    parser.add_argument("--reminders", type=int, default=200_000)
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    after = datetime(2025, 6, 15, 12, 0)
+
+    # series started up to two years before, the loop has to walk that history while NumPy jumps
+    starts = [after - timedelta(minutes=rng.randint(-60 * 24 * 30, 60 * 24 * 730)) for _ in range(args.reminders)]
+    frequencies = [rng.choice(list(ReminderFrequency)).value for _ in range(args.reminders)]
+
+    started = time.perf_counter()
+    expected = [loop_next_occurrences(start, frequency, after, args.count) for start, frequency in zip(starts, frequencies)]
+    loop_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    start_array = to_datetime64(starts)
+    frequency_array = np.asarray(frequencies, dtype=np.int64)
+    conversion_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    occurrences = next_reminder_occurrences(start_array, frequency_array, after, args.count)
+    numpy_seconds = time.perf_counter() - started
+
+    # NaT converts to None, the same marker the loop uses
+    matches = occurrences.tolist() == expected
+
+    print({
+        "case": "next_occurrences",
+        "reminders": args.reminders,
+        "count": args.count,
+        "loop_ms": round(loop_seconds * 1000, 1),
+        "numpy_ms": round(numpy_seconds * 1000, 1),
+        "conversion_ms": round(conversion_seconds * 1000, 1),
+        "speedup": round(loop_seconds / numpy_seconds, 1),
+        "matches_loop": matches,
+    })
+
+    day_start = datetime(2025, 6, 15)
+    day_end = day_start + timedelta(days=1)
+
+    started = time.perf_counter()
+    loop_today = sum(
+        1
+        for start, frequency in zip(starts, frequencies)
+        for occurrence in loop_next_occurrences(start, frequency, day_start, 2)
+        if occurrence is not None and occurrence < day_end
+    )
+    loop_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rows, _ = reminder_occurrences_in_window(start_array, frequency_array, day_start, day_end)
+    numpy_seconds = time.perf_counter() - started
+
+    print({
+        "case": "today",
+        "reminders": args.reminders,
+        "occurrences": len(rows),
+        "loop_ms": round(loop_seconds * 1000, 1),
+        "numpy_ms": round(numpy_seconds * 1000, 1),
+        "matches_loop": len(rows) == loop_today,
+    })
+
+    health_count = args.reminders // 10
+    start_times = [time_of_day(rng.randint(6, 12), rng.choice((0, 30))) for _ in range(health_count)]
+    end_times = [time_of_day(rng.randint(18, 23), 0) for _ in range(health_count)]
+    health_frequencies = [rng.choice((0, 30, 60, 120)) for _ in range(health_count)]
+
+    started = time.perf_counter()
+    loop_health = 0
+
+    for start_time, end_time, frequency in zip(start_times, end_times, health_frequencies):
+        occurrence = datetime.combine(day_start, start_time)
+        end = datetime.combine(day_start, end_time)
+
+        while occurrence <= end:
+            loop_health += 1
+
+            if frequency == 0:
+                break
+
+            occurrence += timedelta(minutes=frequency)
+
+    loop_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rows, _ = health_occurrences_in_window(start_times, end_times, health_frequencies, day_start, day_end)
+    numpy_seconds = time.perf_counter() - started
+
+    print({
+        "case": "health_today",
+        "health_reminders": health_count,
+        "occurrences": len(rows),
+        "loop_ms": round(loop_seconds * 1000, 1),
+        "numpy_ms": round(numpy_seconds * 1000, 1),
+        "matches_loop": len(rows) == loop_health,
+    })
+
+if __name__ == "__main__":
+    main()
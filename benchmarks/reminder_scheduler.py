@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import bisect
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+os.environ.setdefault("ENV", "dev")
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://localhost/unused")
+
+from services.scheduler_services import ReminderScheduler, DueReminder
+
+# schedules 1M reminders due over a few seconds against an in-memory table that answers the same keyset
+# query as idx_reminder_due, measures how late reminders fire and how much of the table the heap holds
+
+BASE_TIME = datetime(2025, 1, 1, 9, 0)
+
+def make_table(count: int, spread: float, seed: int) -> list[tuple]:
+    rng = random.Random(seed)
+    rows = [
+        (reminder_id, reminder_id % 1000 + 1, BASE_TIME + timedelta(seconds=rng.random() * spread), None)
+        for reminder_id in range(1, count + 1)
+    ]
+    rows.sort(key=lambda row: (row[2], row[0]))
+    return rows
+
+async def run(args):
+    table = make_table(args.reminders, args.spread, args.seed)
+    keys = [(row[2], row[0]) for row in table]
+    lateness: list[float] = []
+    peak = {"scheduled": 0}
+    load_seconds: list[float] = []
+
+    # the table is dated in the past, the scheduler clock starts one second before the first reminder
+    started_at = time.perf_counter()
+
+    def clock() -> datetime:
+        return BASE_TIME + timedelta(seconds=time.perf_counter() - started_at - 1)
+
+    async def load(after, until, limit):
+        started = time.perf_counter()
+        index = bisect.bisect_right(keys, after)
+        rows = []
+
+        while index < len(table) and len(rows) < limit and table[index][2] <= until:
+            rows.append(table[index])
+            index += 1
+
+        load_seconds.append(time.perf_counter() - started)
+        return rows
+
+    async def load_repeating(window_start, window_end, after_id, limit):
+        return []
+
+    async def sink(reminder: DueReminder):
+        lateness.append((clock() - reminder.reminder_time).total_seconds())
+
+    scheduler = ReminderScheduler(sink=sink, load=load, load_repeating=load_repeating, batch_size=args.batch_size, clock=clock)
+    scheduler.start()
+
+    while scheduler.fired < args.reminders:
+        peak["scheduled"] = max(peak["scheduled"], len(scheduler.entries))
+        await asyncio.sleep(0.05)
+
+    await scheduler.stop()
+
+    lateness.sort()
+
+    print({
+        "reminders": args.reminders,
+        "fired": scheduler.fired,
+        "refills": scheduler.refills,
+        "peak_scheduled": peak["scheduled"],
+        "refill_ms_p50": round(statistics.median(load_seconds) * 1000, 2),
+        "late_ms_p50": round(lateness[len(lateness) // 2] * 1000, 2),
+        "late_ms_p99": round(lateness[int(len(lateness) * 0.99)] * 1000, 2),
+        "late_ms_max": round(lateness[-1] * 1000, 2),
+    })
+
+    # writes to reminders inside the loaded window only touch the heap and the entries dict
+    scheduler = ReminderScheduler(sink=sink, load=load, load_repeating=load_repeating, batch_size=args.batch_size, clock=clock)
+    scheduler.loaded_until = (BASE_TIME + timedelta(days=1), 0)
+    rng = random.Random(args.seed)
+    updates = 100_000
+    started = time.perf_counter()
+
+    for _ in range(updates):
+        reminder_id = rng.randint(1, args.reminders)
+        scheduler.notify(reminder_id, 1, BASE_TIME + timedelta(seconds=rng.random() * 3600), 0, 1, None)
+
+    print({"notify_us": round((time.perf_counter() - started) / updates * 1_000_000, 2)})
+
+def main():
+    parser = argparse.ArgumentParser(description="Reminder scheduler benchmark")
+    parser.add_argument("--reminders", type=int, default=1_000_000)
+    parser.add_argument("--spread", type=float, default=10.0, help="seconds the reminders are due over")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,535 @@
+import argparse
+import asyncio
+import contextvars
+import glob
+import json
+import os
+import random
+import resource
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+sys.path.insert(0, str(APP_DIR))
+
+# replays sync traffic against the app in process, no server and no HTTP client in between, against a Postgres
+# the harness starts in a temporary directory (or --database-url), every scenario reports latency percentiles,
+# throughput, database round trips per request and peak RSS, the results are saved as JSON to compare runs
+
+SYNC_PATHS = ("/categories/sync", "/reminders/sync", "/notes/sync", "/events/sync", "/finances/sync", "/lists/sync")
+
+WORDS = (
+    "meeting project budget review draft call notes idea todo follow up client invoice design team week plan "
+    "release bug fix feature test deploy server backup garden recipe travel book list shopping doctor school"
+).split()
+
+round_trips: contextvars.ContextVar[list[int] | None] = contextvars.ContextVar("round_trips", default=None)
+
+def percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+# temporary Postgres
+
+def find_pg_binary(name: str, pg_bin: str | None) -> str:
+    # Debian and Ubuntu keep initdb and pg_ctl out of PATH, under /usr/lib/postgresql/<version>/bin
+    candidates = [str(Path(pg_bin) / name)] if pg_bin else []
+    candidates += [shutil.which(name) or ""]
+    candidates += sorted(glob.glob(f"/usr/lib/postgresql/*/bin/{name}"), key=lambda path: int(Path(path).parts[-3]))[::-1]
+
+    for candidate in candidates:
+        if candidate and os.access(candidate, os.X_OK):
+            return candidate
+
+    raise SystemExit(f"{name} not found, pass --pg-bin or --database-url")
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+class TemporaryPostgres:
+    # a throwaway cluster, trust auth on 127.0.0.1 only, removed again on exit
+
+    def __init__(self, pg_bin: str | None):
+        self.initdb = find_pg_binary("initdb", pg_bin)
+        self.pg_ctl = find_pg_binary("pg_ctl", pg_bin)
+        self.directory = Path(tempfile.mkdtemp(prefix="sync-suite-pg-"))
+        self.data = self.directory / "data"
+
+    def start(self) -> str:
+        if hasattr(os, "geteuid") and os.geteuid() == 0:
+            raise SystemExit("initdb does not run as root, run as another user or pass --database-url")
+
+        port = free_port()
+        subprocess.run([self.initdb, "-D", str(self.data), "-U", "bench", "--auth=trust", "-E", "UTF8", "--no-sync"],
+                       check=True, capture_output=True)
+        subprocess.run([self.pg_ctl, "-D", str(self.data), "-l", str(self.directory / "postgres.log"), "-w",
+                        "-o", f"-p {port} -k {self.directory} -c listen_addresses=127.0.0.1 -c max_connections=200",
+                        "start"], check=True, capture_output=True)
+
+        return f"postgresql+asyncpg://bench@127.0.0.1:{port}/postgres"
+
+    def stop(self):
+        subprocess.run([self.pg_ctl, "-D", str(self.data), "-m", "fast", "-w", "stop"], capture_output=True)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+# in process client
+
+async def call_app(app, method: str, path: str, body: dict | None = None, query: str = "") -> tuple[int, bytes]:
+    # one ASGI http request, the same messages an ASGI server would exchange with the app
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"host", b"benchmark"), (b"content-type", b"application/json"),
+                    (b"content-length", str(len(payload)).encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    request_sent = False
+    response_complete = asyncio.Event()
+    status = 500
+    chunks: list[bytes] = []
+
+    async def receive():
+        nonlocal request_sent
+
+        if request_sent:
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
+
+        request_sent = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+            if not message.get("more_body", False):
+                response_complete.set()
+
+    await app(scope, receive, send)
+
+    return status, b"".join(chunks)
+
+def count_round_trip(*args):
+    # connects, transaction begins and ends and statements of the request that runs in this context
+    counter = round_trips.get()
+
+    if counter is not None:
+        counter[0] += 1
+
+@dataclass
+class Sample:
+    path: str
+    status: int
+    elapsed_ms: float
+    round_trips: int
+
+@dataclass
+class BenchContext:
+    app: object
+    session_factory: object
+    args: argparse.Namespace
+    user_ids: list[int]
+    note_ids: dict[int, list[int]] # user_id -> server ids of the seeded notes
+    samples: list[Sample] = field(default_factory=list)
+
+async def timed_request(context: BenchContext, path: str, body: dict) -> bytes:
+    counter = [0]
+    token = round_trips.set(counter)
+
+    started = time.perf_counter()
+
+    try:
+        status, response = await call_app(context.app, "POST", path, body)
+    except Exception:
+        # the app already answered 500 and raised again like it would to a server, counted as an error
+        status, response = 500, b""
+    finally:
+        round_trips.reset(token)
+
+    elapsed = (time.perf_counter() - started) * 1000
+
+    context.samples.append(Sample(path=path, status=status, elapsed_ms=elapsed, round_trips=counter[0]))
+
+    return response
+
+# seeding
+
+async def seed(session_factory, args) -> tuple[list[int], dict[int, list[int]]]:
+    from sqlalchemy import insert
+    from core.models import User, Category, Reminder, Note, Event, Finance, List, ListItem
+
+    rng = random.Random(args.seed)
+    user_ids: list[int] = []
+    note_ids: dict[int, list[int]] = {}
+    run_id = time.time_ns() % 10**9
+    base_day = date.today() - timedelta(days=365)
+
+    async with session_factory() as db:
+        for index in range(args.users):
+            result = await db.execute(insert(User).values(
+                email=f"sync-{run_id}-{index}@example.com",
+                username=f"s{run_id}u{index}",
+                password_hash="x",
+            ).returning(User.user_id))
+            user_id = result.scalar_one()
+            user_ids.append(user_id)
+
+            result = await db.execute(insert(Category).returning(Category.category_id), [
+                {"user_id": user_id, "name": f"category {number}", "description": sentence(rng, 5),
+                 "color": "#336699", "icon": "folder", "sync_state": 2, "is_deleted": 0}
+                for number in range(5)
+            ])
+            category_ids = list(result.scalars().all())
+
+            await db.execute(insert(Reminder), [
+                {"user_id": user_id, "reminder_time": datetime.now() + timedelta(hours=rng.randint(1, 24 * 60)),
+                 "frequency": rng.choice((0, 1, 2)), "status": 1, "message": sentence(rng, 6),
+                 "sync_state": 2, "is_deleted": 0}
+                for _ in range(args.reminders)
+            ])
+
+            result = await db.execute(insert(Note).returning(Note.note_id), [
+                {"user_id": user_id, "category_id": rng.choice(category_ids + [None]), "title": sentence(rng, 4),
+                 "content": sentence(rng, rng.randint(10, 400)), "sync_state": 2, "is_deleted": 0,
+                 "is_pinned": int(rng.random() < 0.1)}
+                for _ in range(args.notes)
+            ])
+            note_ids[user_id] = list(result.scalars().all())
+
+            await db.execute(insert(Event), [
+                {"user_id": user_id, "category_id": rng.choice(category_ids + [None]), "title": sentence(rng, 3),
+                 "description": sentence(rng, 12), "date": base_day + timedelta(days=rng.randint(0, 730)),
+                 "priority": rng.randint(0, 2), "sync_state": 2, "is_deleted": 0}
+                for _ in range(args.events)
+            ])
+
+            await db.execute(insert(Finance), [
+                {"user_id": user_id, "category_id": rng.choice(category_ids + [None]), "type": rng.random() < 0.8,
+                 "expense_amount": round(rng.uniform(1, 200), 2),
+                 "expense_date": datetime.combine(base_day + timedelta(days=rng.randint(0, 365)), datetime.min.time()),
+                 "description": sentence(rng, 3), "sync_state": 2, "is_deleted": 0}
+                for _ in range(args.finances)
+            ])
+
+            for number in range(args.lists):
+                result = await db.execute(insert(List).values(
+                    user_id=user_id, title=f"list {number}", sync_state=2, is_deleted=0
+                ).returning(List.list_id))
+                list_id = result.scalar_one()
+
+                await db.execute(insert(ListItem), [
+                    {"list_id": list_id, "name": f"item {item}", "quantity": rng.randint(1, 5), "status": False,
+                     "sync_state": 2, "is_deleted": 0}
+                    for item in range(args.items)
+                ])
+
+            await db.commit()
+
+    return user_ids, note_ids
+
+async def set_pending(session_factory, user_ids: list[int], sync_state: int):
+    # 2 makes every seeded row a pending download again, 0 leaves the users with nothing to download
+    from sqlalchemy import update, select
+    from core.models import Category, Reminder, Note, Event, Finance, List, ListItem
+
+    async with session_factory() as db:
+        for model in (Category, Reminder, Note, Event, Finance, List):
+            await db.execute(update(model).where(model.user_id.in_(user_ids)).values(sync_state=sync_state))
+
+        await db.execute(
+            update(ListItem)
+            .where(ListItem.list_id.in_(select(List.list_id).where(List.user_id.in_(user_ids))))
+            .values(sync_state=sync_state)
+        )
+        await db.commit()
+
+# payloads of the clients
+
+def note_change(rng: random.Random, user_id: int, local_id: int, server_id: int, title: str | None = None) -> dict:
+    timestamp = now_ms()
+
+    return {
+        "note_id": local_id, "server_id": server_id, "user_id": user_id, "category_id": 0, "reminder_id": 0,
+        "title": title or sentence(rng, 4), "content": sentence(rng, rng.randint(10, 300)),
+        "created_at": timestamp, "updated_at": timestamp, "last_modified": timestamp,
+        "sync_state": 1 if server_id == 0 else 2, "is_deleted": 0, "is_pinned": 0,
+    }
+
+def finance_change(rng: random.Random, user_id: int, local_id: int) -> dict:
+    timestamp = now_ms()
+
+    return {
+        "finance_id": local_id, "server_id": 0, "user_id": user_id, "category_id": 0, "reminder_id": 0,
+        "type": rng.random() < 0.8, "expense_amount": f"{rng.uniform(1, 200):.2f}",
+        "expense_date": timestamp - rng.randint(0, 30) * 86_400_000, "description": sentence(rng, 3),
+        "last_modified": timestamp, "sync_state": 1, "is_deleted": 0,
+    }
+
+def empty_sync(user_id: int) -> dict:
+    return {"user_id": user_id, "changes": []}
+
+# scenarios
+
+async def run_limited(concurrency: int, jobs):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(job):
+        async with semaphore:
+            await job
+
+    await asyncio.gather(*(limited(job) for job in jobs))
+
+async def first_install(context: BenchContext):
+    # a new device of every user with nothing local, every sync endpoint downloads all rows of the user once
+    await set_pending(context.session_factory, context.user_ids, 2)
+
+    async def device(user_id: int):
+        for path in SYNC_PATHS:
+            await timed_request(context, path, empty_sync(user_id))
+
+    await run_limited(context.args.concurrency, [device(user_id) for user_id in context.user_ids])
+
+async def offline_burst(context: BenchContext):
+    # every user comes back online with a backlog of notes and finance entries created offline
+    await set_pending(context.session_factory, context.user_ids, 0)
+    rng = random.Random(context.args.seed + 1)
+    burst = context.args.burst
+
+    async def device(user_id: int):
+        await timed_request(context, "/notes/sync", {
+            "user_id": user_id,
+            "changes": [note_change(rng, user_id, local_id, 0) for local_id in range(1, burst + 1)],
+        })
+        await timed_request(context, "/finances/sync", {
+            "user_id": user_id,
+            "changes": [finance_change(rng, user_id, local_id) for local_id in range(1, burst // 2 + 1)],
+        })
+
+    await run_limited(context.args.concurrency, [device(user_id) for user_id in context.user_ids])
+
+async def idle_polling(context: BenchContext):
+    # devices with nothing to upload polling every sync endpoint, and nothing to download either
+    await set_pending(context.session_factory, context.user_ids, 0)
+
+    async def device(user_id: int):
+        for _ in range(context.args.polls):
+            for path in SYNC_PATHS:
+                await timed_request(context, path, empty_sync(user_id))
+
+    await run_limited(context.args.concurrency, [device(user_id) for user_id in context.user_ids])
+
+async def device_contention(context: BenchContext):
+    # several devices of one user editing the same notes at the same time
+    user_id = context.user_ids[0]
+    note_ids = context.note_ids[user_id][:context.args.shared_notes]
+    await set_pending(context.session_factory, [user_id], 0)
+
+    async def device(number: int):
+        rng = random.Random(context.args.seed + 100 + number)
+
+        for _ in range(context.args.rounds):
+            changed = rng.sample(note_ids, min(len(note_ids), 5))
+            await timed_request(context, "/notes/sync", {
+                "user_id": user_id,
+                "changes": [note_change(rng, user_id, note_id, note_id) for note_id in changed],
+            })
+
+    await asyncio.gather(*(device(number) for number in range(context.args.devices)))
+
+SCENARIO_RUNNERS = {
+    "first_install": first_install,
+    "offline_burst": offline_burst,
+    "idle_polling": idle_polling,
+    "device_contention": device_contention,
+}
+
+# results
+
+def read_peak_rss_mb() -> float:
+    # VmHWM can be reset between scenarios, ru_maxrss is the peak of the whole run
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+def summarize(samples: list[Sample], wall_seconds: float) -> dict:
+    latencies = [sample.elapsed_ms for sample in samples]
+    trips = [sample.round_trips for sample in samples]
+
+    summary = {
+        "requests": len(samples),
+        "errors": sum(1 for sample in samples if sample.status >= 400),
+        "wall_s": round(wall_seconds, 3),
+        "throughput_rps": round(len(samples) / wall_seconds, 1) if wall_seconds else None,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "round_trips_mean": round(statistics.mean(trips), 1),
+        "round_trips_max": max(trips),
+        "peak_rss_mb": read_peak_rss_mb(),
+        "paths": {},
+    }
+
+    for path in sorted({sample.path for sample in samples}):
+        path_samples = [sample for sample in samples if sample.path == path]
+        summary["paths"][path] = {
+            "requests": len(path_samples),
+            "p50_ms": round(percentile([sample.elapsed_ms for sample in path_samples], 50), 2),
+            "p95_ms": round(percentile([sample.elapsed_ms for sample in path_samples], 95), 2),
+            "round_trips_mean": round(statistics.mean(sample.round_trips for sample in path_samples), 1),
+        }
+
+    return summary
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline_path: str, results: dict):
+    # change of every scenario metric against an earlier run, negative is better for all but throughput
+    baseline = json.loads(Path(baseline_path).read_text())
+
+    for name, summary in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+
+        if previous is None:
+            continue
+
+        changes = {}
+
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "round_trips_mean", "peak_rss_mb"):
+            if previous.get(metric) and summary.get(metric) is not None:
+                changes[metric] = f"{previous[metric]} -> {summary[metric]} ({(summary[metric] / previous[metric] - 1) * 100:+.1f}%)"
+
+        print({"scenario": name, "baseline": baseline.get("commit"), **changes})
+
+async def run(args, database_url: str) -> dict:
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("ENV", "dev")
+    os.environ.setdefault("SECRET_KEY", "sync-suite")
+    os.environ.setdefault("ACCESS_TOKEN_EXPIRY", "30")
+
+    # the app reads its database from the environment on import
+    from sqlalchemy import event
+    from core.database import engine, async_session
+    from core.models import Base
+    from main import app
+
+    engine.echo = False
+    event.listen(engine.sync_engine, "connect", count_round_trip)
+    event.listen(engine.sync_engine, "begin", count_round_trip)
+    event.listen(engine.sync_engine, "before_cursor_execute", count_round_trip)
+    event.listen(engine.sync_engine, "commit", count_round_trip)
+    event.listen(engine.sync_engine, "rollback", count_round_trip)
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    user_ids, note_ids = await seed(async_session, args)
+    results = {"commit": git_commit(), "started": datetime.now().isoformat(timespec="seconds"),
+               "args": vars(args), "scenarios": {}}
+
+    for name in args.scenarios:
+        context = BenchContext(app=app, session_factory=async_session, args=args, user_ids=user_ids, note_ids=note_ids)
+        reset_peak_rss()
+
+        started = time.perf_counter()
+        await SCENARIO_RUNNERS[name](context)
+        wall_seconds = time.perf_counter() - started
+
+        results["scenarios"][name] = summarize(context.samples, wall_seconds)
+        print({"scenario": name, **{key: value for key, value in results["scenarios"][name].items() if key != "paths"}})
+
+    await engine.dispose()
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync endpoint benchmark suite against a temporary Postgres")
+    parser.add_argument("--database-url", default=os.getenv("BENCHMARK_DATABASE_URL"),
+                        help="use this scratch database instead of starting a temporary Postgres")
+    parser.add_argument("--pg-bin", help="directory of initdb and pg_ctl")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIO_RUNNERS), default=list(SCENARIO_RUNNERS))
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--notes", type=int, default=200, help="seeded notes per user")
+    parser.add_argument("--events", type=int, default=100, help="seeded events per user")
+    parser.add_argument("--reminders", type=int, default=20, help="seeded reminders per user")
+    parser.add_argument("--finances", type=int, default=200, help="seeded finance rows per user")
+    parser.add_argument("--lists", type=int, default=5, help="seeded lists per user")
+    parser.add_argument("--items", type=int, default=10, help="items per seeded list")
+    parser.add_argument("--concurrency", type=int, default=8, help="users syncing at the same time")
+    parser.add_argument("--burst", type=int, default=50, help="notes uploaded per user in offline_burst")
+    parser.add_argument("--polls", type=int, default=5, help="polling rounds per user in idle_polling")
+    parser.add_argument("--devices", type=int, default=4, help="devices of the user in device_contention")
+    parser.add_argument("--rounds", type=int, default=20, help="syncs per device in device_contention")
+    parser.add_argument("--shared-notes", type=int, default=10, help="notes the devices edit in device_contention")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="results file, default benchmarks/results/sync-<time>.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    postgres = None if args.database_url else TemporaryPostgres(args.pg_bin)
+
+    try:
+        database_url = args.database_url or postgres.start()
+        results = asyncio.run(run(args, database_url))
+    finally:
+        if postgres is not None:
+            postgres.stop()
+
+    output = Path(args.output) if args.output else \
+        Path(__file__).resolve().parent / "results" / f"sync-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, default=str))
+    print({"results": str(output)})
+
+    if args.compare:
+        compare(args.compare, results)
+
+if __name__ == "__main__":
+    main()